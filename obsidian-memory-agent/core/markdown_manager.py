@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 from datetime import datetime
 from pathlib import Path
@@ -10,6 +11,23 @@ try:
 except ImportError:
     HAS_YAML = False
 
+# Sibling recorder skill, coordinates writes shared with the recorder scripts
+RECORDER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-recorder" / "scripts"
+if str(RECORDER_SCRIPTS) not in sys.path:
+    sys.path.append(str(RECORDER_SCRIPTS))
+try:
+    from write_coordinator import get_coordinator
+except ImportError:
+    get_coordinator = None
+try:
+    from memory_paths import MemoryLayout
+except ImportError:
+    MemoryLayout = None
+try:
+    from entry_parser import iter_blocks
+except ImportError:
+    iter_blocks = None
+
 class MarkdownManager:
     """Manages local Markdown memory files."""
     
@@ -17,11 +35,15 @@ class MarkdownManager:
         self.root_path = Path(root_path)
         self.memory_dir = self.root_path / "memory"
         self.memory_dir.mkdir(parents=True, exist_ok=True)
+        # Resolves flat and year/month sharded layouts, caches directory listings
+        self.layout = MemoryLayout(self.root_path) if MemoryLayout is not None else None
         
     def get_daily_file(self, date_str=None):
         """Get the path to the daily memory file."""
         if date_str is None:
             date_str = datetime.now().strftime("%Y-%m-%d")
+        if self.layout is not None:
+            return self.layout.daily_path(date_str)
         return self.memory_dir / f"{date_str}.md"
         
     def append_entry(self, content, importance=3, tags=None):
@@ -39,6 +61,12 @@ class MarkdownManager:
         entry_text += f"\n{content}\n"
         entry_text += "\n---\n"
         
+        # Go through the vault write coordinator when available, so entries
+        # from concurrent agents and the recorder scripts are never lost
+        if get_coordinator is not None:
+            get_coordinator(self.root_path).append(file_path, entry_text, self._daily_header(file_path))
+            return str(file_path)
+
         # Ensure file exists with frontmatter
         if not file_path.exists():
             self._init_daily_file(file_path)
@@ -50,6 +78,11 @@ class MarkdownManager:
         
     def _init_daily_file(self, file_path):
         """Initialize a new daily file with frontmatter."""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(self._daily_header(file_path))
+
+    def _daily_header(self, file_path):
+        """Frontmatter and title for a new daily file."""
         date_str = file_path.stem
         frontmatter = {
             "date": date_str,
@@ -70,9 +103,7 @@ class MarkdownManager:
                     content += f"{key}: {value}\n"
         content += "---\n\n"
         content += f"# Daily Memory: {date_str}\n"
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        return content
 
     def read_file(self, file_path):
         """Read file content."""
@@ -80,6 +111,42 @@ class MarkdownManager:
             return Path(file_path).read_text(encoding='utf-8')
         return ""
 
-    def list_memory_files(self):
-        """List all markdown files in memory directory."""
+    def iter_entries(self, file_path):
+        """
+        Stream the entries of a memory file.
+
+        Yields one dict per timed section (`## HH:MM - title`) with its fields,
+        content, byte offsets and content hash, plus free text outside any
+        entry (manual notes). Uses the recorder's shared entry parser, so
+        entries match what the retriever indexes.
+        """
+        if iter_blocks is not None:
+            for block in iter_blocks(Path(file_path)):
+                if block["kind"] == "entry":
+                    yield block
+                elif block["kind"] == "text" and _has_prose(block["text"]):
+                    yield block
+            return
+
+        # Recorder skill not installed: fall back to splitting on separators
+        offset = 0
+        for chunk in self.read_file(file_path).split("\n---\n"):
+            start = offset
+            offset += len(chunk.encode('utf-8')) + len("\n---\n")
+            if not chunk.strip() or chunk.startswith("---"):
+                continue
+            yield {"kind": "text", "text": chunk.strip(), "start": start, "end": offset}
+
+    def list_memory_files(self, since=None, until=None):
+        """List markdown files in the memory directory, optionally within a date range."""
+        if self.layout is not None:
+            return self.layout.files(since, until)
         return list(self.memory_dir.glob("*.md"))
+
+
+def _has_prose(text):
+    """Whether a text block holds more than headings and separators."""
+    return any(
+        line.strip() and not line.startswith("#") and line.strip() != "---"
+        for line in text.splitlines()
+    )
@@ -0,0 +1,184 @@
+import copy
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(text):
+    """Collapse whitespace so trivially different spellings share a cache entry."""
+    return " ".join(text.split())
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache."""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    The first caller runs the function; callers arriving while it is in
+    flight block and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["event"].set()
+        return call["result"]
+
+
+class QueryCache:
+    """
+    Exact-match cache for query results.
+
+    Keys include the index generation, so bumping the generation on every
+    write guarantees stale result sets are never served.
+
+    Every caller gets its own copy of the result list, so mutating a result
+    cannot corrupt the cached entry.
+    """
+
+    def __init__(self, max_size=256):
+        self.results = LRUCache(max_size)
+        self.flight = SingleFlight()
+
+    def key(self, query, top_k, generation, **filters):
+        return (normalize_query(query), top_k, tuple(sorted(filters.items())), generation)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached result for key, computing it at most once concurrently."""
+        cached = self.results.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        def run():
+            result = compute()
+            self.results.put(key, copy.deepcopy(result))
+            return result
+
+        # Callers coalesced by the single flight share `result`; hand out copies
+        return copy.deepcopy(self.flight.do(key, run))
+
+
+def _cosine(v1, v2):
+    dot = sum(a * b for a, b in zip(v1, v2))
+    norm_a = sum(a * a for a in v1) ** 0.5
+    norm_b = sum(b * b for b in v2) ** 0.5
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class SemanticCache:
+    """
+    Cache results of recent queries by their embedding.
+
+    A new query whose vector lies within `radius` cosine distance of a cached
+    query (same filters, same index generation, enough results cached) reuses
+    that query's result list. Entries from older generations are dropped.
+    """
+
+    def __init__(self, max_size=64, radius=0.05):
+        self.max_size = max_size
+        self.radius = radius
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, vector, top_k, generation, **filters):
+        """Return cached results for a nearby query, or None."""
+        filters = tuple(sorted(filters.items()))
+        with self._lock:
+            best_id, best_score = None, 1.0 - self.radius
+            for entry_id, entry in list(self._entries.items()):
+                if entry["generation"] != generation:
+                    del self._entries[entry_id]
+                    continue
+                if entry["filters"] != filters or entry["top_k"] < top_k:
+                    continue
+                score = _cosine(vector, entry["vector"])
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return copy.deepcopy(self._entries[best_id]["results"][:top_k])
+
+    def store(self, vector, top_k, generation, results, **filters):
+        with self._lock:
+            self._entries[self._next_id] = {
+                "vector": vector,
+                "top_k": top_k,
+                "generation": generation,
+                "filters": tuple(sorted(filters.items())),
+                "results": copy.deepcopy(results)
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
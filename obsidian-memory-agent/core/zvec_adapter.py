@@ -1,10 +1,14 @@
 import os
+import sys
 import json
 import random
 import math
+import threading
 from datetime import datetime
 from pathlib import Path
 
+from core.query_cache import LRUCache, QueryCache, SemanticCache, normalize_query
+
 # Try to import zvec, otherwise use mock
 try:
     import zvec
@@ -18,12 +22,34 @@ try:
 except ImportError:
     REQUESTS_AVAILABLE = False
 
+# Atomic file replacement from the sibling recorder skill, plain writes otherwise
+RECORDER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-recorder" / "scripts"
+if str(RECORDER_SCRIPTS) not in sys.path:
+    sys.path.append(str(RECORDER_SCRIPTS))
+try:
+    from persistence import atomic_write
+except ImportError:
+    atomic_write = None
+
 class EmbeddingService:
     """Service to generate embeddings from text."""
     
-    def __init__(self, dimension=128):
+    def __init__(self, dimension=128, cache_size=1024):
         self.dimension = dimension
+        # Query embeddings only: indexed documents are rarely embedded twice
+        # and would evict the queries
+        self.cache = LRUCache(cache_size)
     
+    def embed_query(self, text):
+        """
+        Generate embedding for a search query, reusing cached vectors for repeated queries.
+        """
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.embed(text)
+            self.cache.put(text, vector)
+        return vector
+
     def embed(self, text):
         """
         Generate embedding for text.
@@ -45,12 +71,30 @@ class EmbeddingService:
 class ZvecAdapter:
     """Adapter for Zvec vector database."""
     
-    def __init__(self, db_path, collection_name="memory_core"):
+    def __init__(self, db_path, collection_name="memory_core", partition_granularity="week", partition_probes=None,
+                 query_cache_size=256, semantic_cache_size=64, semantic_cache_radius=0.05):
         self.db_path = db_path
         self.collection_name = collection_name
+        self.partition_granularity = partition_granularity
+        self.partition_probes = partition_probes
         self.dimension = 128  # Demo dimension
         self.embedding_service = EmbeddingService(self.dimension)
         self.collection = None
+        # source_file -> ids indexed from it, so Zvec/Remote entries can be
+        # deleted by file (MockCollection finds them from its metadata)
+        self.source_ids_file = Path(db_path) / "source_ids.json"
+        self.source_ids = self._load_source_ids()
+        # Bumped on every write; part of every query cache key together with
+        # the stamp of the generation file, which writers in other processes
+        # sharing db_path replace as well
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        self.generation_file = Path(db_path) / "generation"
+        self.query_cache = QueryCache(query_cache_size)
+        # Near-duplicate queries; disabled when the radius is 0/None
+        self.semantic_cache = None
+        if semantic_cache_radius:
+            self.semantic_cache = SemanticCache(semantic_cache_size, semantic_cache_radius)
         
         self._initialize_db()
         
@@ -68,7 +112,7 @@ class ZvecAdapter:
                 print(f"[ZvecAdapter] Zvec database initialized at {self.db_path}")
             except Exception as e:
                 print(f"[ZvecAdapter] Error initializing Zvec: {e}. Falling back to Mock.")
-                self.collection = MockCollection(self.db_path)
+                self.collection = MockCollection(self.db_path, self.partition_granularity, self.partition_probes)
         else:
             # Try connecting to remote bridge
             if REQUESTS_AVAILABLE and self._try_connect_remote():
@@ -76,7 +120,7 @@ class ZvecAdapter:
                 self.collection = RemoteCollection("http://localhost:8000", self.collection_name)
             else:
                 print("[ZvecAdapter] Zvec library not found and remote bridge unreachable. Using Mock implementation.")
-                self.collection = MockCollection(self.db_path)
+                self.collection = MockCollection(self.db_path, self.partition_granularity, self.partition_probes)
 
     def _try_connect_remote(self):
         try:
@@ -105,6 +149,8 @@ class ZvecAdapter:
                     self.collection.insert([
                         zvec.Doc(id=doc_id, vectors={"embedding": vector}, fields=metadata)
                     ])
+                self._track_source(doc_id, metadata.get('source_file'))
+                self._bump_generation()
                 return True
             except Exception as e:
                 print(f"[ZvecAdapter] Insert failed: {e}")
@@ -112,41 +158,179 @@ class ZvecAdapter:
         else:
             # Mock insert
             self.collection.insert(doc_id, vector, metadata)
+            self._bump_generation()
             return True
-            
-    def search(self, query_text, top_k=5):
-        """Search for relevant memories."""
-        query_vector = self.embedding_service.embed(query_text)
-        
-        results = []
-        if self.collection and not isinstance(self.collection, MockCollection):
+
+    def remove_source(self, source_file):
+        """
+        Drop all indexed entries that came from source_file.
+
+        Returns:
+            Number of entries removed.
+        """
+        if isinstance(self.collection, MockCollection):
+            removed = self.collection.delete_source(source_file)
+        else:
+            ids = self.source_ids.get(source_file)
+            if not ids:
+                return 0
+            # Identical sections share an id (md5 of the content); keep those
+            # still indexed from another file
+            shared = {i for source, other in self.source_ids.items() if source != source_file for i in other}
+            doomed = [i for i in ids if i not in shared]
             try:
-                if isinstance(self.collection, RemoteCollection):
-                    matches = self.collection.query(query_vector, top_k)
-                    # Remote collection returns already formatted results
-                    return matches
-                else:
-                    # Zvec query
-                    matches = self.collection.query(
-                        zvec.VectorQuery("embedding", vector=query_vector),
-                        topk=top_k
-                    )
-                    # Parse results
-                    for match in matches:
-                        res = {
-                            'id': match.id,
-                            'score': match.score,
-                            'content': match.fields.get('content', ''),
-                            'metadata': match.fields
-                        }
-                        results.append(res)
+                if doomed:
+                    if isinstance(self.collection, RemoteCollection):
+                        self.collection.delete(doomed)
+                    else:
+                        self.collection.delete(ids=doomed)
             except Exception as e:
-                print(f"[ZvecAdapter] Query failed: {e}")
-                return []
+                print(f"[ZvecAdapter] Delete failed: {e}")
+                return 0
+            del self.source_ids[source_file]
+            self._save_source_ids()
+            removed = len(doomed)
+        if removed:
+            self._bump_generation()
+        return removed
+
+    def _load_source_ids(self):
+        if self.source_ids_file.exists():
+            try:
+                with open(self.source_ids_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[ZvecAdapter] Warning: Ignoring unreadable {self.source_ids_file}: {e}")
+        return {}
+
+    def _save_source_ids(self):
+        payload = json.dumps(self.source_ids, ensure_ascii=False)
+        if atomic_write is not None:
+            atomic_write(self.source_ids_file, payload)
         else:
-            # Mock query
-            results = self.collection.query(query_vector, top_k)
+            self.source_ids_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.source_ids_file, 'w', encoding='utf-8') as f:
+                f.write(payload)
+
+    def _track_source(self, doc_id, source_file):
+        """Remember which file an entry was indexed from."""
+        if not source_file:
+            return
+        ids = self.source_ids.setdefault(source_file, [])
+        if doc_id not in ids:
+            ids.append(doc_id)
+            self._save_source_ids()
+
+    def _bump_generation(self):
+        """Invalidate cached query results after a write, here and in other processes."""
+        with self._generation_lock:
+            self.generation += 1
+            generation = self.generation
+        try:
+            self.generation_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.generation_file.with_name(f".generation.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_file.write_text(str(generation), encoding="utf-8")
+            # A fresh inode per write, so the stamp changes even within one mtime tick
+            os.replace(tmp_file, self.generation_file)
+        except OSError as e:
+            print(f"[ZvecAdapter] Warning: Could not update {self.generation_file}: {e}")
+
+    def current_generation(self):
+        """Cache generation: local write counter plus the shared generation file's stamp."""
+        try:
+            stat = os.stat(self.generation_file)
+            stamp = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            stamp = None
+        return (self.generation, stamp)
             
+    def search(self, query_text, top_k=5, since=None, until=None):
+        """
+        Search for relevant memories.
+
+        since/until (YYYY-MM-DD) restrict the search to a date range; the mock
+        collection uses them to prune time partitions before scanning, the
+        Zvec and Remote backends filter over-fetched results by date.
+
+        Results are cached per (normalized query, top_k, date range, index
+        generation); concurrent identical searches share one backend call.
+        Writes through another adapter on the same db_path also invalidate
+        the cache (see current_generation).
+        """
+        query_text = normalize_query(query_text)
+        key = self.query_cache.key(query_text, top_k, self.current_generation(), since=since, until=until)
+        return self.query_cache.get_or_compute(
+            key, lambda: self._search(query_text, top_k, since, until)
+        )
+
+    def _search(self, query_text, top_k, since=None, until=None):
+        """Serve from the semantic cache if a near-identical query was seen, else query the backend."""
+        query_vector = self.embedding_service.embed_query(query_text)
+        generation = self.current_generation()
+
+        if self.semantic_cache is not None:
+            cached = self.semantic_cache.lookup(query_vector, top_k, generation, since=since, until=until)
+            if cached is not None:
+                return cached
+
+        results = self._query_backend(query_vector, top_k, since, until)
+
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(query_vector, top_k, generation, results, since=since, until=until)
+        return results
+
+    def cache_stats(self):
+        """Hit/miss counters of the query, semantic and embedding caches."""
+        return {
+            "query_cache": self.query_cache.results.stats(),
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache else None,
+            "embedding_cache": self.embedding_service.cache.stats()
+        }
+
+    def _query_backend(self, query_vector, top_k, since=None, until=None):
+        """Run a vector query against the backend collection, bypassing all caches."""
+        if not self.collection or isinstance(self.collection, MockCollection):
+            # Mock query, prunes partitions by date itself
+            return self.collection.query(query_vector, top_k, since=since, until=until)
+
+        try:
+            if not (since or until):
+                return self._query_remote(query_vector, top_k)
+
+            # Zvec and the bridge cannot filter by date: over-fetch and filter
+            # here, widening the query until top_k matches are in range or the
+            # collection is exhausted.
+            fetch = top_k * DATE_FILTER_OVERFETCH
+            while True:
+                matches = self._query_remote(query_vector, fetch)
+                results = [res for res in matches if in_date_range(res['metadata'], since, until)]
+                if len(results) >= top_k or len(matches) < fetch:
+                    return results[:top_k]
+                fetch *= 2
+        except Exception as e:
+            print(f"[ZvecAdapter] Query failed: {e}")
+            return []
+
+    def _query_remote(self, query_vector, top_k):
+        """Top-k query against the Zvec or Remote backend."""
+        if isinstance(self.collection, RemoteCollection):
+            # Remote collection returns already formatted results
+            return self.collection.query(query_vector, top_k)
+
+        # Zvec query
+        matches = self.collection.query(
+            zvec.VectorQuery("embedding", vector=query_vector),
+            topk=top_k
+        )
+        # Parse results
+        results = []
+        for match in matches:
+            results.append({
+                'id': match.id,
+                'score': match.score,
+                'content': match.fields.get('content', ''),
+                'metadata': match.fields
+            })
         return results
 
 class RemoteCollection:
@@ -173,6 +357,10 @@ class RemoteCollection:
         resp = requests.post(f"{self.base_url}/insert", json=payload)
         resp.raise_for_status()
         
+    def delete(self, ids):
+        resp = requests.post(f"{self.base_url}/delete", json={"ids": ids})
+        resp.raise_for_status()
+
     def query(self, vector, top_k):
         payload = {
             "vector": vector,
@@ -193,52 +381,203 @@ class RemoteCollection:
             })
         return results
 
+PARTITION_GRANULARITIES = ("day", "week", "month")
+UNDATED_PARTITION = "undated"
+# Date-filtered queries on backends without date pruning fetch this many
+# times top_k before filtering
+DATE_FILTER_OVERFETCH = 4
+
+
+def partition_key(metadata, granularity="week"):
+    """
+    Compute the time partition of an item from its metadata.
+
+    The date comes from the daily file the memory lives in (memory/YYYY-MM-DD.md),
+    falling back to the insert timestamp.
+    """
+    date_str = Path(metadata.get('source_file', '')).stem
+    try:
+        day = datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        try:
+            day = datetime.fromisoformat(metadata.get('timestamp', '')).date()
+        except ValueError:
+            return UNDATED_PARTITION, None
+
+    if granularity == "day":
+        key = day.isoformat()
+    elif granularity == "month":
+        key = day.strftime("%Y-%m")
+    else:
+        year, week, _ = day.isocalendar()
+        key = f"{year}-W{week:02d}"
+    return key, day.isoformat()
+
+
+def in_date_range(metadata, since=None, until=None):
+    """Whether an item's date (see partition_key) lies within [since, until]; undated items never do."""
+    _, day = partition_key(metadata)
+    if day is None:
+        return False
+    return not ((since and day < since) or (until and day > until))
+
+
 class MockCollection:
-    """Mock implementation of a vector collection using simple list."""
+    """
+    Mock implementation of a vector collection using simple list.
+
+    Items are grouped into time partitions (day/week/month) with a running
+    centroid each, so queries can rank partitions first and only scan the
+    vectors of the best ones.
+    """
     
-    def __init__(self, path):
+    def __init__(self, path, granularity="week", probes=None):
+        if granularity not in PARTITION_GRANULARITIES:
+            raise ValueError(f"Unknown partition granularity: {granularity}")
         self.path = Path(path)
         self.data_file = self.path / "mock_data.json"
+        self.granularity = granularity
+        self.probes = probes
         self.items = []
+        # partition key -> {'ids': set, 'sum': [...], 'start': date, 'end': date}
+        self.partitions = {}
+        self._by_id = {}
+        # (inode, mtime_ns) of data_file when last loaded or saved
+        self._stamp = None
         self._load()
         
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.data_file)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
     def _load(self):
+        self._stamp = self._file_stamp()
         if self.data_file.exists():
             try:
                 with open(self.data_file, 'r', encoding='utf-8') as f:
                     self.items = json.load(f)
             except:
                 self.items = []
+        self._build_partitions()
+
+    def reload_if_changed(self):
+        """Pick up items written by another process sharing the data file."""
+        if self._file_stamp() != self._stamp:
+            self._load()
+
+    def _build_partitions(self):
+        self.partitions = {}
+        self._by_id = {}
+        for item in self.items:
+            self._add_to_partition(item)
+
+    def _add_to_partition(self, item):
+        key, day = partition_key(item['metadata'], self.granularity)
+        item['partition'] = key
+        part = self.partitions.setdefault(key, {'ids': set(), 'sum': [0.0] * len(item['vector']), 'start': day, 'end': day})
+        part['ids'].add(item['id'])
+        part['sum'] = [a + b for a, b in zip(part['sum'], item['vector'])]
+        if day:
+            part['start'] = min(part['start'], day)
+            part['end'] = max(part['end'], day)
+        self._by_id[item['id']] = item
+
+    def _remove_from_partition(self, item):
+        part = self.partitions.get(item.get('partition'))
+        if part is None:
+            return
+        part['ids'].discard(item['id'])
+        if part['ids']:
+            part['sum'] = [a - b for a, b in zip(part['sum'], item['vector'])]
+        else:
+            del self.partitions[item['partition']]
+        del self._by_id[item['id']]
                 
     def _save(self):
         if not self.path.exists():
             self.path.mkdir(parents=True, exist_ok=True)
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.items, f, ensure_ascii=False, indent=2)
+        items = [{k: v for k, v in item.items() if k != 'partition'} for item in self.items]
+        payload = json.dumps(items, ensure_ascii=False, indent=2)
+        if atomic_write is not None:
+            atomic_write(self.data_file, payload)
+        else:
+            with open(self.data_file, 'w', encoding='utf-8') as f:
+                f.write(payload)
+        self._stamp = self._file_stamp()
             
     def insert(self, doc_id, vector, metadata):
+        self.reload_if_changed()
         # Remove existing if any
-        self.items = [item for item in self.items if item['id'] != doc_id]
+        existing = self._by_id.get(doc_id)
+        if existing is not None:
+            self._remove_from_partition(existing)
+            self.items = [item for item in self.items if item['id'] != doc_id]
         
-        self.items.append({
+        item = {
             'id': doc_id,
             'vector': vector,
             'metadata': metadata
-        })
+        }
+        self.items.append(item)
+        self._add_to_partition(item)
         self._save()
+
+    def delete_source(self, source_file):
+        """Remove every item whose metadata points at source_file."""
+        self.reload_if_changed()
+        doomed = [item for item in self.items if item['metadata'].get('source_file') == source_file]
+        if not doomed:
+            return 0
+        for item in doomed:
+            self._remove_from_partition(item)
+        doomed_ids = {item['id'] for item in doomed}
+        self.items = [item for item in self.items if item['id'] not in doomed_ids]
+        self._save()
+        return len(doomed)
+
+    def rank_partitions(self, query_vector, since=None, until=None):
+        """Rank partitions by centroid similarity, honouring an optional date range."""
+        ranked = []
+        for key, part in self.partitions.items():
+            if since or until:
+                if key == UNDATED_PARTITION:
+                    continue
+                if since and part['end'] < since:
+                    continue
+                if until and part['start'] > until:
+                    continue
+            # The summed vector has the same direction as the centroid
+            ranked.append((key, self._cosine_similarity(query_vector, part['sum'])))
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        return ranked
         
-    def query(self, query_vector, top_k):
-        # Calculate cosine similarity
+    def query(self, query_vector, top_k, probes=None, since=None, until=None):
+        self.reload_if_changed()
+        probes = probes if probes is not None else self.probes
+        ranked = self.rank_partitions(query_vector, since, until)
+        if probes:
+            ranked = ranked[:probes]
+
+        # Calculate cosine similarity within the probed partitions only
         scored_items = []
-        for item in self.items:
-            vec = item['vector']
-            score = self._cosine_similarity(query_vector, vec)
-            scored_items.append({
-                'id': item['id'],
-                'score': score,
-                'content': item['metadata'].get('content', ''),
-                'metadata': item['metadata']
-            })
+        for key, _ in ranked:
+            for doc_id in self.partitions[key]['ids']:
+                item = self._by_id[doc_id]
+                if since or until:
+                    _, day = partition_key(item['metadata'], self.granularity)
+                    if (since and day < since) or (until and day > until):
+                        continue
+                vec = item['vector']
+                score = self._cosine_similarity(query_vector, vec)
+                scored_items.append({
+                    'id': item['id'],
+                    'score': score,
+                    'content': item['metadata'].get('content', ''),
+                    'metadata': item['metadata']
+                })
             
         # Sort by score desc
         scored_items.sort(key=lambda x: x['score'], reverse=True)
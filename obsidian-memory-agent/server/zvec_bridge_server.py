@@ -24,6 +24,9 @@ class DocItem(BaseModel):
     vectors: Dict[str, List[float]]
     fields: Dict[str, Any]
 
+class DeleteRequest(BaseModel):
+    ids: List[str]
+
 class QueryRequest(BaseModel):
     vector: List[float]
     top_k: int = 5
@@ -66,6 +69,18 @@ def insert_docs(docs: List[DocItem]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/delete")
+def delete_docs(req: DeleteRequest):
+    global collection
+    if not collection:
+        raise HTTPException(status_code=400, detail="Collection not initialized")
+    
+    try:
+        collection.delete(ids=req.ids)
+        return {"status": "deleted", "count": len(req.ids)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/query")
 def query_docs(req: QueryRequest):
     global collection
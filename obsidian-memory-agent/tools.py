@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import hashlib
 from pathlib import Path
@@ -8,11 +9,23 @@ from core.markdown_manager import MarkdownManager
 # Configuration
 CONFIG_PATH = Path(__file__).parent / "config.json"
 DEFAULT_ROOT = str(Path(__file__).parent.parent.parent)
+# Sibling retriever skill, provides the vault file watcher
+RETRIEVER_SCRIPTS = Path(__file__).parent.parent / "obsidian-memory-retriever" / "scripts"
+# Sibling recorder skill, calls registered hooks after each record it writes
+RECORDER_SCRIPTS = Path(__file__).parent.parent / "obsidian-memory-recorder" / "scripts"
 
 def load_config():
     config = {
         "memory_root": DEFAULT_ROOT,
-        "zvec_db_path": os.path.join(DEFAULT_ROOT, ".zvec_db")
+        "zvec_db_path": os.path.join(DEFAULT_ROOT, ".zvec_db"),
+        "partition_granularity": "week",
+        "partition_probes": None,
+        "query_cache_size": 256,
+        "semantic_cache_size": 64,
+        "semantic_cache_radius": 0.05,
+        "watch_memory": False,
+        "durability": None,
+        "durability_interval_ms": None
     }
     
     if CONFIG_PATH.exists():
@@ -40,6 +53,16 @@ def load_config():
                     zvec_path = str(project_root / zvec_path)
                 
                 config["zvec_db_path"] = zvec_path
+
+                # Time-partitioned search settings
+                config["partition_granularity"] = user_config.get("partition_granularity", config["partition_granularity"])
+                config["partition_probes"] = user_config.get("partition_probes", config["partition_probes"])
+                config["query_cache_size"] = user_config.get("query_cache_size", config["query_cache_size"])
+                config["semantic_cache_size"] = user_config.get("semantic_cache_size", config["semantic_cache_size"])
+                config["semantic_cache_radius"] = user_config.get("semantic_cache_radius", config["semantic_cache_radius"])
+                config["watch_memory"] = user_config.get("watch_memory", config["watch_memory"])
+                config["durability"] = user_config.get("durability", config["durability"])
+                config["durability_interval_ms"] = user_config.get("durability_interval_ms", config["durability_interval_ms"])
                 
         except Exception as e:
             print(f"Warning: Failed to load config.json: {e}")
@@ -53,9 +76,31 @@ def load_config():
 
 CFG = load_config()
 
+# Durability of persisted state, defaults to "always" or OBSIDIAN_MEMORY_DURABILITY
+# (see obsidian-memory-recorder/scripts/persistence.py)
+if str(RECORDER_SCRIPTS) not in sys.path:
+    sys.path.append(str(RECORDER_SCRIPTS))
+try:
+    from persistence import atomic_write, set_durability
+except ImportError:
+    atomic_write = None
+else:
+    if CFG["durability"]:
+        try:
+            set_durability(CFG["durability"], CFG["durability_interval_ms"])
+        except ValueError as e:
+            print(f"Warning: Invalid durability setting in config.json, keeping the default: {e}")
+
 # Initialize Singletons
 md_manager = MarkdownManager(CFG["memory_root"])
-zvec_adapter = ZvecAdapter(CFG["zvec_db_path"])
+zvec_adapter = ZvecAdapter(
+    CFG["zvec_db_path"],
+    partition_granularity=CFG["partition_granularity"],
+    partition_probes=CFG["partition_probes"],
+    query_cache_size=CFG["query_cache_size"],
+    semantic_cache_size=CFG["semantic_cache_size"],
+    semantic_cache_radius=CFG["semantic_cache_radius"]
+)
 
 def configure_memory_path(path: str) -> str:
     """
@@ -75,8 +120,12 @@ def configure_memory_path(path: str) -> str:
         
         current_config["memory_root"] = path
         
-        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-            json.dump(current_config, f, indent=2)
+        payload = json.dumps(current_config, indent=2)
+        if atomic_write is not None:
+            atomic_write(CONFIG_PATH, payload)
+        else:
+            with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
+                f.write(payload)
             
         return f"Configuration updated. New memory root: {path}. Please restart the agent/skill to apply changes."
     except Exception as e:
@@ -112,18 +161,20 @@ def remember_event(content: str, importance: int = 3, tags: list = None) -> str:
     else:
         return f"Memory stored in {file_path} but failed to index."
 
-def recall_context(query: str, top_k: int = 5) -> str:
+def recall_context(query: str, top_k: int = 5, since: str = None, until: str = None) -> str:
     """
     Retrieve relevant context based on a query.
     
     Args:
         query: The search query.
         top_k: Number of results to return.
+        since: Optional start date (YYYY-MM-DD, inclusive).
+        until: Optional end date (YYYY-MM-DD, inclusive).
         
     Returns:
         Formatted string of relevant memories.
     """
-    results = zvec_adapter.search(query, top_k)
+    results = zvec_adapter.search(query, top_k, since=since, until=until)
     
     if not results:
         return "No relevant memories found."
@@ -141,6 +192,44 @@ def recall_context(query: str, top_k: int = 5) -> str:
         
     return output
 
+def sync_file(file_path) -> int:
+    """
+    Re-index a single Markdown file.
+
+    Entries previously indexed from this file are dropped first, so edits
+    and deletions do not leave stale vectors.
+
+    Returns:
+        Number of entries indexed.
+    """
+    zvec_adapter.remove_source(str(file_path))
+    if not Path(file_path).exists():
+        return 0
+
+    count = 0
+    for block in md_manager.iter_entries(file_path):
+        clean_content = block["text"].strip()
+        metadata = {
+            "source_file": str(file_path),
+            "sync": True,
+            "offset": [block["start"], block["end"]]
+        }
+        if block["kind"] == "entry":
+            fields = block["fields"]
+            metadata["title"] = block["title"]
+            metadata["time"] = block["time"]
+            if "importance" in fields:
+                metadata["importance"] = fields["importance"].count("⭐") or 3
+            if "tags" in fields:
+                metadata["tags"] = fields["tags"].split()
+
+        # Same id as index_recorded_section: md5 of the stripped section
+        doc_id = hashlib.md5(clean_content.encode('utf-8')).hexdigest()
+        zvec_adapter.add_memory(doc_id, clean_content, metadata)
+        count += 1
+
+    return count
+
 def sync_memory() -> str:
     """
     Force synchronization of all Markdown files to Zvec index.
@@ -150,25 +239,68 @@ def sync_memory() -> str:
     count = 0
     
     for file_path in files:
-        content = md_manager.read_file(file_path)
-        # Simple chunking: split by "---" separator used in append_entry
-        entries = content.split("\n---\n")
-        
-        for entry in entries:
-            if not entry.strip() or entry.startswith("---"): # Skip frontmatter
-                continue
-                
-            # Extract content (removing headers if possible, simplified here)
-            clean_content = entry.strip()
-            
-            doc_id = hashlib.md5(clean_content.encode('utf-8')).hexdigest()
-            metadata = {"source_file": str(file_path), "sync": True}
-            
-            zvec_adapter.add_memory(doc_id, clean_content, metadata)
-            count += 1
+        count += sync_file(file_path)
             
     return f"Synced {count} memory entries from {len(files)} files."
 
+_watcher = None
+
+def start_memory_watcher() -> str:
+    """
+    Watch memory/*.md and MEMORY.md and re-index changed files incrementally,
+    so manual edits in Obsidian are searchable without calling sync_memory.
+
+    Uses the file watcher of the sibling obsidian-memory-retriever skill.
+    """
+    global _watcher
+    if _watcher is not None:
+        return f"Memory watcher already running ({_watcher.backend})."
+
+    if str(RETRIEVER_SCRIPTS) not in sys.path:
+        sys.path.append(str(RETRIEVER_SCRIPTS))
+    try:
+        from watcher import VaultWatcher
+    except ImportError:
+        return "Memory watcher unavailable: obsidian-memory-retriever skill not found."
+
+    def on_change(paths):
+        for path in paths:
+            sync_file(path)
+
+    _watcher = VaultWatcher(md_manager.root_path, on_change).start()
+    return f"Memory watcher started ({_watcher.backend})."
+
+def index_recorded_section(vault_path, record) -> bool:
+    """
+    Post-write hook for the recorder scripts: index the new section directly,
+    so records written in this process are searchable without a sync.
+
+    Records written to a vault other than memory_root are ignored.
+    """
+    if Path(vault_path).resolve() != md_manager.root_path.resolve():
+        return False
+
+    content = record["section"].strip()
+    doc_id = hashlib.md5(content.encode('utf-8')).hexdigest()
+    metadata = {
+        "source_file": record["file"],
+        "title": record.get("title", ""),
+        "type": record.get("type", ""),
+        "importance": record.get("importance", 3),
+        "tags": record.get("tags", []),
+        "offset": [record["start"], record["end"]]
+    }
+    return zvec_adapter.add_memory(doc_id, content, metadata)
+
+try:
+    from index_hook import register_hook
+    register_hook(index_recorded_section)
+except ImportError:
+    pass
+
+if CFG["watch_memory"]:
+    start_memory_watcher()
+
 if __name__ == "__main__":
     # Simple CLI test
     print(f"Using config: {CFG}")
@@ -6,6 +6,15 @@ import json
 import sys
 from pathlib import Path
 
+# 同级的记录技能提供原子写入；不可用时直接覆盖写入
+RECORDER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-recorder" / "scripts"
+if str(RECORDER_SCRIPTS) not in sys.path:
+    sys.path.append(str(RECORDER_SCRIPTS))
+try:
+    from persistence import atomic_write
+except ImportError:
+    atomic_write = None
+
 
 def get_config_path():
     """获取配置文件路径"""
@@ -51,7 +60,12 @@ def get_default_config():
             "retention_days": 365,
             "daily_log_format": "{Date}.md",
             "memory_md_path": "MEMORY.md",
-            "memory_folder": "memory"
+            "memory_folder": "memory",
+            "core_memory_max_items": 30,
+            "core_memory_keep_recent": 10,
+            "core_memory_pin_importance": 5,
+            "core_memory_max_bytes": 16384,
+            "core_memory_archive_folder": "archive/core_memory"
         },
         "ui_preferences": {
             "show_confirmations": True,
@@ -74,13 +88,27 @@ def load_config():
     return None
 
 
+def get_memory_rules():
+    """获取记忆规则（配置文件中的值覆盖默认值）"""
+    rules = dict(get_default_config()["memory_rules"])
+    config = load_config()
+    if config:
+        rules.update(config.get("memory_rules", {}))
+    return rules
+
+
 def save_config(config):
     """保存配置文件"""
     config_path = get_config_path()
     config_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(config_path, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    payload = json.dumps(config, ensure_ascii=False, indent=2)
+    if atomic_write is not None:
+        # 先写临时文件再替换，写入中途崩溃不会留下被截断的配置
+        atomic_write(config_path, payload)
+    else:
+        with open(config_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
     
     return True
 
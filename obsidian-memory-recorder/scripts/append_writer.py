@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+每日日志追加写入
+
+记录脚本共用的写入路径：只追加新章节的字节，不再读取并重写整个文件，
+单次写入的开销与当天文件大小无关。
+
+- 文件已存在: 以追加模式打开，持有 advisory 文件锁 (flock) 写入新字节
+- 文件不存在: 先写临时文件，再用 link 原子地创建目标文件，其他进程
+  永远不会看到只有一半 frontmatter 的文件；若同时有别人先创建了文件，
+  回退为追加
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 flock，追加模式下的单次 write 仍然落在文件末尾
+    fcntl = None
+
+
+def append_bytes(filepath, data):
+    """在文件锁保护下追加字节，返回写入的起始偏移"""
+    with open(filepath, "ab") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            start = f.seek(0, os.SEEK_END)
+            f.write(data)
+            f.flush()
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    return start
+
+
+def _umask():
+    """当前进程的 umask（os.umask 只能通过设置来读取）"""
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+def create_file(filepath, data):
+    """
+    原子地创建带内容的新文件
+
+    Returns:
+        是否创建成功（文件已存在时返回 False）
+    """
+    # 按年月分片时，新月份的目录可能还不存在
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{filepath.name}.", suffix=".tmp", dir=filepath.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp 创建的文件只有属主可读写，按 umask 还原普通新文件的权限
+        os.chmod(tmp_path, 0o666 & ~_umask())
+        os.link(tmp_path, filepath)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.unlink(tmp_path)
+
+
+def append_section(filepath, section, initial=""):
+    """
+    把章节追加到每日日志
+
+    Args:
+        filepath: 每日日志路径
+        section: 要追加的章节文本
+        initial: 文件不存在时写在章节前面的内容（frontmatter 和标题）
+
+    Returns:
+        (章节起始字节偏移, 是否新建了文件)
+    """
+    filepath = Path(filepath)
+    data = section.encode("utf-8")
+
+    if not filepath.exists():
+        head = initial.encode("utf-8")
+        if create_file(filepath, head + data):
+            return len(head), True
+
+    return append_bytes(filepath, data), False
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+每日日志保留期归档
+
+memory_rules.retention_days 规定了 memory/ 中每日日志的保留天数。归档任务把
+早于保留期的日志按月份打包成压缩包，让 memory/ 只保留近期的热数据:
+
+- <笔记库>/archive/logs/YYYY-MM.zip   当月所有已归档的日志（deflate 压缩）
+- <笔记库>/archive/logs/catalog.json  每个日志的所在压缩包、日期、原 mtime 和大小
+
+检索技能通过 catalog 列出归档日志，命中时才解压对应的单个文件；分区索引中
+已有的向量按原 mtime 和大小继续复用，无需重新生成。
+
+写入顺序为 压缩包 -> catalog -> 删除原文件，中途崩溃最多留下一份重复的
+日志（memory/ 中的版本优先），重新运行即可完成归档。
+"""
+
+import io
+import json
+import os
+import sys
+import zipfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+try:
+    from compact_memory import load_memory_rules
+    from write_coordinator import get_coordinator
+    from persistence import atomic_write
+    from index_hook import notify_changed_paths
+    from memory_paths import MemoryLayout
+except ImportError:
+    sys.path.append(str(Path(__file__).parent))
+    from compact_memory import load_memory_rules
+    from write_coordinator import get_coordinator
+    from persistence import atomic_write
+    from index_hook import notify_changed_paths
+    from memory_paths import MemoryLayout
+
+
+# 与 obsidian-memory-retriever/scripts/archive_store.py 保持一致
+ARCHIVE_FOLDER = Path("archive") / "logs"
+CATALOG_FILE = "catalog.json"
+DEFAULT_RETENTION_DAYS = 365
+
+
+def log_date(md_file):
+    """
+    从每日日志的文件名解析日期
+
+    Returns:
+        date，文件名不是 YYYY-MM-DD 时返回 None
+    """
+    try:
+        return datetime.strptime(Path(md_file).stem, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def load_catalog(archive_dir):
+    """读取归档目录，不存在时返回空目录"""
+    try:
+        with open(archive_dir / CATALOG_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"files": {}}
+
+
+def expired_logs(vault_path, retention_days, today=None):
+    """
+    列出超过保留期的每日日志
+
+    Args:
+        vault_path: 笔记库路径
+        retention_days: 保留天数
+        today: 基准日期，默认今天
+
+    Returns:
+        {月份 (YYYY-MM): [文件路径, ...]}
+    """
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    # 按年月分片时，保留期内的目录整个跳过
+    last_day = (cutoff - timedelta(days=1)).isoformat()
+    by_month = {}
+    for md_file in sorted(MemoryLayout(vault_path).files(until=last_day)):
+        day = log_date(md_file)
+        if day is None or day >= cutoff:
+            continue
+        by_month.setdefault(day.strftime("%Y-%m"), []).append(md_file)
+    return by_month
+
+
+def write_bundle(bundle_path, members):
+    """
+    合并已有压缩包并写入新成员（同名成员以新内容为准），原子替换
+
+    Args:
+        bundle_path: 压缩包路径
+        members: {文件名: (内容字节, mtime)}
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as bundle:
+        if bundle_path.exists():
+            with zipfile.ZipFile(bundle_path) as existing:
+                for info in existing.infolist():
+                    if info.filename not in members:
+                        bundle.writestr(info, existing.read(info.filename))
+        for name in sorted(members):
+            data, mtime = members[name]
+            info = zipfile.ZipInfo(name, datetime.fromtimestamp(mtime).timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            bundle.writestr(info, data)
+    atomic_write(bundle_path, buffer.getvalue())
+
+    # 写入后校验，确认每个新成员都能完整读回
+    with zipfile.ZipFile(bundle_path) as written:
+        for name, (data, _) in members.items():
+            if written.read(name) != data:
+                raise IOError(f"压缩包校验失败: {bundle_path.name}/{name}")
+
+
+def archive_old_logs(vault_path, retention_days=None, dry_run=False, today=None):
+    """
+    把超过保留期的每日日志归档到按月的压缩包
+
+    Args:
+        vault_path: 笔记库路径
+        retention_days: 保留天数，默认读取 memory_rules.retention_days
+        dry_run: 只统计，不写入
+        today: 基准日期，默认今天
+
+    Returns:
+        统计信息 {"archived", "bytes_before", "bytes_after", "bundles"}
+    """
+    vault = Path(vault_path)
+    if retention_days is None:
+        retention_days = load_memory_rules().get("retention_days", DEFAULT_RETENTION_DAYS)
+    archive_dir = vault / ARCHIVE_FOLDER
+
+    by_month = expired_logs(vault, retention_days, today)
+    stats = {"archived": 0, "bytes_before": 0, "bytes_after": 0, "bundles": sorted(by_month)}
+    if dry_run or not by_month:
+        for files in by_month.values():
+            stats["archived"] += len(files)
+            stats["bytes_before"] += sum(f.stat().st_size for f in files)
+        return stats
+
+    coordinator = get_coordinator(vault)
+    catalog = load_catalog(archive_dir)
+    snapshots = {}
+    for month, files in sorted(by_month.items()):
+        bundle_name = f"{month}.zip"
+        members = {}
+        for md_file in files:
+            stat = md_file.stat()
+            data = md_file.read_bytes()
+            members[md_file.name] = (data, stat.st_mtime)
+            snapshots[md_file] = (stat.st_mtime, stat.st_size)
+            catalog["files"][md_file.name] = {
+                "bundle": bundle_name,
+                "date": md_file.stem,
+                "mtime": stat.st_mtime,
+                "size": stat.st_size
+            }
+            stats["bytes_before"] += len(data)
+        write_bundle(archive_dir / bundle_name, members)
+        stats["bytes_after"] += (archive_dir / bundle_name).stat().st_size
+
+    atomic_write(archive_dir / CATALOG_FILE, json.dumps(catalog, ensure_ascii=False, indent=2))
+
+    # 压缩包和 catalog 就绪后才删除原文件；归档期间被追加过的日志留到下次
+    removed = []
+    for md_file, snapshot in snapshots.items():
+        with coordinator.locked(md_file):
+            stat = md_file.stat()
+            if (stat.st_mtime, stat.st_size) != snapshot:
+                print(f"⚠️ 警告: {md_file.name} 在归档期间被修改，保留原文件")
+                continue
+            os.unlink(md_file)
+        removed.append(md_file)
+    stats["archived"] = len(removed)
+
+    notify_changed_paths(vault, removed)
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python archive_logs.py <笔记库路径> [--days N] [--dry-run]")
+        print("\n把超过 memory_rules.retention_days 的每日日志按月打包到 archive/logs/")
+        sys.exit(1)
+
+    vault_path = sys.argv[1]
+    dry_run = "--dry-run" in sys.argv
+    retention_days = None
+    if "--days" in sys.argv:
+        retention_days = int(sys.argv[sys.argv.index("--days") + 1])
+
+    if not (Path(vault_path) / "memory").exists():
+        print("❌ 错误: memory 文件夹不存在")
+        sys.exit(1)
+
+    stats = archive_old_logs(vault_path, retention_days, dry_run=dry_run)
+    prefix = "🔍 [预览] " if dry_run else "✓ "
+    print(f"{prefix}归档 {stats['archived']} 个日志，{stats['bytes_before']} -> {stats['bytes_after']} 字节")
+    for month in stats["bundles"]:
+        print(f"  📦 {month}.zip")
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+MEMORY.md 分层压缩
+
+sync_to_core_memory 会不断把决策和偏好插到 MEMORY.md 中，而 Agent 每次都要
+加载整个文件作为常驻上下文。压缩任务让 MEMORY.md 保持在固定的预算内:
+
+- 热层（MEMORY.md）: 每个章节保留最新的若干条，再按重要程度补足；
+  超出条目或字节上限时压缩到上限的 75%，留出余量分摊压缩开销
+- 冷层（归档文件）: 其余条目按月份移到 <归档目录>/YYYY-MM.md，MEMORY.md 末尾的
+  "## 核心记忆归档" 章节列出各归档文件的链接，归档文件链接回 [[MEMORY]]
+
+预算来自 obsidian-memory-manager 配置中的 memory_rules:
+  core_memory_max_items       每个章节最多保留的条目数
+  core_memory_keep_recent     每个章节无条件保留的最新条目数
+  core_memory_pin_importance  达到该重要程度的条目优先保留
+  core_memory_max_bytes       MEMORY.md 的字节上限
+  core_memory_archive_folder  归档目录（相对笔记库）
+"""
+
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+try:
+    from sync_utils import SECTION_HEADINGS
+    from write_coordinator import get_coordinator
+    from persistence import atomic_write
+except ImportError:
+    sys.path.append(str(Path(__file__).parent))
+    from sync_utils import SECTION_HEADINGS
+    from write_coordinator import get_coordinator
+    from persistence import atomic_write
+
+
+# 同级的管理技能，提供 memory_rules 配置
+MANAGER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-manager" / "scripts"
+
+DEFAULT_RULES = {
+    "core_memory_max_items": 30,
+    "core_memory_keep_recent": 10,
+    "core_memory_pin_importance": 5,
+    "core_memory_max_bytes": 16384,
+    "core_memory_archive_folder": "archive/core_memory"
+}
+
+ARCHIVE_HEADING = "## 核心记忆归档"
+
+# 各章节中一个条目的起始行
+ITEM_STARTS = {
+    SECTION_HEADINGS["用户偏好"]: re.compile(r"^- ", re.M),
+    SECTION_HEADINGS["决策"]: re.compile(r"^### ", re.M)
+}
+
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+IMPORTANCE_PATTERN = re.compile(r"重要程度:\s*(⭐+|\d)")
+DEFAULT_IMPORTANCE = 3
+
+# 压缩时降到预算的该比例以下，留出余量，避免之后每插入一条就再压缩一次
+LOW_WATER_RATIO = 0.75
+
+
+def load_memory_rules():
+    """
+    读取压缩预算
+
+    Returns:
+        memory_rules 字典（管理器配置不可用时使用默认值）
+    """
+    rules = dict(DEFAULT_RULES)
+    if str(MANAGER_SCRIPTS) not in sys.path:
+        sys.path.append(str(MANAGER_SCRIPTS))
+    try:
+        from config_manager import get_memory_rules
+        rules.update(get_memory_rules())
+    except ImportError:
+        pass
+    return rules
+
+
+def split_sections(text):
+    """
+    按二级标题切分 Markdown
+
+    Returns:
+        (第一个二级标题之前的内容, [[标题行, 正文], ...])
+    """
+    starts = [m.start() for m in re.finditer(r"^## ", text, re.M)]
+    if not starts:
+        return text, []
+    sections = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        line_end = text.find("\n", start, end)
+        if line_end < 0:
+            line_end = end
+        sections.append([text[start:line_end], text[line_end:end]])
+    return text[:starts[0]], sections
+
+
+def parse_items(body, heading):
+    """
+    解析章节中的条目
+
+    Returns:
+        (条目之前的内容, [条目字典, ...])，条目按文件中的顺序（最新在前）
+    """
+    starts = [m.start() for m in ITEM_STARTS[heading].finditer(body)]
+    if not starts:
+        return body, []
+    items = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(body)
+        text = body[start:end]
+        date_match = DATE_PATTERN.search(text)
+        importance_match = IMPORTANCE_PATTERN.search(text)
+        importance = DEFAULT_IMPORTANCE
+        if importance_match:
+            value = importance_match.group(1)
+            importance = int(value) if value.isdigit() else len(value)
+        items.append({
+            "text": text,
+            "date": date_match.group(0) if date_match else None,
+            "importance": importance,
+            "position": i
+        })
+    return body[:starts[0]], items
+
+
+def select_items(items, rules):
+    """
+    选出保留在热层的条目
+
+    Returns:
+        (保留的条目, 归档的条目)，均保持原顺序
+    """
+    keep_recent = rules["core_memory_keep_recent"]
+    max_items = max(keep_recent, int(rules["core_memory_max_items"] * LOW_WATER_RATIO))
+    pin = rules["core_memory_pin_importance"]
+
+    kept = set(range(min(keep_recent, len(items))))
+    # 其余条目按 (是否达到置顶重要程度, 重要程度, 新旧) 排序补足
+    candidates = sorted(
+        (item for item in items if item["position"] not in kept),
+        key=lambda item: (item["importance"] < pin, -item["importance"], item["position"])
+    )
+    for item in candidates:
+        if len(kept) >= max_items:
+            break
+        kept.add(item["position"])
+
+    return ([item for item in items if item["position"] in kept],
+            [item for item in items if item["position"] not in kept])
+
+
+def render_body(preamble, items, original_body):
+    """重新拼接章节正文，保留原正文末尾的空白"""
+    trailing = original_body[len(original_body.rstrip()):]
+    return (preamble + "".join(item["text"] for item in items)).rstrip() + trailing
+
+
+def archive_month(item):
+    """条目归档到的月份"""
+    return item["date"][:7] if item["date"] else datetime.now().strftime("%Y-%m")
+
+
+def merge_archive(path, month, archived):
+    """
+    把条目并入月份归档文件（按日期倒序，按文本去重）
+
+    Returns:
+        归档文件中的条目总数
+    """
+    existing = {heading: [] for heading in ITEM_STARTS}
+    if path.exists():
+        _, sections = split_sections(path.read_text(encoding="utf-8"))
+        for heading_line, body in sections:
+            heading = heading_line.strip()
+            if heading in existing:
+                existing[heading] = parse_items(body, heading)[1]
+
+    lines = [
+        f"# 核心记忆归档: {month}\n",
+        "\n",
+        "从 [[MEMORY]] 压缩归档的条目，原始记录仍在对应的每日日志中。\n"
+    ]
+    total = 0
+    for heading in ITEM_STARTS:
+        seen = set()
+        merged = []
+        for item in archived.get(heading, []) + existing[heading]:
+            key = item["text"].strip()
+            if key not in seen:
+                seen.add(key)
+                merged.append(item)
+        merged.sort(key=lambda item: item["date"] or "", reverse=True)
+        total += len(merged)
+        body = "".join(item["text"] if item["text"].endswith("\n") else item["text"] + "\n" for item in merged)
+        lines.append(f"\n{heading}\n\n{body}")
+
+    atomic_write(path, "".join(lines))
+    return total
+
+
+def count_archive(path):
+    """统计归档文件中的条目数"""
+    _, sections = split_sections(path.read_text(encoding="utf-8"))
+    return sum(
+        len(parse_items(body, heading_line.strip())[1])
+        for heading_line, body in sections
+        if heading_line.strip() in ITEM_STARTS
+    )
+
+
+def render_archive_index(archive_dir, archive_folder, counts):
+    """生成 "## 核心记忆归档" 章节的正文"""
+    months = {p.stem for p in archive_dir.glob("*.md")} if archive_dir.exists() else set()
+    lines = []
+    for month in sorted(months, reverse=True):
+        count = counts[month] if month in counts else count_archive(archive_dir / f"{month}.md")
+        lines.append(f"- [[{archive_folder}/{month}|{month}]]: {count} 条\n")
+    return "\n\n" + "".join(lines)
+
+
+def _plan(text, rules):
+    """
+    计算压缩后的 MEMORY.md 各部分
+
+    Returns:
+        (前言, 章节列表, 按月份和章节分组的归档条目)
+    """
+    preamble, sections = split_sections(text)
+    tracked = []
+    for section in sections:
+        heading = section[0].strip()
+        if heading in ITEM_STARTS:
+            item_preamble, items = parse_items(section[1], heading)
+            kept, archived = select_items(items, rules)
+            tracked.append({"section": section, "heading": heading, "preamble": item_preamble,
+                            "original": section[1], "kept": kept, "archived": archived})
+
+    def render():
+        for entry in tracked:
+            entry["section"][1] = render_body(entry["preamble"], entry["kept"], entry["original"])
+        return preamble + "".join(h + b for h, b in sections)
+
+    # 字节预算：依次移走最不重要、最旧的保留条目
+    max_bytes = int(rules["core_memory_max_bytes"] * LOW_WATER_RATIO)
+    while len(render().encode("utf-8")) > max_bytes:
+        candidates = [(item["importance"], -item["position"], i, item)
+                      for i, entry in enumerate(tracked) for item in entry["kept"]]
+        if not candidates:
+            break
+        _, _, i, victim = min(candidates, key=lambda c: c[:3])
+        tracked[i]["kept"].remove(victim)
+        tracked[i]["archived"].append(victim)
+
+    render()
+    by_month = {}
+    for entry in tracked:
+        for item in entry["archived"]:
+            by_month.setdefault(archive_month(item), {}).setdefault(entry["heading"], []).append(item)
+    return preamble, sections, by_month
+
+
+def count_items(text):
+    """
+    统计各受管章节的条目数
+
+    Returns:
+        {章节标题: 条目数}，同名章节出现多次时取最大值
+    """
+    _, sections = split_sections(text)
+    counts = {}
+    for heading_line, body in sections:
+        heading = heading_line.strip()
+        if heading in ITEM_STARTS:
+            counts[heading] = max(counts.get(heading, 0), len(ITEM_STARTS[heading].findall(body)))
+    return counts
+
+
+def over_budget(size, counts, rules):
+    """
+    根据文件字节数和各章节条目数判断是否超出预算（无需重新读取 MEMORY.md）
+
+    Args:
+        size: MEMORY.md 的字节数
+        counts: {章节标题: 条目数}
+        rules: 压缩预算
+    """
+    if size > rules["core_memory_max_bytes"]:
+        return True
+    return any(count > rules["core_memory_max_items"] for count in counts.values())
+
+
+def needs_compaction(vault_path, rules=None):
+    """判断 MEMORY.md 是否超出预算"""
+    rules = rules or load_memory_rules()
+    memory_file = Path(vault_path) / "MEMORY.md"
+    if not memory_file.exists():
+        return False
+    text = memory_file.read_text(encoding="utf-8")
+    return over_budget(len(text.encode("utf-8")), count_items(text), rules)
+
+
+def compact_core_memory(vault_path, rules=None, dry_run=False):
+    """
+    压缩 MEMORY.md
+
+    Args:
+        vault_path: 笔记库路径
+        rules: 压缩预算（默认读取 memory_rules）
+        dry_run: 只计算不写入
+
+    Returns:
+        统计信息字典 (archived / bytes_before / bytes_after / archives)
+    """
+    rules = rules or load_memory_rules()
+    vault = Path(vault_path)
+    memory_file = vault / "MEMORY.md"
+    archive_folder = rules["core_memory_archive_folder"].strip("/")
+    archive_dir = vault / archive_folder
+
+    with get_coordinator(vault_path).locked(memory_file):
+        text = memory_file.read_text(encoding="utf-8")
+        preamble, sections, by_month = _plan(text, rules)
+        archived = sum(len(items) for groups in by_month.values() for items in groups.values())
+        stats = {
+            "archived": archived,
+            "bytes_before": len(text.encode("utf-8")),
+            "archives": sorted(by_month)
+        }
+        if dry_run or not archived:
+            stats["bytes_after"] = len((preamble + "".join(h + b for h, b in sections)).encode("utf-8"))
+            return stats
+
+        # 先写归档再改 MEMORY.md：中途崩溃只会留下重复条目，合并时去重
+        counts = {}
+        for month, groups in by_month.items():
+            counts[month] = merge_archive(archive_dir / f"{month}.md", month, groups)
+
+        index_body = render_archive_index(archive_dir, archive_folder, counts)
+        for i, section in enumerate(sections):
+            if section[0].strip() == ARCHIVE_HEADING:
+                # 后面还有章节时保留一个空行
+                section[1] = index_body + ("\n" if i + 1 < len(sections) else "")
+                break
+        else:
+            if sections:
+                sections[-1][1] = sections[-1][1].rstrip("\n") + "\n\n"
+            else:
+                preamble = preamble.rstrip("\n") + "\n\n"
+            sections.append([ARCHIVE_HEADING, index_body])
+
+        new_text = preamble + "".join(h + b for h, b in sections)
+        atomic_write(memory_file, new_text)
+        stats["bytes_after"] = len(new_text.encode("utf-8"))
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python compact_memory.py <笔记库路径> [--dry-run]")
+        print("\n按 memory_rules 中的预算压缩 MEMORY.md，把旧条目移到按月归档的文件")
+        sys.exit(1)
+
+    vault_path = sys.argv[1]
+    dry_run = "--dry-run" in sys.argv
+
+    if not (Path(vault_path) / "MEMORY.md").exists():
+        print("❌ 错误: MEMORY.md 不存在")
+        sys.exit(1)
+
+    stats = compact_core_memory(vault_path, dry_run=dry_run)
+    prefix = "🔍 [预览] " if dry_run else "✓ "
+    print(f"{prefix}归档 {stats['archived']} 条，MEMORY.md {stats['bytes_before']} -> {stats['bytes_after']} 字节")
+    for month in stats["archives"]:
+        print(f"  📦 {month}")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+每日日志条目解析（流式）
+
+记录脚本和 Agent 写入的每条记录都是一个以时间标题开头的章节:
+
+    ## 14:30 - 标题
+    **Importance**: ⭐⭐⭐          （可选，紧跟标题的字段行）
+    **Tags**: #技术 #数据库
+
+    正文……
+
+    ---
+
+iter_blocks() 逐行读取文件（二进制，不把整个文件读入内存），依次产出:
+
+- frontmatter  文件开头 --- 之间的 YAML 文本
+- text         不属于任何条目的内容（文件标题、非时间标题的章节等）
+- entry        一条记录: 时间、标题、字段、正文、字节范围和内容哈希
+
+条目从时间标题开始，到下一个标题（# 或 ##）或文件末尾结束；正文中的 ---
+不会截断条目，最后一行的 --- 是条目的结束分隔符。条目的哈希是去掉首尾空白
+后的条目文本的 md5，与写入钩子收到的章节 (section.strip()) 一致。
+
+Agent 的 sync_memory 和检索技能的索引、扫描都使用这一个解析器，对同一文件
+得到相同的条目划分。
+"""
+
+import hashlib
+import io
+import itertools
+import re
+from pathlib import Path
+
+
+DELIMITER = re.compile(rb"^---[ \t]*\r?\n?$")
+ENTRY_HEADING = re.compile(r"^##[ \t]+(\d{1,2}:\d{2})(?:[ \t]+-[ \t]+(.*?))?[ \t]*$")
+SECTION_HEADING = re.compile(r"^##?[ \t]")
+FIELD_LINE = re.compile(r"^\*\*([^*]+)\*\*[:：][ \t]*(.*?)[ \t]*$")
+
+
+def entry_hash(text):
+    """条目文本（去掉首尾空白）的 md5"""
+    return hashlib.md5(text.strip().encode("utf-8")).hexdigest()
+
+
+def _open(source):
+    """
+    以二进制方式打开数据源
+
+    Args:
+        source: 文件路径、带 open() 的路径对象（如归档中的 ArchivedFile）、
+                bytes 或已打开的二进制文件对象
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    if isinstance(source, str):
+        source = Path(source)
+    if hasattr(source, "open"):
+        return source.open("rb")
+    return source
+
+
+def _lines(stream):
+    """逐行产出 (起始字节偏移, 行字节)"""
+    offset = 0
+    for line in stream:
+        yield offset, line
+        offset += len(line)
+
+
+def _text_block(lines):
+    """由若干 (偏移, 行) 组成的 text 块，只有空白时返回 None"""
+    text = b"".join(line for _, line in lines).decode("utf-8", errors="replace")
+    if not text.strip():
+        return None
+    start = lines[0][0]
+    return {"kind": "text", "text": text, "start": start, "end": start + sum(len(line) for _, line in lines)}
+
+
+def _entry_block(heading, lines):
+    """
+    由时间标题和其后的行组成 entry 块
+
+    字节范围从标题行开始，到最后一个非空行（通常是 ---）结束。
+    """
+    match, start = heading
+    end = start
+    decoded = []
+    for offset, line in lines:
+        text = line.decode("utf-8", errors="replace")
+        decoded.append(text)
+        if text.strip():
+            end = offset + len(line)
+
+    fields = {}
+    position = 1
+    while position < len(decoded):
+        field = FIELD_LINE.match(decoded[position].rstrip("\r\n"))
+        if not field:
+            break
+        fields[field.group(1).strip().lower()] = field.group(2)
+        position += 1
+
+    content_lines = [line.rstrip("\r\n") for line in decoded[position:]]
+    while content_lines and not content_lines[-1].strip():
+        content_lines.pop()
+    if content_lines and content_lines[-1].strip() == "---":
+        content_lines.pop()
+
+    text = "".join(decoded).strip()
+    return {
+        "kind": "entry",
+        "time": match.group(1),
+        "title": match.group(2) or "",
+        "fields": fields,
+        "content": "\n".join(content_lines).strip(),
+        "text": text,
+        "start": start,
+        "end": end,
+        "hash": entry_hash(text)
+    }
+
+
+def iter_blocks(source):
+    """
+    流式解析记忆文件
+
+    Args:
+        source: 文件路径、带 open() 的路径对象、bytes 或二进制文件对象
+
+    Yields:
+        块字典，"kind" 为 frontmatter / text / entry:
+          frontmatter: {"text", "start", "end"}
+          text:        {"text", "start", "end"}
+          entry:       {"time", "title", "fields", "content", "text",
+                        "start", "end", "hash"}
+        start / end 是块在文件中的字节偏移
+    """
+    stream = _open(source)
+    close = stream is not source
+    try:
+        lines = _lines(stream)
+        pending = []
+
+        # frontmatter: 首行为 ---，到下一个单独一行的 --- 为止
+        first = next(lines, None)
+        if first is None:
+            return
+        if first[1].startswith(b"---") and not first[1][3:].strip():
+            header = [first]
+            for offset, line in lines:
+                header.append((offset, line))
+                if DELIMITER.match(line):
+                    text = b"".join(l for _, l in header[1:-1]).decode("utf-8", errors="replace")
+                    yield {"kind": "frontmatter", "text": text, "start": 0, "end": offset + len(line)}
+                    break
+            else:
+                # 没有结束分隔符，整个文件都不是 frontmatter
+                pending = header
+        else:
+            pending = [first]
+
+        # 正文: 每个标题开始一个新块，时间标题开始的块是条目
+        heading = None
+        current = []
+        for offset, line in itertools.chain(pending, lines):
+            text = line.decode("utf-8", errors="replace").rstrip("\r\n")
+            match = ENTRY_HEADING.match(text)
+            if match or SECTION_HEADING.match(text):
+                block = _entry_block(heading, current) if heading else _text_block(current) if current else None
+                if block:
+                    yield block
+                heading = (match, offset) if match else None
+                current = []
+            current.append((offset, line))
+
+        block = _entry_block(heading, current) if heading else _text_block(current) if current else None
+        if block:
+            yield block
+    finally:
+        if close:
+            stream.close()
+
+
+def iter_entries(source):
+    """
+    流式产出文件中的记录条目（只包含 kind 为 entry 的块）
+
+    Args:
+        source: 文件路径、带 open() 的路径对象、bytes 或二进制文件对象
+    """
+    for block in iter_blocks(source):
+        if block["kind"] == "entry":
+            yield block
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+写入后索引钩子
+
+记录脚本每写入一条记录，就把新章节（标题、类型、标签、重要程度以及在
+文件中的字节偏移）交给已注册的钩子，使新记录无需全量重扫即可被检索到。
+
+默认钩子把变更通知给 obsidian-memory-retriever 的常驻查询服务（服务未运行
+时什么也不做）。在同一进程中嵌入检索引擎或向量库的宿主（如 Agent）可以用
+register_hook() 注册自己的钩子。
+"""
+
+import sys
+from pathlib import Path
+
+
+# 同级的检索技能，提供常驻查询服务
+RETRIEVER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-retriever" / "scripts"
+
+_HOOKS = []
+
+
+def register_hook(hook):
+    """
+    注册写入后钩子
+
+    Args:
+        hook: 回调函数 (vault_path, record) -> None，record 字段见 notify_written()
+    """
+    if hook not in _HOOKS:
+        _HOOKS.append(hook)
+
+
+def unregister_hook(hook):
+    """移除已注册的钩子"""
+    if hook in _HOOKS:
+        _HOOKS.remove(hook)
+
+
+def notify_changed_paths(vault_path, paths):
+    """
+    通知检索查询服务增量更新指定文件（含删除，服务未运行时跳过）
+
+    Args:
+        vault_path: 笔记库路径
+        paths: 变更的文件路径
+    """
+    if not paths:
+        return
+    if str(RETRIEVER_SCRIPTS) not in sys.path:
+        sys.path.append(str(RETRIEVER_SCRIPTS))
+    try:
+        from query_service import notify_changes
+    except ImportError:
+        return
+    notify_changes(vault_path, [str(p) for p in paths])
+
+
+def retriever_service_hook(vault_path, record):
+    """通知检索查询服务增量更新写入的文件（服务未运行时跳过）"""
+    notify_changed_paths(vault_path, [record["file"]])
+
+
+def notify_written(vault_path, filepath, start, section, **fields):
+    """
+    把新写入的章节交给所有钩子
+
+    钩子出错只打印警告，不影响已经完成的写入。
+
+    Args:
+        vault_path: 笔记库路径
+        filepath: 写入的文件
+        start: 章节在文件中的起始字节偏移
+        section: 写入的章节文本
+        **fields: 记录字段 (date / time / title / type / tags / importance /
+                  project / status / content)
+
+    Returns:
+        传给钩子的记录字典
+    """
+    record = dict(fields)
+    record["file"] = str(filepath)
+    record["start"] = start
+    record["end"] = start + len(section.encode("utf-8"))
+    record["section"] = section
+
+    for hook in list(_HOOKS):
+        try:
+            hook(vault_path, record)
+        except Exception as e:
+            print(f"⚠️ 警告: 索引钩子执行失败: {e}")
+    return record
+
+
+register_hook(retriever_service_hook)
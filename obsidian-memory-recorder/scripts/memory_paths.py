@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+记忆文件路径解析
+
+memory/ 支持两种布局:
+  flat     memory/YYYY-MM-DD.md（默认）
+  sharded  memory/YYYY/MM/YYYY-MM-DD.md
+
+布局由 memory/.layout 标记文件决定（内容为 sharded 时按年月分片，由
+migrate_layout.py 写入）。读取时两种布局同时识别，迁移过程中或手工放置的
+文件都能被找到；新写入的每日日志按当前布局放置。
+
+目录列表按目录 mtime 缓存：文件增删才会改变目录 mtime，未变化时直接复用
+上次的列表；按日期范围列出时不在范围内的年/月目录整个跳过。
+"""
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+
+MEMORY_FOLDER = "memory"
+LAYOUT_FILE = ".layout"
+LAYOUTS = ("flat", "sharded")
+
+YEAR_PATTERN = re.compile(r"^\d{4}$")
+MONTH_PATTERN = re.compile(r"^(0[1-9]|1[0-2])$")
+DATE_NAME_PATTERN = re.compile(r"^(\d{4})-(\d{2})-\d{2}\.md$")
+
+# 目录 mtime 距今不足该秒数时不信任缓存（同一时钟刻度内的新增文件不会改变 mtime）
+RACY_WINDOW = 1.0
+
+
+class MemoryLayout:
+    """单个笔记库 memory/ 文件夹的路径解析和目录列表缓存"""
+
+    def __init__(self, vault_path):
+        self.vault = Path(vault_path)
+        self.folder = self.vault / MEMORY_FOLDER
+        # 目录 -> (mtime_ns, [文件], [子目录名])
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    @property
+    def layout(self):
+        """当前布局（flat / sharded）"""
+        try:
+            value = (self.folder / LAYOUT_FILE).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return "flat"
+        return value if value in LAYOUTS else "flat"
+
+    def daily_path(self, date_str, layout=None):
+        """
+        每日日志的路径
+
+        Args:
+            date_str: 日期字符串 (YYYY-MM-DD)
+            layout: 指定布局，默认使用当前布局
+
+        Returns:
+            文件路径
+        """
+        if (layout or self.layout) == "sharded":
+            return self.folder / date_str[:4] / date_str[5:7] / f"{date_str}.md"
+        return self.folder / f"{date_str}.md"
+
+    def locate(self, name):
+        """
+        按文件名查找已存在的记忆文件（两种布局都查找）
+
+        Args:
+            name: 文件名 (如 2026-02-03.md)
+
+        Returns:
+            存在的文件路径，都不存在时返回按当前布局的路径
+        """
+        match = DATE_NAME_PATTERN.match(name)
+        if not match:
+            return self.folder / name
+        sharded = self.folder / match.group(1) / match.group(2) / name
+        flat = self.folder / name
+        preferred = [sharded, flat] if self.layout == "sharded" else [flat, sharded]
+        for path in preferred:
+            if path.exists():
+                return path
+        return preferred[0]
+
+    def link(self, md_file):
+        """笔记库内的 wiki 链接目标（如 memory/2026/02/2026-02-03.md）"""
+        return Path(md_file).relative_to(self.vault).as_posix()
+
+    def is_memory_file(self, path):
+        """判断路径是否是 memory/ 下（任一布局）的记忆文件"""
+        path = Path(path)
+        if path.suffix != ".md":
+            return False
+        if path.parent == self.folder:
+            return True
+        month_dir = path.parent
+        return (
+            month_dir.parent.parent == self.folder
+            and YEAR_PATTERN.match(month_dir.parent.name) is not None
+            and MONTH_PATTERN.match(month_dir.name) is not None
+        )
+
+    def relative(self, path):
+        """记忆文件相对 memory/ 的路径（posix 格式）"""
+        return Path(path).relative_to(self.folder).as_posix()
+
+    def _listdir(self, directory):
+        """
+        列出目录中的 .md 文件和子目录，按目录 mtime 缓存
+
+        Returns:
+            ([文件路径], [子目录名])，目录不存在时返回空列表
+        """
+        try:
+            mtime_ns = directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._listings.pop(directory, None)
+            return [], []
+        with self._lock:
+            cached = self._listings.get(directory)
+        if cached and cached[0] == mtime_ns:
+            return cached[1], cached[2]
+
+        files, subdirs = [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.name.endswith(".md"):
+                    files.append(directory / entry.name)
+        files.sort()
+        subdirs.sort()
+
+        if time.time() - mtime_ns / 1e9 > RACY_WINDOW:
+            with self._lock:
+                self._listings[directory] = (mtime_ns, files, subdirs)
+        return files, subdirs
+
+    def directories(self):
+        """memory/ 及所有年/月分片目录"""
+        directories = [self.folder]
+        _, years = self._listdir(self.folder)
+        for year in years:
+            if not YEAR_PATTERN.match(year):
+                continue
+            year_dir = self.folder / year
+            directories.append(year_dir)
+            _, months = self._listdir(year_dir)
+            directories.extend(year_dir / m for m in months if MONTH_PATTERN.match(m))
+        return directories
+
+    def files(self, since=None, until=None):
+        """
+        列出记忆文件（两种布局），可按日期范围裁剪目录
+
+        文件名不是日期的文件总是保留（无法按目录判断其日期）。
+
+        Args:
+            since: 起始日期（含，YYYY-MM-DD），可选
+            until: 结束日期（含，YYYY-MM-DD），可选
+
+        Returns:
+            文件路径列表
+        """
+        def keep(md_file):
+            if not DATE_NAME_PATTERN.match(md_file.name):
+                return True
+            day = md_file.stem
+            return not ((since and day < since) or (until and day > until))
+
+        flat_files, years = self._listdir(self.folder)
+        selected = [f for f in flat_files if keep(f)]
+        for year in years:
+            if not YEAR_PATTERN.match(year):
+                continue
+            if (since and year < since[:4]) or (until and year > until[:4]):
+                continue
+            year_dir = self.folder / year
+            _, months = self._listdir(year_dir)
+            for month in months:
+                if not MONTH_PATTERN.match(month):
+                    continue
+                prefix = f"{year}-{month}"
+                if (since and prefix < since[:7]) or (until and prefix > until[:7]):
+                    continue
+                month_files, _ = self._listdir(year_dir / month)
+                selected.extend(f for f in month_files if keep(f))
+        return selected
+
+
+# 笔记库路径 -> MemoryLayout
+_LAYOUTS = {}
+_registry_lock = threading.Lock()
+
+
+def get_layout(vault_path):
+    """
+    获取笔记库共享的 MemoryLayout（进程内复用目录列表缓存）
+
+    Args:
+        vault_path: 笔记库路径
+
+    Returns:
+        MemoryLayout 实例
+    """
+    key = str(Path(vault_path).resolve())
+    with _registry_lock:
+        if key not in _LAYOUTS:
+            _LAYOUTS[key] = MemoryLayout(key)
+        return _LAYOUTS[key]
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+memory/ 布局迁移
+
+把每日日志在 flat（memory/YYYY-MM-DD.md）和 sharded
+（memory/YYYY/MM/YYYY-MM-DD.md）两种布局之间移动，并更新 memory/.layout 标记。
+
+先写标记再逐个移动文件：迁移期间的新写入直接进入目标布局，每个文件在
+写入锁内用 rename 移动；目标位置已有同名文件时跳过并警告，不会覆盖。
+
+移动完成后，在 MEMORY.md 的锁内把 MEMORY.md 和核心记忆归档
+（archive/core_memory/*.md）中指向已移动文件的 [[memory/...]] 链接
+改写为新位置（两个方向都适用）。
+"""
+
+import re
+import sys
+from pathlib import Path
+try:
+    from memory_paths import MemoryLayout, LAYOUTS, LAYOUT_FILE, DATE_NAME_PATTERN
+    from write_coordinator import get_coordinator
+    from persistence import atomic_write
+    from index_hook import notify_changed_paths
+    from compact_memory import load_memory_rules
+except ImportError:
+    sys.path.append(str(Path(__file__).parent))
+    from memory_paths import MemoryLayout, LAYOUTS, LAYOUT_FILE, DATE_NAME_PATTERN
+    from write_coordinator import get_coordinator
+    from persistence import atomic_write
+    from index_hook import notify_changed_paths
+    from compact_memory import load_memory_rules
+
+
+# wiki 链接中的记忆文件目标（不含 .md 后缀、别名和标题锚点）
+MEMORY_LINK_PATTERN = re.compile(r"\[\[(memory/[^\]|#]+?)(\.md)?(?=[\]|#])")
+
+
+def rewrite_links(vault_path, renamed, dry_run=False):
+    """
+    把 MEMORY.md 和核心记忆归档中指向已移动文件的链接改写为新位置
+
+    Args:
+        vault_path: 笔记库路径
+        renamed: {旧链接目标: 新链接目标}，均为 MemoryLayout.link() 的结果
+        dry_run: 只统计，不写入
+
+    Returns:
+        改写的链接数量
+    """
+    if not renamed:
+        return 0
+    # 链接可能带或不带 .md 后缀，按去掉后缀的目标匹配
+    targets = {old[:-3]: new[:-3] for old, new in renamed.items()}
+
+    def replace(match):
+        new = targets.get(match.group(1))
+        if new is None:
+            return match.group(0)
+        return f"[[{new}{match.group(2) or ''}"
+
+    vault = Path(vault_path)
+    memory_file = vault / "MEMORY.md"
+    archive_dir = vault / load_memory_rules()["core_memory_archive_folder"].strip("/")
+    rewritten = 0
+    # 压缩也在 MEMORY.md 的锁内写归档文件，同一把锁覆盖两者
+    with get_coordinator(vault_path).locked(memory_file):
+        documents = [memory_file] + (sorted(archive_dir.glob("*.md")) if archive_dir.exists() else [])
+        for document in documents:
+            if not document.exists():
+                continue
+            text = document.read_text(encoding="utf-8")
+            new_text, count = MEMORY_LINK_PATTERN.subn(replace, text)
+            if new_text == text:
+                continue
+            rewritten += count
+            if not dry_run:
+                atomic_write(document, new_text)
+    return rewritten
+
+
+def migrate_layout(vault_path, target="sharded", dry_run=False):
+    """
+    迁移 memory/ 到指定布局
+
+    Args:
+        vault_path: 笔记库路径
+        target: 目标布局 (flat / sharded)
+        dry_run: 只统计，不移动
+
+    Returns:
+        统计信息 {"moved", "skipped", "links", "layout"}
+    """
+    if target not in LAYOUTS:
+        raise ValueError(f"未知的布局: {target}（可选: {', '.join(LAYOUTS)}）")
+
+    layout = MemoryLayout(vault_path)
+    moves = []
+    for md_file in layout.files():
+        if not DATE_NAME_PATTERN.match(md_file.name):
+            continue
+        destination = layout.daily_path(md_file.stem, target)
+        if destination != md_file:
+            moves.append((md_file, destination))
+
+    stats = {"moved": 0, "skipped": 0, "links": 0, "layout": target}
+    if dry_run:
+        stats["moved"] = len(moves)
+        stats["links"] = rewrite_links(
+            vault_path, {layout.link(source): layout.link(destination) for source, destination in moves}, dry_run=True
+        )
+        return stats
+
+    marker = layout.folder / LAYOUT_FILE
+    if target == "sharded":
+        atomic_write(marker, "sharded\n")
+    elif marker.exists():
+        marker.unlink()
+
+    coordinator = get_coordinator(vault_path)
+    changed = []
+    renamed = {}
+    for source, destination in moves:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        # 源文件和目标文件都加锁，避免与同一天的写入交错
+        with coordinator.locked(source), coordinator.locked(destination):
+            if destination.exists():
+                print(f"⚠️ 警告: {destination.relative_to(layout.folder)} 已存在，保留 {source.name}")
+                stats["skipped"] += 1
+                continue
+            source.rename(destination)
+        changed.extend([source, destination])
+        renamed[layout.link(source)] = layout.link(destination)
+        stats["moved"] += 1
+
+    # 清理迁移回 flat 后留下的空年/月目录
+    if target == "flat":
+        for directory in sorted(layout.directories()[1:], reverse=True):
+            try:
+                directory.rmdir()
+            except OSError:
+                pass
+
+    stats["links"] = rewrite_links(vault_path, renamed)
+    notify_changed_paths(vault_path, changed)
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python migrate_layout.py <笔记库路径> [sharded|flat] [--dry-run]")
+        print("\n把 memory/ 迁移为按年月分片 (memory/YYYY/MM/) 或平铺布局")
+        sys.exit(1)
+
+    vault_path = sys.argv[1]
+    target = next((arg for arg in sys.argv[2:] if arg in LAYOUTS), "sharded")
+    dry_run = "--dry-run" in sys.argv
+
+    if not (Path(vault_path) / "memory").exists():
+        print("❌ 错误: memory 文件夹不存在")
+        sys.exit(1)
+
+    stats = migrate_layout(vault_path, target, dry_run=dry_run)
+    prefix = "🔍 [预览] " if dry_run else "✓ "
+    print(f"{prefix}布局 {stats['layout']}: 移动 {stats['moved']} 个文件，跳过 {stats['skipped']} 个，改写 {stats['links']} 个链接")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+持久化写入
+
+所有需要整体替换的状态文件（MEMORY.md、配置文件、向量库数据等）都通过
+atomic_write() 写入：先写同目录下的临时文件，再 rename 覆盖目标文件，
+崩溃时只会留下旧版本或新版本，不会出现被截断的文件。
+
+刷盘策略由持久化模式决定:
+  none     不 fsync，交给操作系统回写（批量导入时吞吐最高）。rename 可能先于
+           数据落盘，崩溃时被替换的文件可能变成空文件或被截断（整个文件丢失）
+  batched  临时文件在 rename 前 fsync（文件内容不会丢失或截断），目录由后台
+           线程每隔 N 毫秒组提交 fsync；崩溃时最近的替换可能回到旧版本
+  always   每次写入都 fsync 文件和所在目录后才返回（默认）
+
+模式可通过环境变量 OBSIDIAN_MEMORY_DURABILITY / OBSIDIAN_MEMORY_DURABILITY_MS
+或 set_durability() 设置，临时切换可使用 durability_mode() 上下文。环境变量的
+值无效时打印警告并使用默认值。
+"""
+
+import atexit
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+DURABILITY_MODES = ("none", "batched", "always")
+DEFAULT_DURABILITY = "always"
+DEFAULT_BATCH_INTERVAL_MS = 50
+
+MODE_ENV = "OBSIDIAN_MEMORY_DURABILITY"
+INTERVAL_ENV = "OBSIDIAN_MEMORY_DURABILITY_MS"
+
+def _parse_interval(value):
+    """组提交间隔（毫秒），必须是非负整数"""
+    interval = int(value)
+    if interval < 0:
+        raise ValueError(f"组提交间隔不能为负数: {value}")
+    return interval
+
+
+def _env_settings():
+    """从环境变量读取持久化模式和组提交间隔，无效时警告并使用默认值"""
+    mode = os.environ.get(MODE_ENV, DEFAULT_DURABILITY)
+    if mode not in DURABILITY_MODES:
+        print(f"⚠️ 警告: {MODE_ENV}={mode} 无效（可选: {', '.join(DURABILITY_MODES)}），使用 {DEFAULT_DURABILITY}")
+        mode = DEFAULT_DURABILITY
+    try:
+        interval_ms = _parse_interval(os.environ.get(INTERVAL_ENV, DEFAULT_BATCH_INTERVAL_MS))
+    except (TypeError, ValueError):
+        print(f"⚠️ 警告: {INTERVAL_ENV}={os.environ.get(INTERVAL_ENV)} 不是有效的毫秒数，使用 {DEFAULT_BATCH_INTERVAL_MS}")
+        interval_ms = DEFAULT_BATCH_INTERVAL_MS
+    return {"mode": mode, "interval_ms": interval_ms}
+
+
+_state = _env_settings()
+
+
+def set_durability(mode, interval_ms=None):
+    """
+    设置持久化模式
+
+    Args:
+        mode: none / batched / always
+        interval_ms: batched 模式下的组提交间隔（毫秒）
+
+    Raises:
+        ValueError: 模式未知或间隔不是非负整数
+    """
+    if mode not in DURABILITY_MODES:
+        raise ValueError(f"未知的持久化模式: {mode}（可选: {', '.join(DURABILITY_MODES)}）")
+    if interval_ms is not None:
+        try:
+            interval_ms = _parse_interval(interval_ms)
+        except (TypeError, ValueError):
+            raise ValueError(f"无效的组提交间隔: {interval_ms!r}（应为非负整数毫秒）")
+    if _state["mode"] == "batched" and mode != "batched":
+        _committer.flush()
+    _state["mode"] = mode
+    if interval_ms is not None:
+        _state["interval_ms"] = interval_ms
+
+
+def get_durability():
+    """返回当前的持久化模式"""
+    return _state["mode"]
+
+
+@contextmanager
+def durability_mode(mode):
+    """
+    临时切换持久化模式（如批量导入时使用 none），退出时恢复原模式
+
+    Args:
+        mode: none / batched / always
+    """
+    previous = _state["mode"]
+    set_durability(mode)
+    try:
+        yield
+    finally:
+        set_durability(previous)
+
+
+def _fsync_path(path):
+    """fsync 文件或目录，文件已不存在时忽略"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except (FileNotFoundError, IsADirectoryError, PermissionError):
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # 部分平台不支持对目录 fsync
+        pass
+    finally:
+        os.close(fd)
+
+
+class GroupCommitter:
+    """batched 模式的后台刷盘线程"""
+
+    def __init__(self):
+        self._paths = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, *paths):
+        """登记需要刷盘的文件或目录"""
+        with self._lock:
+            self._paths.update(str(p) for p in paths)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def flush(self):
+        """立即刷盘所有已登记的路径"""
+        with self._lock:
+            paths, self._paths = self._paths, set()
+        for path in sorted(paths):
+            _fsync_path(path)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            time.sleep(_state["interval_ms"] / 1000)
+            self.flush()
+
+
+_committer = GroupCommitter()
+atexit.register(_committer.flush)
+
+
+def sync_file(f):
+    """
+    按当前模式刷盘一个已写入的打开文件（如追加写入的日志）
+
+    Args:
+        f: 已 flush 的文件对象
+    """
+    mode = _state["mode"]
+    if mode == "always":
+        os.fsync(f.fileno())
+    elif mode == "batched":
+        _committer.add(f.name)
+
+
+def atomic_write(path, data, encoding="utf-8"):
+    """
+    原子地替换文件内容
+
+    Args:
+        path: 目标文件
+        data: 文本或字节
+        encoding: data 为文本时使用的编码
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode(encoding)
+
+    mode = _state["mode"]
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            # rename 之前数据必须落盘，否则崩溃后目标文件可能是空的或被截断；
+            # batched 只推迟目录的 fsync（崩溃时最多回到旧版本）
+            if mode != "none":
+                os.fsync(f.fileno())
+        # mkstemp 创建的文件只有属主可读写，保留原文件的权限位
+        os.chmod(tmp_path, path.stat().st_mode & 0o7777 if path.exists() else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    if mode == "always":
+        _fsync_path(path.parent)
+    elif mode == "batched":
+        _committer.add(path.parent)
@@ -11,10 +11,16 @@ from datetime import datetime
 from pathlib import Path
 try:
     from sync_utils import sync_to_core_memory
+    from index_hook import notify_written
+    from write_coordinator import get_coordinator
+    from memory_paths import get_layout
 except ImportError:
     # 如果直接运行脚本失败，尝试添加当前目录到路径
     sys.path.append(str(Path(__file__).parent))
     from sync_utils import sync_to_core_memory
+    from index_hook import notify_written
+    from write_coordinator import get_coordinator
+    from memory_paths import get_layout
 
 
 # 字段自动填充规则
@@ -217,7 +223,7 @@ def create_daily_log(vault_path, content, custom_fields=None):
     # 生成文件名
     today_str = datetime.now().strftime("%Y-%m-%d")
     filename = f"{today_str}.md"
-    filepath = memory_folder / filename
+    filepath = get_layout(vault).daily_path(today_str)
 
     # 生成 frontmatter
     frontmatter, title, record_type, tags, importance = generate_frontmatter(content, custom_fields)
@@ -234,25 +240,26 @@ def create_daily_log(vault_path, content, custom_fields=None):
 
 ---
 """
-    # 检查是否已存在
-    if filepath.exists():
-        # 读取现有内容
-        existing_content = filepath.read_text(encoding="utf-8")
-
-        # 追加新记录
-        new_content = existing_content + section
-        filepath.write_text(new_content, encoding="utf-8")
-        print(f"⚠️  已追加到现有文件: {filename}")
-    else:
-        # 创建新文件
-        header = f"# {today_str}\n"
-        new_content = frontmatter + header + section
-        filepath.write_text(new_content, encoding="utf-8")
+    # 经写入协调器追加（文件不存在时连同 frontmatter 原子创建）
+    header = f"# {today_str}\n"
+    start, created = get_coordinator(vault_path).append(filepath, section, frontmatter + header)
+    if created:
         print(f"✓ 已创建新文件: {filename}")
+    else:
+        print(f"⚠️  已追加到现有文件: {filename}")
 
     # 同步到 MEMORY.md
     if record_type in ["用户偏好", "决策"]:
-        sync_to_core_memory(vault_path, record_type, title, content, today_str, filename)
+        sync_to_core_memory(vault_path, record_type, title, content, today_str, get_layout(vault).relative(filepath), importance)
+
+    # 通知索引
+    fields = custom_fields or {}
+    notify_written(
+        vault_path, filepath, start, section,
+        date=today_str, time=time_str, title=title, type=record_type, tags=tags,
+        importance=importance, project=fields.get("project", ""),
+        status=fields.get("status", "进行中"), content=content
+    )
 
     return filepath, title, record_type, tags, importance
 
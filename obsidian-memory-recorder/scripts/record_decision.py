@@ -10,9 +10,15 @@ from datetime import datetime
 from pathlib import Path
 try:
     from sync_utils import sync_to_core_memory
+    from index_hook import notify_written
+    from write_coordinator import get_coordinator
+    from memory_paths import get_layout
 except ImportError:
     sys.path.append(str(Path(__file__).parent))
     from sync_utils import sync_to_core_memory
+    from index_hook import notify_written
+    from write_coordinator import get_coordinator
+    from memory_paths import get_layout
 
 
 def create_decision_record(vault_path, decision_content, importance=None, project=None):
@@ -44,7 +50,7 @@ def create_decision_record(vault_path, decision_content, importance=None, projec
     date_str = now.strftime("%Y-%m-%d")
     time_str = now.strftime("%H:%M")
     filename = f"{date_str}.md"
-    filepath = memory_folder / filename
+    filepath = get_layout(vault).daily_path(date_str)
 
     # 设置字段
     tags = ["#技术", "#决策", "#重要"]
@@ -88,24 +94,23 @@ updated: {date_str} {time_str}
 ---
 """
 
-    # 检查是否已存在
-    if filepath.exists():
-        # 读取现有内容
-        existing_content = filepath.read_text(encoding="utf-8")
-
-        # 追加新记录
-        new_content = existing_content + content
-        filepath.write_text(new_content, encoding="utf-8")
-        print(f"⚠️  已追加到现有文件: {filename}")
-    else:
-        # 创建新文件
-        header = f"# {date_str}\n"
-        new_content = frontmatter + header + content
-        filepath.write_text(new_content, encoding="utf-8")
+    # 经写入协调器追加（文件不存在时连同 frontmatter 原子创建）
+    header = f"# {date_str}\n"
+    start, created = get_coordinator(vault_path).append(filepath, content, frontmatter + header)
+    if created:
         print(f"✓ 已创建新文件: {filename}")
+    else:
+        print(f"⚠️  已追加到现有文件: {filename}")
 
     # 同步到 MEMORY.md
-    sync_to_core_memory(vault_path, "决策", title, decision_content, date_str, filename)
+    sync_to_core_memory(vault_path, "决策", title, decision_content, date_str, get_layout(vault).relative(filepath), importance)
+
+    # 通知索引
+    notify_written(
+        vault_path, filepath, start, content,
+        date=date_str, time=time_str, title=title, type=record_type, tags=tags,
+        importance=importance, project=project, status=status, content=decision_content
+    )
 
     return filepath
 
@@ -2,17 +2,25 @@
 """
 结构化记录脚本
 
-用户提供完整的结构化数据，创建标准化记录
+用户提供完整的结构化数据，创建标准化记录。--batch 从 JSON 文件批量导入，
+同步到 MEMORY.md 的决策和偏好合并为一次重写（见 sync_utils.core_memory_batch）。
 """
 
+import json
 import sys
 from datetime import datetime
 from pathlib import Path
 try:
-    from sync_utils import sync_to_core_memory
+    from sync_utils import sync_to_core_memory, core_memory_batch
+    from index_hook import notify_written
+    from write_coordinator import get_coordinator
+    from memory_paths import get_layout
 except ImportError:
     sys.path.append(str(Path(__file__).parent))
-    from sync_utils import sync_to_core_memory
+    from sync_utils import sync_to_core_memory, core_memory_batch
+    from index_hook import notify_written
+    from write_coordinator import get_coordinator
+    from memory_paths import get_layout
 
 
 def validate_fields(fields):
@@ -85,7 +93,7 @@ def create_structured_record(vault_path, fields):
     date_str = now.strftime("%Y-%m-%d")
     time_str = now.strftime("%H:%M")
     filename = f"{date_str}.md"
-    filepath = memory_folder / filename
+    filepath = get_layout(vault).daily_path(date_str)
 
     # 生成 frontmatter
     frontmatter = f"""---
@@ -111,29 +119,51 @@ updated: {date_str} {time_str}
 ---
 """
 
-    # 检查是否已存在
-    if filepath.exists():
-        # 读取现有内容
-        existing_content = filepath.read_text(encoding="utf-8")
-
-        # 追加新记录
-        new_content = existing_content + section
-        filepath.write_text(new_content, encoding="utf-8")
-        print(f"⚠️  已追加到现有文件: {filename}")
-    else:
-        # 创建新文件
-        header = f"# {date_str}\n"
-        new_content = frontmatter + header + section
-        filepath.write_text(new_content, encoding="utf-8")
+    # 经写入协调器追加（文件不存在时连同 frontmatter 原子创建）
+    header = f"# {date_str}\n"
+    start, created = get_coordinator(vault_path).append(filepath, section, frontmatter + header)
+    if created:
         print(f"✓ 已创建新文件: {filename}")
+    else:
+        print(f"⚠️  已追加到现有文件: {filename}")
 
     # 同步到 MEMORY.md
     if record_type in ["用户偏好", "决策"]:
-        sync_to_core_memory(vault_path, record_type, title, content, date_str, filename)
+        sync_to_core_memory(vault_path, record_type, title, content, date_str, get_layout(vault).relative(filepath), importance)
+
+    # 通知索引
+    notify_written(
+        vault_path, filepath, start, section,
+        date=date_str, time=time_str, title=title, type=record_type, tags=tags,
+        importance=importance, project=project, status=status, content=content
+    )
 
     return filepath
 
 
+def create_structured_records(vault_path, records):
+    """
+    批量创建结构化记录
+
+    先验证全部记录，任何一条无效时不写入；MEMORY.md 的同步在全部写入后
+    合并为一次重写。
+
+    Args:
+        vault_path: 笔记库路径
+        records: 字段字典列表
+
+    Returns:
+        (创建的文件路径列表, 错误消息)，有无效记录时路径列表为空
+    """
+    for i, fields in enumerate(records, 1):
+        valid, error = validate_fields(fields)
+        if not valid:
+            return [], f"第 {i} 条: {error}"
+
+    with core_memory_batch(vault_path):
+        return [create_structured_record(vault_path, fields) for fields in records], ""
+
+
 def interactive_input():
     """
     交互式输入字段
@@ -263,8 +293,28 @@ if __name__ == "__main__":
         print(f"\n✓ 记录已成功创建")
         print(f"📁 文件: {filepath}")
 
+    elif len(sys.argv) > 3 and sys.argv[1] == "--batch":
+        # 批量导入：JSON 文件为字段字典的列表
+        vault_path = sys.argv[2]
+        try:
+            with open(sys.argv[3], 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"❌ 错误: 无法读取 {sys.argv[3]}: {e}")
+            sys.exit(1)
+        if not isinstance(records, list):
+            print("❌ 错误: JSON 文件应为记录字段的列表")
+            sys.exit(1)
+
+        filepaths, error = create_structured_records(vault_path, records)
+        if error:
+            print(f"\n❌ 验证失败: {error}")
+            sys.exit(1)
+        print(f"\n✓ 已创建 {len(filepaths)} 条记录")
+
     else:
         print("用法: python record_struct.py --interactive")
+        print("      python record_struct.py --batch <笔记库路径> <记录.json>")
         print("\n或者直接提供字段:")
         print("  title=标题 type=类型 content=内容 tags='#技术 #决策'")
         sys.exit(1)
@@ -1,58 +1,255 @@
+import json
 import re
+import sys
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+try:
+    from write_coordinator import get_coordinator, JOURNAL_DIR_NAME
+    from persistence import atomic_write
+except ImportError:
+    sys.path.append(str(Path(__file__).parent))
+    from write_coordinator import get_coordinator, JOURNAL_DIR_NAME
+    from persistence import atomic_write
 
-def sync_to_core_memory(vault_path, record_type, title, content, date_str, source_file):
+
+# 记录类型 -> MEMORY.md 中对应的章节标题
+SECTION_HEADINGS = {
+    "用户偏好": "## 用户偏好",
+    "决策": "## 重要决策历史"
+}
+
+# 章节偏移索引，与写入日志放在同一目录
+SECTION_INDEX_FILE = "core_memory_sections.json"
+
+_pending = {}
+_batch_depth = {}
+_pending_lock = threading.Lock()
+
+
+def format_insertion(record_type, title, content, date_str, source_file, importance=None):
+    """
+    生成插入到 MEMORY.md 章节标题下方的文本
+
+    Args:
+        record_type: 记录类型 (如 "用户偏好", "决策")
+        title: 记录标题
+        content: 记录内容
+        date_str: 日期字符串 (YYYY-MM-DD)
+        source_file: 源文件相对 memory/ 的路径 (如 2026-02-03.md 或 2026/02/2026-02-03.md)
+        importance: 重要程度（可选，决策记录中会保留，供压缩时排序）
+
+    Returns:
+        要插入的文本
+    """
+    source_link = f"[[memory/{source_file}]]"
+    if record_type == "用户偏好":
+        return f"- {title} (来源于 {source_link})\n"
+    # 提取内容摘要，去掉换行符，限制长度
+    summary = content.strip().split('\n')[0][:100]
+    block = f"### {date_str}: {title}\n- 决策内容: {summary}\n"
+    if importance:
+        block += f"- 重要程度: {'⭐' * int(importance)}\n"
+    return block + f"- 来源: {source_link}\n\n"
+
+
+class SectionIndex:
+    """
+    MEMORY.md 章节标题的字节偏移索引
+
+    记录每个章节标题（含其后空白）结束处的字节偏移和章节的条目数，以
+    MEMORY.md 的 mtime 和大小校验；有效时插入记录无需再搜索整个文件，
+    也无需重新解析就能判断是否超出压缩预算。
+    """
+
+    def __init__(self, vault_path):
+        self.memory_file = Path(vault_path) / "MEMORY.md"
+        self.index_file = Path(vault_path) / JOURNAL_DIR_NAME / SECTION_INDEX_FILE
+
+    def _stat_key(self):
+        stat = self.memory_file.stat()
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def load(self):
+        """
+        读取索引
+
+        Returns:
+            {"sections": {章节标题: 字节偏移}, "counts": {章节标题: 条目数}}，
+            MEMORY.md 在建索引后被修改过时返回 None
+        """
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if data.get("stat") != self._stat_key() or "counts" not in data:
+            return None
+        return {"sections": data["sections"], "counts": data["counts"]}
+
+    def build(self, data):
+        """
+        扫描 MEMORY.md 内容建立索引
+
+        Args:
+            data: MEMORY.md 的字节内容
+
+        Returns:
+            {"sections": {章节标题: 字节偏移}, "counts": {章节标题: 条目数}}
+        """
+        # 延迟导入：compact_memory 依赖本模块
+        from compact_memory import count_items
+        sections = {}
+        for heading in SECTION_HEADINGS.values():
+            match = re.search(re.escape(heading.encode("utf-8")) + rb"\s*\n", data)
+            if match:
+                sections[heading] = match.end()
+        return {"sections": sections, "counts": count_items(data.decode("utf-8"))}
+
+    def verify(self, data, sections):
+        """抽查每个偏移前面确实是对应的章节标题（防止 mtime 巧合）"""
+        for heading, offset in sections.items():
+            heading_bytes = heading.encode("utf-8")
+            found = data.rfind(heading_bytes, 0, offset)
+            if found < 0 or data[found + len(heading_bytes):offset].strip():
+                return False
+        return True
+
+    def save(self, state):
+        """保存索引（MEMORY.md 写入后调用）"""
+        payload = json.dumps(dict(state, stat=self._stat_key()), ensure_ascii=False)
+        atomic_write(self.index_file, payload)
+
+
+@contextmanager
+def core_memory_batch(vault_path):
+    """
+    批量同步：上下文内的 sync_to_core_memory 调用只排队，退出时一次性写入
+
+    Args:
+        vault_path: 笔记库路径
+    """
+    key = str(Path(vault_path).resolve())
+    with _pending_lock:
+        _batch_depth[key] = _batch_depth.get(key, 0) + 1
+    try:
+        yield
+    finally:
+        with _pending_lock:
+            _batch_depth[key] -= 1
+            outermost = _batch_depth[key] == 0
+            if outermost:
+                del _batch_depth[key]
+        if outermost:
+            flush_core_memory(vault_path)
+
+
+def sync_to_core_memory(vault_path, record_type, title, content, date_str, source_file, importance=None):
     """
     将重要记录同步到 MEMORY.md
-    
+
+    在 core_memory_batch() 上下文中只排队，否则立即写入。
+
     Args:
         vault_path: 笔记库路径
         record_type: 记录类型 (如 "用户偏好", "决策")
         title: 记录标题
         content: 记录内容
         date_str: 日期字符串 (YYYY-MM-DD)
-        source_file: 源文件名 (如 2026-02-03.md)
+        source_file: 源文件相对 memory/ 的路径 (如 2026-02-03.md)
+        importance: 重要程度（可选）
+    """
+    if record_type not in SECTION_HEADINGS:
+        return
+
+    key = str(Path(vault_path).resolve())
+    insertion = format_insertion(record_type, title, content, date_str, source_file, importance)
+    with _pending_lock:
+        _pending.setdefault(key, []).append((record_type, insertion))
+        batching = key in _batch_depth
+
+    if not batching:
+        flush_core_memory(vault_path)
+
+
+def flush_core_memory(vault_path):
     """
-    vault = Path(vault_path)
-    memory_file = vault / "MEMORY.md"
+    把排队的记录一次性插入 MEMORY.md
 
+    持有 MEMORY.md 的锁完成读-改-写；有效的章节偏移索引可以省去对文件
+    内容的搜索。同一章节的多条记录按到达顺序依次插到标题下方（最新的在最上面）。
+    是否需要压缩由写入的字节数和索引中的条目数决定，不再重新读取 MEMORY.md。
+
+    Args:
+        vault_path: 笔记库路径
+
+    Returns:
+        写入的记录数
+    """
+    key = str(Path(vault_path).resolve())
+    with _pending_lock:
+        pending = _pending.pop(key, [])
+    if not pending:
+        return 0
+
+    memory_file = Path(vault_path) / "MEMORY.md"
     if not memory_file.exists():
         print(f"⚠️ 警告: MEMORY.md 不存在，跳过同步")
-        return
+        return 0
 
-    existing_content = memory_file.read_text(encoding="utf-8")
-    new_content = existing_content
-    
-    source_link = f"[[memory/{source_file}]]"
+    # 延迟导入：compact_memory 依赖本模块
+    from compact_memory import load_memory_rules, over_budget, compact_core_memory
+    rules = load_memory_rules()
 
-    if record_type == "用户偏好":
-        # 寻找 "## 用户偏好" 章节
-        pattern = r"(## 用户偏好\s*\n)"
-        match = re.search(pattern, existing_content)
-        if match:
-            # 构造要插入的行
-            insertion = f"- {title} (来源于 {source_link})\n"
-            # 插入到章节标题下方
-            insert_pos = match.end()
-            new_content = existing_content[:insert_pos] + insertion + existing_content[insert_pos:]
-            print(f"✓ 已同步到 MEMORY.md: 用户偏好")
-        else:
-             print(f"⚠️ 警告: 未在 MEMORY.md 中找到 '## 用户偏好' 章节")
-
-    elif record_type == "决策":
-        # 寻找 "## 重要决策历史" 章节
-        pattern = r"(## 重要决策历史\s*\n)"
-        match = re.search(pattern, existing_content)
-        if match:
-             # 构造要插入的块
-             # 提取内容摘要，去掉换行符，限制长度
-             summary = content.strip().split('\n')[0][:100]
-             insertion = f"### {date_str}: {title}\n- 决策内容: {summary}\n- 来源: {source_link}\n\n"
-             insert_pos = match.end()
-             new_content = existing_content[:insert_pos] + insertion + existing_content[insert_pos:]
-             print(f"✓ 已同步到 MEMORY.md: 决策")
-        else:
-             print(f"⚠️ 警告: 未在 MEMORY.md 中找到 '## 重要决策历史' 章节")
-
-    if new_content != existing_content:
-        memory_file.write_text(new_content, encoding="utf-8")
+    index = SectionIndex(vault_path)
+    # 读-改-写期间持有 MEMORY.md 的锁，避免并发记录互相覆盖
+    with get_coordinator(vault_path).locked(memory_file):
+        data = memory_file.read_bytes()
+        state = index.load()
+        if state is None or not index.verify(data, state["sections"]):
+            state = index.build(data)
+        sections = state["sections"]
+        counts = dict(state["counts"])
+
+        inserts = {}
+        written = 0
+        for record_type, insertion in pending:
+            heading = SECTION_HEADINGS[record_type]
+            if heading not in sections:
+                print(f"⚠️ 警告: 未在 MEMORY.md 中找到 '{heading}' 章节")
+                continue
+            # 后到的记录插在前面，与逐条插入的结果一致
+            inserts[heading] = insertion.encode("utf-8") + inserts.get(heading, b"")
+            counts[heading] = counts.get(heading, 0) + 1
+            written += 1
+            print(f"✓ 已同步到 MEMORY.md: {record_type}")
+
+        if not inserts:
+            return 0
+
+        chunks = []
+        position = 0
+        for heading in sorted(inserts, key=lambda h: sections[h]):
+            offset = sections[heading]
+            chunks.append(data[position:offset])
+            chunks.append(inserts[heading])
+            position = offset
+        chunks.append(data[position:])
+        new_data = b"".join(chunks)
+        atomic_write(memory_file, new_data)
+
+        # 插入点之后的章节整体后移
+        shifted = {}
+        for heading, offset in sections.items():
+            shifted[heading] = offset + sum(
+                len(inserted) for h, inserted in inserts.items() if sections[h] < offset
+            )
+        index.save({"sections": shifted, "counts": counts})
+        compact = over_budget(len(new_data), counts, rules)
+
+    # 超出 memory_rules 预算时压缩（压缩自己获取 MEMORY.md 的锁）
+    if compact:
+        stats = compact_core_memory(vault_path, rules)
+        print(f"📦 MEMORY.md 已压缩: 归档 {stats['archived']} 条")
+
+    return written
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+笔记库写入协调
+
+Agent 的 MarkdownManager、记录脚本和 sync_to_core_memory 都会写入同一批
+每日日志和 MEMORY.md。WriteCoordinator 为它们提供:
+
+- 按文件的跨进程排它锁 (locked)：读-改-写操作在锁内完成，不再丢失并发更新
+- 带预写日志的追加 (append)：同一时刻到达的追加请求合并为一批，
+  先整体写入日志（按持久化模式刷盘，always 模式下每批一次 fsync），
+  再按文件各写一次
+- 崩溃恢复 (recover)：重放日志中尚未标记完成的批次；重放按字节偏移
+  校验，已写入的部分不会重复追加。每次刷写前（持有日志锁）都会先重放
+  其他进程留下的未完成批次，长时间运行的进程不会在它们之后继续追加
+- 写入失败的文件先按日志补写一次，仍失败时截断回批次开始前的长度，
+  批次标记为完成（附带失败的文件），对应的追加请求抛出异常
+
+锁文件和日志位于 <笔记库>/.memory_journal/ 下。目标文件已不存在（归档、迁移
+布局）时，释放锁前删除它的锁文件；获取锁后核对锁文件仍是同一个 inode，等在
+被删除的锁文件上的进程会改用新的锁文件。
+"""
+
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    from append_writer import append_bytes, create_file
+    from persistence import sync_file, get_durability
+except ImportError:
+    import sys
+    sys.path.append(str(Path(__file__).parent))
+    from append_writer import append_bytes, create_file
+    from persistence import sync_file, get_durability
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 flock，只能协调同一进程内的写入
+    fcntl = None
+
+
+JOURNAL_DIR_NAME = ".memory_journal"
+JOURNAL_FILE = "journal.jsonl"
+
+# 日志超过该大小时做检查点：把涉及的文件刷盘后清空日志
+CHECKPOINT_BYTES = 1024 * 1024
+
+
+class WriteCoordinator:
+    """单个笔记库的写入协调器"""
+
+    def __init__(self, vault_path):
+        """
+        Args:
+            vault_path: 笔记库路径
+        """
+        self.vault = Path(vault_path).resolve()
+        self.journal_dir = self.vault / JOURNAL_DIR_NAME
+        self.lock_dir = self.journal_dir / "locks"
+        self.journal_path = self.journal_dir / JOURNAL_FILE
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread_locks = {}
+        self._thread_locks_guard = threading.Lock()
+        # 上次确认日志中没有未完成批次时日志的 (大小, mtime)，不变则无需重新读取
+        self._journal_checked = None
+
+    # ------------------------------------------------------------
+    # 锁
+    # ------------------------------------------------------------
+
+    def _lock_name(self, path):
+        """文件对应的锁名（笔记库内的相对路径）"""
+        path = Path(path).resolve()
+        try:
+            relative = path.relative_to(self.vault)
+        except ValueError:
+            relative = Path(path.name)
+        return "__".join(relative.parts)
+
+    @contextmanager
+    def _named_lock(self, name, target=None):
+        """
+        进程内线程锁 + 跨进程 flock
+
+        Args:
+            name: 锁名
+            target: 锁保护的文件，释放时已不存在则删除锁文件
+        """
+        with self._thread_locks_guard:
+            thread_lock = self._thread_locks.setdefault(name, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_path = self.lock_dir / f"{name}.lock"
+            lock_file = self._acquire(lock_path)
+            try:
+                yield
+            finally:
+                try:
+                    if target is not None and not target.exists():
+                        lock_path.unlink()
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def _acquire(self, lock_path, blocking=True):
+        """
+        打开并锁定锁文件；锁定期间锁文件被删除或替换时改用新的锁文件
+
+        Returns:
+            持有 flock 的文件对象，非阻塞且锁被占用时返回 None
+        """
+        while True:
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+            lock_file = open(lock_path, "a")
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return None
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+    def prune_locks(self):
+        """
+        删除目标文件已不存在的锁文件（如旧版本留下的、已归档日志的锁）
+
+        Returns:
+            删除的锁文件数
+        """
+        if fcntl is None or not self.lock_dir.exists():
+            return 0
+        pruned = 0
+        for lock_path in self.lock_dir.glob("*.lock"):
+            name = lock_path.name[:-len(".lock")]
+            if name == JOURNAL_FILE or (self.vault / name.replace("__", "/")).exists():
+                continue
+            # 正在被持有的锁留到释放时处理
+            lock_file = self._acquire(lock_path, blocking=False)
+            if lock_file is None:
+                continue
+            try:
+                lock_path.unlink()
+                pruned += 1
+            except FileNotFoundError:
+                pass
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+        return pruned
+
+    @contextmanager
+    def locked(self, path):
+        """
+        持有文件的排它锁，用于读-改-写
+
+        Args:
+            path: 要修改的文件
+        """
+        with self._named_lock(self._lock_name(path), Path(path).resolve()):
+            yield
+
+    # ------------------------------------------------------------
+    # 批量追加
+    # ------------------------------------------------------------
+
+    def append(self, path, text, initial=""):
+        """
+        追加文本到文件，与并发到达的其他追加合并为一批写入
+
+        Args:
+            path: 目标文件
+            text: 要追加的文本
+            initial: 文件不存在时写在前面的内容（frontmatter 等）
+
+        Returns:
+            (文本起始字节偏移, 是否新建了文件)
+        """
+        request = {
+            "path": Path(path).resolve(),
+            "data": text.encode("utf-8"),
+            "initial": initial.encode("utf-8"),
+            "done": False,
+            "result": None,
+            "error": None
+        }
+        with self._pending_lock:
+            self._pending.append(request)
+
+        # 组提交: 拿到刷写锁的线程把此时排队的所有请求一起写出
+        with self._flush_lock:
+            if not request["done"]:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                self._flush(batch)
+
+        if request["error"] is not None:
+            raise request["error"]
+        return request["result"]
+
+    def _flush(self, batch):
+        """把一批追加请求写入日志并应用到各文件"""
+        files = {}
+        for request in batch:
+            files.setdefault(request["path"], []).append(request)
+
+        try:
+            with self._named_lock(JOURNAL_FILE):
+                # 其他进程崩溃或写入失败留下的批次必须先完成，否则本批的偏移
+                # 会落在它们之后，它们以后再也无法重放
+                replayed = self._recover_locked()
+                if replayed:
+                    print(f"✓ 已从写入日志恢复 {replayed} 条未完成的写入")
+                with self._lock_files(sorted(files)):
+                    batch_id = uuid.uuid4().hex
+                    plan = self._plan(batch_id, files)
+                    self._write_journal([entry for entry, _ in plan.values()])
+                    failed = {}
+                    for path, (entry, data) in plan.items():
+                        try:
+                            moved = self._apply(path, entry, data)
+                        except Exception as e:
+                            failed[path] = self._recover_failed(path, entry, e)
+                            continue
+                        if moved is not None:
+                            # 文件已被别人创建，正文追加到了文件末尾
+                            for request in files[path]:
+                                position, _ = request["result"]
+                                request["result"] = (position + moved, False)
+                    done = {"applied": batch_id}
+                    if failed:
+                        done["failed"] = sorted(str(path) for path in failed)
+                    self._write_journal([done], sync=False)
+                    for path, error in failed.items():
+                        for request in files[path]:
+                            request["error"] = error
+                self._maybe_checkpoint()
+                self._journal_checked = self._journal_state()
+        except Exception as e:
+            for request in batch:
+                if request["error"] is None:
+                    request["error"] = e
+        finally:
+            for request in batch:
+                request["done"] = True
+
+    @contextmanager
+    def _lock_files(self, paths):
+        """按固定顺序获取多个文件锁，避免死锁"""
+        if not paths:
+            yield
+            return
+        with self.locked(paths[0]):
+            with self._lock_files(paths[1:]):
+                yield
+
+    def _plan(self, batch_id, files):
+        """计算每个文件本批要写入的字节和偏移，并回填各请求的结果"""
+        plan = {}
+        for path, requests in files.items():
+            create = not path.exists()
+            offset = 0 if create else path.stat().st_size
+            chunks = []
+            position = offset
+            for i, request in enumerate(requests):
+                if create and i == 0:
+                    chunks.append(request["initial"])
+                    position += len(request["initial"])
+                request["result"] = (position, create and i == 0)
+                chunks.append(request["data"])
+                position += len(request["data"])
+
+            data = b"".join(chunks)
+            entry = {
+                "batch": batch_id,
+                "file": str(path),
+                "offset": offset,
+                "create": create,
+                # 新建文件时开头的 frontmatter 和标题的字节数
+                "head": len(requests[0]["initial"]) if create else 0,
+                "text": data.decode("utf-8")
+            }
+            plan[path] = (entry, data)
+        return plan
+
+    def _apply(self, path, entry, data):
+        """
+        把一个文件的批量数据写入（持有该文件的锁）
+
+        Returns:
+            文件被不经过协调器的写入者抢先创建时，各请求偏移的改变量；否则为 None
+        """
+        if entry["create"]:
+            if create_file(path, data):
+                return None
+            head = entry["head"]
+            entry["offset"] = append_bytes(path, self._demote(path, entry))
+            return entry["offset"] - head
+        append_bytes(path, data)
+        return None
+
+    def _demote(self, path, entry):
+        """
+        新建文件时文件已被别人创建：去掉开头的 frontmatter 和标题，改为追加正文
+
+        改写后的记录先写入日志（取代原记录），重放和截断都按追加处理
+
+        Returns:
+            要追加的字节
+        """
+        body = entry["text"].encode("utf-8")[entry["head"]:]
+        entry.update(offset=path.stat().st_size, create=False, head=0, text=body.decode("utf-8"))
+        self._write_journal([entry])
+        return body
+
+    def _recover_failed(self, path, entry, error):
+        """
+        写入失败后按日志补写一次（只补写缺少的部分），仍失败时截断回批次开始前
+
+        Returns:
+            补写成功时返回 None，否则返回要报告给调用方的异常
+        """
+        try:
+            self._replay(entry)
+            with open(path, "rb") as f:
+                f.seek(entry["offset"])
+                if f.read() == entry["text"].encode("utf-8"):
+                    return None
+        except Exception:
+            pass
+        try:
+            if entry["create"]:
+                # 只删除本批创建的文件，别人创建的文件原样保留
+                data = entry["text"].encode("utf-8")
+                with open(path, "rb") as f:
+                    if f.read(len(data)) == data:
+                        path.unlink()
+            else:
+                os.truncate(path, entry["offset"])
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ 警告: 无法撤销对 {path.name} 的部分写入: {e}")
+        return error
+
+    # ------------------------------------------------------------
+    # 日志
+    # ------------------------------------------------------------
+
+    def _write_journal(self, entries, sync=True):
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            if sync:
+                sync_file(f)
+
+    def _journal_state(self):
+        try:
+            stat = self.journal_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _read_journal(self):
+        """读取日志，返回 (按批次分组的记录, 已完成（含已标记失败）的批次集合)"""
+        batches = {}
+        applied = set()
+        if not self.journal_path.exists():
+            return batches, applied
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时写了一半的最后一行
+                    continue
+                if "applied" in entry:
+                    applied.add(entry["applied"])
+                else:
+                    # 同一批次同一文件的后一条记录（_demote 改写的）取代前一条
+                    batches.setdefault(entry["batch"], {})[entry["file"]] = entry
+        return batches, applied
+
+    def _maybe_checkpoint(self):
+        """日志过大时把涉及的文件刷盘并清空日志（持有日志锁）"""
+        try:
+            if self.journal_path.stat().st_size < CHECKPOINT_BYTES:
+                return
+        except FileNotFoundError:
+            return
+
+        batches, _ = self._read_journal()
+        paths = {entry["file"] for entries in batches.values() for entry in entries.values()}
+        if get_durability() == "none":
+            paths = set()
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        with open(self.journal_path, "w", encoding="utf-8"):
+            pass
+
+    def _replay(self, entry):
+        """按偏移校验后重放一条日志记录，返回是否写入了数据"""
+        path = Path(entry["file"])
+        data = entry["text"].encode("utf-8")
+        offset = entry["offset"]
+
+        if not path.exists():
+            if not entry["create"]:
+                # 文件已被删除，不再恢复
+                return False
+            if create_file(path, data):
+                return True
+
+        with open(path, "rb") as f:
+            f.seek(offset)
+            written = f.read(len(data))
+        if written == data:
+            return False
+        if entry["create"] and "head" in entry:
+            # 文件是别人创建的（本批创建的文件一定以本批数据开头），只追加正文
+            append_bytes(path, self._demote(path, entry))
+            return True
+        if not data.startswith(written) or path.stat().st_size != offset + len(written):
+            # 写入之后文件又被修改过，无法安全重放
+            print(f"⚠️ 警告: 无法重放对 {path.name} 的写入，文件已被修改")
+            return False
+        append_bytes(path, data[len(written):])
+        return True
+
+    def recover(self):
+        """
+        重放日志中未完成的批次，并清理目标已不存在的锁文件
+
+        Returns:
+            重放的记录数
+        """
+        with self._named_lock(JOURNAL_FILE):
+            replayed = self._recover_locked()
+            self._journal_checked = self._journal_state()
+        self.prune_locks()
+        return replayed
+
+    def _recover_locked(self):
+        """重放未完成的批次（持有日志锁；日志自上次检查后没有变化时跳过）"""
+        if self._journal_checked is not None and self._journal_state() == self._journal_checked:
+            return 0
+        replayed = 0
+        batches, applied = self._read_journal()
+        for batch_id, entries in batches.items():
+            if batch_id in applied:
+                continue
+            for entry in entries.values():
+                with self.locked(entry["file"]):
+                    if self._replay(entry):
+                        replayed += 1
+            self._write_journal([{"applied": batch_id}])
+        return replayed
+
+
+_COORDINATORS = {}
+_COORDINATORS_LOCK = threading.Lock()
+
+
+def get_coordinator(vault_path):
+    """
+    获取笔记库的共享写入协调器，首次获取时执行崩溃恢复
+
+    Args:
+        vault_path: 笔记库路径
+
+    Returns:
+        WriteCoordinator 实例
+    """
+    key = str(Path(vault_path).resolve())
+    with _COORDINATORS_LOCK:
+        if key not in _COORDINATORS:
+            coordinator = WriteCoordinator(key)
+            replayed = coordinator.recover()
+            if replayed:
+                print(f"✓ 已从写入日志恢复 {replayed} 条未完成的写入")
+            _COORDINATORS[key] = coordinator
+        return _COORDINATORS[key]
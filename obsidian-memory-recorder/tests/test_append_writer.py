@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""append_writer 的测试：新建的每日日志按 umask 取得普通文件的权限"""
+
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+from append_writer import append_section, create_file
+
+
+class CreateFileModeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.previous_umask = os.umask(0o022)
+
+    def tearDown(self):
+        os.umask(self.previous_umask)
+        self.tmp.cleanup()
+
+    def mode(self, path):
+        return stat.S_IMODE(path.stat().st_mode)
+
+    def test_new_log_follows_umask(self):
+        log = self.root / "memory" / "2026-10-19.md"
+        start, created = append_section(log, "## 10:00 - 记录\n", initial="---\n---\n")
+        self.assertTrue(created)
+        self.assertEqual(self.mode(log), 0o644)
+
+    def test_sharded_log_follows_umask(self):
+        log = self.root / "memory" / "2026" / "10" / "2026-10-19.md"
+        self.assertTrue(create_file(log, b"# 2026-10-19\n"))
+        self.assertEqual(self.mode(log), 0o644)
+
+    def test_restrictive_umask(self):
+        os.umask(0o077)
+        log = self.root / "2026-10-19.md"
+        self.assertTrue(create_file(log, b"# 2026-10-19\n"))
+        self.assertEqual(self.mode(log), 0o600)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+归档日志读取
+
+超过保留期的每日日志由 obsidian-memory-recorder 的 archive_logs.py 按月打包到
+<笔记库>/archive/logs/YYYY-MM.zip，并在 catalog.json 中登记每个文件的
+日期、原 mtime 和大小。
+
+ArchiveStore 只读取目录（catalog），不解压任何内容；ArchivedFile 是归档中
+单个日志的句柄，提供与 Path 相同的 name / stem / stat() / read_bytes() / open()，
+只有在真正读取内容（命中）时才从压缩包中解压这一个文件。
+"""
+
+import json
+import os
+import zipfile
+from pathlib import Path
+
+
+ARCHIVE_FOLDER = Path("archive") / "logs"
+CATALOG_FILE = "catalog.json"
+
+
+class ArchivedFile:
+    """压缩包中的单个每日日志"""
+
+    def __init__(self, bundle, name, entry):
+        """
+        Args:
+            bundle: 压缩包路径
+            name: 文件名 (YYYY-MM-DD.md)
+            entry: catalog 中的记录 {"date", "mtime", "size", ...}
+        """
+        self.bundle = Path(bundle)
+        self.name = name
+        self.entry = entry
+
+    @property
+    def stem(self):
+        return Path(self.name).stem
+
+    @property
+    def suffix(self):
+        return Path(self.name).suffix
+
+    @property
+    def parent(self):
+        return self.bundle
+
+    def exists(self):
+        return self.bundle.exists()
+
+    def stat(self):
+        """返回归档时记录的原文件 mtime 和大小（缓存校验与原文件一致）"""
+        return os.stat_result((0, 0, 0, 0, 0, 0, self.entry["size"], 0, self.entry["mtime"], 0))
+
+    def read_bytes(self):
+        """从压缩包中解压并读取该文件"""
+        with zipfile.ZipFile(self.bundle) as bundle:
+            return bundle.read(self.name)
+
+    def read_text(self, encoding="utf-8"):
+        return self.read_bytes().decode(encoding)
+
+    def open(self, mode="rb"):
+        """以流的方式打开该文件（边解压边读取）"""
+        if mode != "rb":
+            raise ValueError("归档日志只能以 'rb' 模式打开")
+        with zipfile.ZipFile(self.bundle) as bundle:
+            return bundle.open(self.name)
+
+    def __str__(self):
+        return str(self.bundle / self.name)
+
+    def __repr__(self):
+        return f"ArchivedFile({self})"
+
+    def __fspath__(self):
+        return str(self)
+
+    def __eq__(self, other):
+        return isinstance(other, ArchivedFile) and str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __lt__(self, other):
+        return self.name < getattr(other, "name", str(other))
+
+
+class ArchiveStore:
+    """归档日志目录（catalog 按 mtime 重新加载）"""
+
+    def __init__(self, vault_path):
+        self.folder = Path(vault_path) / ARCHIVE_FOLDER
+        self.catalog_file = self.folder / CATALOG_FILE
+        self._catalog_mtime = None
+        self._files = {}
+
+    def _reload(self):
+        try:
+            mtime = self.catalog_file.stat().st_mtime
+        except FileNotFoundError:
+            self._catalog_mtime = None
+            self._files = {}
+            return
+        if mtime == self._catalog_mtime:
+            return
+        try:
+            with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return
+        self._catalog_mtime = mtime
+        self._files = {
+            name: ArchivedFile(self.folder / entry["bundle"], name, entry)
+            for name, entry in catalog.get("files", {}).items()
+        }
+
+    def get(self, name):
+        """
+        按文件名查找归档日志
+
+        Returns:
+            ArchivedFile，不存在时返回 None
+        """
+        self._reload()
+        return self._files.get(name)
+
+    def files(self, since=None, until=None):
+        """
+        列出归档日志（只读 catalog，不解压）
+
+        Args:
+            since: 起始日期（含），可选
+            until: 结束日期（含），可选
+
+        Returns:
+            ArchivedFile 列表
+        """
+        self._reload()
+        selected = []
+        for archived in self._files.values():
+            day = archived.entry.get("date")
+            if since and (not day or day < since):
+                continue
+            if until and (not day or day > until):
+                continue
+            selected.append(archived)
+        return selected
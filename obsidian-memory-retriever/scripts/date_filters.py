@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+日期范围过滤
+
+把快捷过滤器（retriever_config.json 中 filters.date.quick_filters 配置的
+/today、/this-week、/this-month）和 --date / --since / --until 统一解析为
+日期范围 (since, until)。范围在打开任何文件之前就按文件名（或归档 catalog、
+分区索引的日期）裁剪候选文件，只有落在范围内的日志才会被读取。
+
+日期按字符串比较，因此所有输入先经 parse_date() 校验并规范化为 YYYY-MM-DD
+（如 2025-1-5 -> 2025-01-05），无效的日期直接报错，不会静默地过滤掉结果。
+"""
+
+import re
+import sys
+from datetime import date, datetime, timedelta
+
+from retriever_config import get_setting
+
+
+# 快捷过滤器名称 -> 默认命令
+DEFAULT_QUICK_FILTERS = {
+    "today": "/today",
+    "this_week": "/this-week",
+    "this_month": "/this-month"
+}
+
+# 月、日不补零的日期（date.fromisoformat 不接受）
+LOOSE_DATE_PATTERN = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+
+
+def parse_date(value):
+    """
+    校验日期并规范化
+
+    Args:
+        value: 日期字符串（YYYY-MM-DD，月日可不补零）或 date 对象
+
+    Returns:
+        规范化的日期字符串 (YYYY-MM-DD)
+
+    Raises:
+        ValueError: 不是有效的日期
+    """
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    try:
+        return date.fromisoformat(text).isoformat()
+    except ValueError:
+        pass
+    match = LOOSE_DATE_PATTERN.match(text)
+    if match:
+        try:
+            return date(*(int(part) for part in match.groups())).isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"无效的日期: {value}（应为 YYYY-MM-DD）")
+
+
+def date_option(value, option):
+    """
+    解析命令行中的日期选项，无效时打印错误并退出
+
+    Args:
+        value: 选项的值
+        option: 选项名（用于错误信息，如 --since）
+
+    Returns:
+        规范化的日期字符串 (YYYY-MM-DD)
+    """
+    try:
+        return parse_date(value)
+    except ValueError as e:
+        print(f"❌ 错误: {option} {e}")
+        sys.exit(1)
+
+
+def quick_filter_range(name, today=None):
+    """
+    计算快捷过滤器对应的日期范围
+
+    Args:
+        name: 快捷过滤器名称 (today / this_week / this_month)
+        today: 基准日期，默认今天
+
+    Returns:
+        (since, until) 日期字符串 (YYYY-MM-DD)
+    """
+    today = today or date.today()
+    if name == "today":
+        start = end = today
+    elif name == "this_week":
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(days=6)
+    elif name == "this_month":
+        start = today.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        end = next_month - timedelta(days=1)
+    else:
+        raise ValueError(f"未知的快捷过滤器: {name}")
+    return start.isoformat(), end.isoformat()
+
+
+def resolve_quick_filter(token, config=None, today=None):
+    """
+    把命令行参数解析为快捷过滤器的日期范围
+
+    同时接受配置中的命令（如 /this-week）和对应的脚本选项（如 --this-week）。
+
+    Args:
+        token: 命令行参数
+        config: 检索配置字典
+        today: 基准日期，默认今天
+
+    Returns:
+        (since, until)，不是日期快捷过滤器时返回 None
+    """
+    config = config or {}
+    if not get_setting(config, "filters.date.enabled", True):
+        return None
+    commands = get_setting(config, "filters.date.quick_filters", DEFAULT_QUICK_FILTERS)
+    for name, command in commands.items():
+        if name in DEFAULT_QUICK_FILTERS and token in (command, "--" + command.lstrip("/")):
+            return quick_filter_range(name, today)
+    return None
+
+
+def date_bounds(filters=None, since=None, until=None):
+    """
+    合并过滤条件中的 date / since / until 与显式给出的范围（取交集）
+
+    Args:
+        filters: 过滤条件字典
+        since: 起始日期（含），可选
+        until: 结束日期（含），可选
+
+    Returns:
+        (since, until)，没有日期条件的一端为 None
+
+    Raises:
+        ValueError: 某个日期无效
+    """
+    filters = filters or {}
+    lower = [parse_date(d) for d in (since, filters.get("since"), filters.get("date")) if d]
+    upper = [parse_date(d) for d in (until, filters.get("until"), filters.get("date")) if d]
+    return (max(lower) if lower else None, min(upper) if upper else None)
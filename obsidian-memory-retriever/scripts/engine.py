@@ -0,0 +1,993 @@
+#!/usr/bin/env python3
+"""
+检索引擎
+
+RetrieverEngine 持有一个笔记库的全部检索状态：已解析文件缓存、分区索引、
+投影矩阵、查询向量缓存和检索配置，并提供 keyword() / semantic() /
+hybrid() / filter() 接口。Agent 工具、常驻查询服务等长期运行的宿主可以
+直接嵌入引擎，避免每次查询重新读取整个笔记库。
+
+search.py、semantic_search.py、hybrid_search.py 中的同名函数是对
+get_engine(vault) 的薄封装。
+
+超过保留期、已归档到 archive/logs/ 压缩包的日志不在热路径上：keyword() 和
+filter() 默认只扫描 memory/，include_archive=True 或按日期过滤到归档日期时
+才会加入归档日志（只读 catalog，命中时才解压）；semantic() 通过分区索引中
+保留的向量覆盖全部日志。
+
+没有索引可用时（解析缓存为空的单次查询、关闭 partition_index 的语义查询、
+首次建立分区索引），文件由 ScanExecutor 分片并行读取、解析和打分。
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 同级的记录技能，提供 memory/ 布局解析（平铺或按年月分片）和条目解析
+RECORDER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-recorder" / "scripts"
+if str(RECORDER_SCRIPTS) not in sys.path:
+    sys.path.append(str(RECORDER_SCRIPTS))
+from memory_paths import MemoryLayout
+from entry_parser import iter_blocks
+
+from retriever_config import load_retriever_config, get_setting
+from frontmatter_parser import parse_frontmatter_text
+from semantic_search import generate_sparse_embedding
+from partition_index import PartitionIndex, file_date
+from metadata_columns import extract_metadata
+from archive_store import ArchiveStore
+from date_filters import date_bounds
+from scan_executor import ScanExecutor, top_k
+from shadow_store import ShadowStore, folded_contains
+from keyword_sketch import SketchStore
+from ngram_index import NgramIndex, fuzzy_match
+from phrase_query import parse_query, match_text
+
+
+# 查询向量缓存的最大条目数
+EMBEDDING_CACHE_SIZE = 1024
+# 每条关键词命中最多记录的匹配位置数
+MAX_MATCH_OFFSETS = 8
+
+
+def matches_filters(frontmatter, filters):
+    """
+    判断记录是否满足过滤条件
+
+    Args:
+        frontmatter: 记录的 frontmatter
+        filters: 过滤条件字典 (date / since / until / type / importance / status / project / tags)
+
+    Returns:
+        是否满足
+    """
+    if not filters:
+        return True
+    # YAML 会把日期解析为 date 对象，统一按字符串比较
+    record_date = str(frontmatter.get("date") or "")
+    if "date" in filters:
+        if record_date != str(filters["date"]):
+            return False
+    if filters.get("since") and (not record_date or record_date < str(filters["since"])):
+        return False
+    if filters.get("until") and (not record_date or record_date > str(filters["until"])):
+        return False
+    if "type" in filters:
+        record_type = frontmatter.get("type", "")
+        if record_type != filters["type"]:
+            return False
+    if "importance" in filters:
+        record_importance = frontmatter.get("importance", 0)
+        if record_importance < filters["importance"]:
+            return False
+    if "status" in filters:
+        if frontmatter.get("status", "") != filters["status"]:
+            return False
+    if "project" in filters:
+        if frontmatter.get("project", "") != filters["project"]:
+            return False
+    if filters.get("tags"):
+        required = filters["tags"]
+        tags = frontmatter.get("tags", [])
+        if isinstance(tags, str):
+            tags = [tags]
+        for tag in [required] if isinstance(required, str) else required:
+            if tag not in tags:
+                return False
+    return True
+
+
+def parse_memory_bytes(data):
+    """
+    解析记忆文件内容
+
+    Args:
+        data: 文件内容字节
+
+    Returns:
+        (frontmatter, body, entries, 正文在文件中的字节偏移)
+    """
+    # 与 Agent 的 sync_memory 使用同一个条目解析器
+    frontmatter, body_start, entries = {}, 0, []
+    for block in iter_blocks(data):
+        if block["kind"] == "frontmatter":
+            frontmatter = parse_frontmatter_text(block["text"])
+            body_start = block["end"]
+        elif block["kind"] == "entry":
+            entries.append(block)
+    return frontmatter, data[body_start:].decode("utf-8"), entries, body_start
+
+
+def keyword_match(frontmatter, body, query_lower):
+    """
+    计算关键词匹配分数（标题 10、内容 5、每个标签 3）
+
+    Returns:
+        (分数, 匹配位置列表)
+    """
+    score = 0
+    match_details = []
+
+    # 标题匹配（权重 10）
+    title = frontmatter.get("title", "")
+    if query_lower in title.lower():
+        score += 10
+        match_details.append("标题")
+
+    # 内容匹配（权重 5）
+    if query_lower in body.lower():
+        score += 5
+        match_details.append("内容")
+
+    # 标签匹配（权重 3）
+    tags = frontmatter.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tags]
+    for tag in tags:
+        if query_lower in tag.lower():
+            score += 3
+            match_details.append(f"标签: {tag}")
+
+    return score, match_details
+
+
+def keyword_score(frontmatter, body, query_lower, fuzzy=False):
+    """
+    关键词打分，fuzzy 时正文没有精确匹配的文件再做近似匹配（权重 2）
+
+    Returns:
+        (分数, 匹配位置列表, 用于挑选命中条目的小写片段)
+    """
+    score, match_details = keyword_match(frontmatter, body, query_lower)
+    if fuzzy and "内容" not in match_details:
+        found = fuzzy_match(query_lower, body.lower())
+        if found:
+            distance, fragment = found
+            score += 2
+            match_details.append(f"近似: {fragment} (编辑距离 {distance})")
+            return score, match_details, fragment
+    return score, match_details, query_lower
+
+
+def match_offsets(body, needle, body_start, limit=MAX_MATCH_OFFSETS):
+    """
+    needle 在正文中出现的位置（摘要和高亮直接按区间截取）
+
+    Args:
+        body: 正文
+        needle: 小写的匹配片段
+        body_start: 正文在文件中的字节偏移
+        limit: 最多记录的位置数
+
+    Returns:
+        文件中的字节区间 [(起始, 结束), ...]
+    """
+    body_lower = body.lower()
+    # 个别字符小写后长度会变化，此时位置无法对应回原文
+    if not needle or len(body_lower) != len(body):
+        return []
+    offsets = []
+    byte_pos, char_pos = body_start, 0
+    found = body_lower.find(needle)
+    while found != -1 and len(offsets) < limit:
+        byte_pos += len(body[char_pos:found].encode("utf-8"))
+        end = byte_pos + len(body[found:found + len(needle)].encode("utf-8"))
+        offsets.append((byte_pos, end))
+        byte_pos, char_pos = end, found + len(needle)
+        found = body_lower.find(needle, char_pos)
+    return offsets
+
+
+def embedding_text(frontmatter, body):
+    """记录向量的输入文本（标题 + 内容前 500 字符）"""
+    return (frontmatter or {}).get("title", "") + " " + body[:500]
+
+
+# ------------------------------------------------------------
+# 并行扫描的分片任务（在 ScanExecutor 的工作进程中执行）
+# ------------------------------------------------------------
+
+def _keyword_shard(shard, query_lower, filters, fuzzy=False):
+    """关键词扫描一个分片，返回满足条件的命中"""
+    results = []
+    for position, data in shard:
+        try:
+            frontmatter, body, entries, body_start = parse_memory_bytes(data)
+        except Exception as e:
+            results.append((position, {"error": str(e)}))
+            continue
+        score, match_details, needle = keyword_score(frontmatter, body, query_lower, fuzzy)
+        if score > 0 and matches_filters(frontmatter, filters):
+            results.append((position, {
+                "frontmatter": frontmatter,
+                "body": body,
+                "score": score,
+                "matches": match_details,
+                "needle": needle,
+                "offsets": match_offsets(body, needle, body_start),
+                "entries": [e for e in entries if needle in e["text"].lower()]
+            }))
+    return results
+
+
+def _semantic_shard(shard, query_vector, threshold, filters):
+    """逐文件生成向量并与查询向量比较（不使用分区索引）"""
+    results = []
+    for position, data in shard:
+        try:
+            frontmatter, body, _, _ = parse_memory_bytes(data)
+        except Exception as e:
+            results.append((position, {"error": str(e)}))
+            continue
+        vector = generate_sparse_embedding(embedding_text(frontmatter, body))
+        # 向量均已归一化，点积即余弦相似度
+        similarity = sum(w * vector.get(b, 0.0) for b, w in query_vector.items())
+        if similarity >= threshold and matches_filters(frontmatter, filters):
+            results.append((position, {"frontmatter": frontmatter, "body": body, "similarity": similarity}))
+    return results
+
+
+def _prefetch_shard(shard, embed):
+    """解析一个分片，可选生成记录向量（预热缓存、首次建立索引时使用）"""
+    results = []
+    for position, data in shard:
+        try:
+            parsed = parse_memory_bytes(data)
+        except Exception as e:
+            results.append((position, {"error": str(e)}))
+            continue
+        frontmatter, body = parsed[:2]
+        result = {"parsed": parsed}
+        if embed:
+            result["vector"] = generate_sparse_embedding(embedding_text(frontmatter, body))
+        results.append((position, result))
+    return results
+
+
+class RetrieverEngine:
+    """单个笔记库的检索引擎"""
+
+    def __init__(self, vault_path, config=None):
+        """
+        Args:
+            vault_path: 笔记库路径
+            config: 检索配置字典，默认读取 retriever_config.json
+        """
+        self.vault = Path(vault_path)
+        self.memory_folder = self.vault / "memory"
+        self.config = config if config is not None else load_retriever_config()
+        self.layout = MemoryLayout(self.vault)
+        self.archive = ArchiveStore(self.vault)
+
+        # 路径 -> (mtime, size, frontmatter, body, entries, 正文字节偏移)
+        self._parsed = {}
+        # 路径 -> (mtime, size, 记录向量)，由并行预取生成，建立索引时取用
+        self._vectors = {}
+        # 没有索引可用时的并行全量扫描
+        self.scanner = ScanExecutor.from_config(self.config)
+        # 关键词搜索的预筛：N 元组倒排索引（关闭时改用每文件 Bloom 过滤器，均不打开
+        # 文件）和小写影子文件（字节查找）。影子文件是整个笔记库的一份小写副本，
+        # 默认（null）只在关闭 N 元组索引时启用
+        self.ngrams = NgramIndex(self.vault, self.layout) if get_setting(self.config, "scan.ngram_index", True) else None
+        self.sketches = SketchStore(self.vault, self.layout) if get_setting(self.config, "scan.bloom_sketch", True) else None
+        shadow_files = get_setting(self.config, "scan.shadow_files", None)
+        if shadow_files is None:
+            shadow_files = self.ngrams is None
+        self.shadows = ShadowStore(self.vault, self.layout) if shadow_files else None
+        # 粒度 -> PartitionIndex
+        self._indexes = {}
+        # 查询文本 -> (时间戳, 稀疏向量)
+        self._embeddings = {}
+        self.embedding_cache_enabled = get_setting(self.config, "embedding.cache_enabled", True)
+        self.embedding_cache_ttl = get_setting(self.config, "embedding.cache_ttl", 3600)
+
+        # 文件监视器运行时由它推送变更，查询不再扫描 memory 文件夹
+        self.watcher = None
+        self._files = None
+
+    # ------------------------------------------------------------
+    # 状态与缓存
+    # ------------------------------------------------------------
+
+    def memory_files(self, since=None, until=None):
+        """
+        列出记忆文件（监视模式下使用维护中的文件列表）
+
+        按年月分片时，日期范围之外的目录不会被列出。
+
+        Args:
+            since: 起始日期（含），可选
+            until: 结束日期（含），可选
+        """
+        if self._files is not None:
+            files = sorted(self._files)
+            if since or until:
+                files = [f for f in files if self._in_range(f, since, until)]
+            return files
+        return self.layout.files(since, until)
+
+    @staticmethod
+    def _in_range(md_file, since, until):
+        """文件名日期是否在范围内（文件名不是日期时视为在范围内）"""
+        day = file_date(md_file)
+        if not day:
+            return True
+        return not ((since and day < since) or (until and day > until))
+
+    def candidate_files(self, filters=None, include_archive=False):
+        """
+        列出需要扫描的文件：memory/ 中的热数据，加上需要时的归档日志
+
+        指定日期范围时按文件名裁剪（按年月分片时整个目录跳过），不打开
+        范围外的文件；范围内的归档日志按 catalog 自动加入。
+
+        Args:
+            filters: 过滤条件字典，date / since / until 决定日期范围
+            include_archive: 是否包含全部归档日志
+
+        Returns:
+            文件路径（归档日志为 ArchivedFile）列表
+        """
+        since, until = date_bounds(filters)
+        files = self.memory_files(since, until)
+        if include_archive or since or until:
+            archived = self.archive.files(since, until)
+        else:
+            return files
+        hot_names = {md_file.name for md_file in files}
+        return files + [a for a in archived if a.name not in hot_names]
+
+    @staticmethod
+    def _fresh(cache, md_file, stat):
+        """缓存中 md_file 的条目是否与 stat 的 mtime 和大小一致"""
+        cached = cache.get(str(md_file))
+        return cached is not None and cached[0] == stat.st_mtime and cached[1] == stat.st_size
+
+    def _parse(self, md_file):
+        """读取并解析记忆文件，按 mtime 和大小复用已解析结果"""
+        stat = md_file.stat()
+        key = str(md_file)
+        if self._fresh(self._parsed, md_file, stat):
+            return self._parsed[key]
+
+        cached = (stat.st_mtime, stat.st_size) + parse_memory_bytes(md_file.read_bytes())
+        self._parsed[key] = cached
+        return cached
+
+    def load_file(self, md_file):
+        """
+        读取并解析记忆文件，按 mtime 和大小复用已解析结果
+
+        Args:
+            md_file: 记忆文件路径
+
+        Returns:
+            (frontmatter, body)
+        """
+        return self._parse(md_file)[2:4]
+
+    def load_entries(self, md_file):
+        """
+        记忆文件中的记录条目（## HH:MM - 标题 开头的章节）
+
+        Args:
+            md_file: 记忆文件路径
+
+        Returns:
+            条目列表，字段见 entry_parser.iter_blocks()
+        """
+        return self._parse(md_file)[4]
+
+    def body_offset(self, md_file):
+        """正文在记忆文件中的字节偏移（frontmatter 之后）"""
+        return self._parse(md_file)[5]
+
+    def embed_query(self, text):
+        """
+        生成查询向量，在 embedding.cache_ttl 秒内复用
+
+        Args:
+            text: 查询文本
+
+        Returns:
+            稀疏向量
+        """
+        if not self.embedding_cache_enabled:
+            return generate_sparse_embedding(text)
+
+        now = time.time()
+        cached = self._embeddings.get(text)
+        if cached and now - cached[0] < self.embedding_cache_ttl:
+            return cached[1]
+
+        vector = generate_sparse_embedding(text)
+        if len(self._embeddings) >= EMBEDDING_CACHE_SIZE:
+            self._embeddings.pop(next(iter(self._embeddings)))
+        self._embeddings[text] = (now, vector)
+        return vector
+
+    def embed_file(self, md_file):
+        """
+        为记忆文件生成记录向量（标题 + 内容前 500 字符）
+
+        Args:
+            md_file: 记忆文件路径
+
+        Returns:
+            稀疏嵌入向量
+        """
+        stat = md_file.stat()
+        if self._fresh(self._vectors, md_file, stat):
+            return self._vectors.pop(str(md_file))[2]
+        frontmatter, body = self.load_file(md_file)
+        return generate_sparse_embedding(embedding_text(frontmatter, body))
+
+    def prefetch(self, files, embed=False):
+        """
+        并行解析尚未缓存的文件（可选同时生成记录向量）
+
+        文件数不足 scan.min_files 时什么也不做，由查询时按需顺序解析。
+
+        Args:
+            files: 文件路径列表
+            embed: 是否同时生成记录向量（首次建立分区索引时）
+
+        Returns:
+            预取的文件数
+        """
+        stale = []
+        for md_file in files:
+            try:
+                stat = md_file.stat()
+            except OSError:
+                continue
+            if not self._fresh(self._parsed, md_file, stat) or (embed and not self._fresh(self._vectors, md_file, stat)):
+                stale.append((md_file, stat))
+        if not self.scanner.use_parallel(len(stale)):
+            return 0
+
+        # 先取 stat 再读取：读取期间文件若被修改，下次访问时会重新解析
+        count = 0
+        for position, result in self.scanner.map(_prefetch_shard, [f for f, _ in stale], embed):
+            md_file, stat = stale[position]
+            if "error" in result:
+                print(f"⚠️  跳过文件 {md_file}: {result['error']}")
+                continue
+            key = str(md_file)
+            self._parsed[key] = (stat.st_mtime, stat.st_size) + result["parsed"]
+            if embed:
+                self._vectors[key] = (stat.st_mtime, stat.st_size, result["vector"])
+            count += 1
+        return count
+
+    def _scan(self, task, files, *args):
+        """
+        用并行扫描执行器处理文件列表
+
+        Returns:
+            结果字典列表（含 "file"），按文件在列表中的顺序
+        """
+        hits = []
+        for position, result in self.scanner.map(task, files, *args):
+            if "error" in result:
+                print(f"⚠️  跳过文件 {files[position]}: {result['error']}")
+                continue
+            result["file"] = files[position]
+            hits.append((position, result))
+        hits.sort(key=lambda hit: hit[0])
+        return [result for _, result in hits]
+
+    def describe_file(self, md_file):
+        """记忆文件参与过滤的元数据（复用已解析的 frontmatter）"""
+        frontmatter, _ = self.load_file(md_file)
+        return extract_metadata(frontmatter)
+
+    def partition_index(self, granularity="week"):
+        """
+        获取（并增量刷新）分区索引
+
+        Args:
+            granularity: 分区粒度
+
+        Returns:
+            PartitionIndex 实例
+        """
+        index = self._indexes.get(granularity)
+        if index is None:
+            index = PartitionIndex(self.vault, self.embed_file, granularity,
+                                   self.archive, self.layout, self.describe_file)
+            self._indexes[granularity] = index
+            if not index.index_file.exists():
+                # 首次建立索引：先并行解析全部文件并生成向量
+                self.prefetch(self.candidate_files(include_archive=True), embed=True)
+            index.refresh()
+            self._vectors.clear()
+        elif self.watcher is None:
+            index.refresh()
+        return index
+
+    def apply_changes(self, paths):
+        """
+        增量应用文件变更：重新解析变更的文件并更新所有已加载的索引
+
+        Args:
+            paths: 变更（含删除）的文件路径
+        """
+        memory_paths = []
+        for path in paths:
+            path = Path(path)
+            if not self.layout.is_memory_file(path):
+                continue
+            memory_paths.append(path)
+            self._parsed.pop(str(path), None)
+            if self.shadows is not None:
+                self.shadows.update(path)
+            if self.sketches is not None and not path.exists():
+                self.sketches.discard(path)
+            if self.ngrams is not None and not path.exists():
+                self.ngrams.discard(path)
+            if self._files is not None:
+                if path.exists():
+                    self._files.add(path)
+                else:
+                    self._files.discard(path)
+
+        for index in self._indexes.values():
+            index.update(memory_paths)
+
+    def watch(self, lock=None, **watcher_options):
+        """
+        启动文件监视器，保持索引随笔记库变化实时更新
+
+        Args:
+            lock: 可选的锁，应用变更时持有（与查询串行）
+            **watcher_options: 传给 VaultWatcher 的参数
+
+        Returns:
+            VaultWatcher 实例
+        """
+        from watcher import VaultWatcher
+
+        def on_change(paths):
+            if lock is None:
+                self.apply_changes(paths)
+            else:
+                with lock:
+                    self.apply_changes(paths)
+
+        self._files = set(self.layout.files())
+        self.watcher = VaultWatcher(self.vault, on_change, layout=self.layout, **watcher_options).start()
+        return self.watcher
+
+    def warm_up(self):
+        """预先解析所有记忆文件、建立影子文件和 N 元组索引，并构建默认分区索引"""
+        if not self.memory_folder.exists():
+            return
+        self.prefetch(self.memory_files())
+        for md_file in self.memory_files():
+            try:
+                self.load_file(md_file)
+                if self.shadows is not None:
+                    self.shadows.ensure(md_file)
+            except Exception:
+                continue
+        if self.ngrams is not None:
+            self.ngrams.refresh(self.memory_files())
+            self.ngrams.save()
+        self.partition_index(get_setting(self.config, "partition_index.granularity", "week"))
+
+    # ------------------------------------------------------------
+    # 检索接口
+    # ------------------------------------------------------------
+
+    def keyword(self, query, filters=None, include_archive=False, limit=None, fuzzy=False):
+        """
+        关键词搜索
+
+        先用 N 元组倒排索引求出包含查询的文件（不打开文件；查询本身是一个索引
+        键时结果精确，如 1~2 个汉字），再把候选文件当场小写、按字节验证其余查询
+        （关闭 N 元组索引时改用小写影子文件，mmap，不解码）。只有命中的文件才
+        解码正文、解析 frontmatter 和打分；
+        命中文件大多尚未解析（如命令行的单次查询）时，由并行扫描执行器分片处理。
+
+        Args:
+            query: 搜索查询
+            filters: 过滤条件字典
+            include_archive: 是否同时扫描已归档的日志
+            limit: 只返回分数最高的 limit 条，None 表示全部
+            fuzzy: 是否容错匹配（正文中与查询编辑距离 1~2 的片段也计分）
+
+        查询含引号或 NEAR 时按短语/邻近匹配（见 phrase_query），由位置倒排表回答。
+
+        Returns:
+            结果列表，按分数降序
+        """
+        if not self.memory_folder.exists():
+            print("❌ 错误: memory 文件夹不存在")
+            return []
+
+        plan = parse_query(query)
+        if plan is not None:
+            return self._phrase(plan, filters, include_archive, limit)
+
+        query_lower = query.lower()
+        files = self.candidate_files(filters, include_archive)
+        exact = False
+        if self.ngrams is not None:
+            # 倒排表求交：缺少查询的任一键的文件一定不包含查询，不必打开
+            files, exact = self._ngram_filter(files, query_lower, fuzzy)
+        elif self.sketches is not None and not fuzzy:
+            # Bloom 过滤器中缺少查询的任一键的文件一定不包含查询，不必打开
+            files = self.sketches.filter(files, query_lower)
+        if not exact and not fuzzy:
+            # 在内存映射的小写影子文件中查找查询字节，只有命中的文件才解码和解析；
+            # 没有影子文件时当场小写 N 元组索引筛出的候选文件
+            needle = query_lower.encode("utf-8")
+            if self.shadows is not None:
+                files = [md_file for md_file in files if self.shadows.may_contain(md_file, needle)]
+            elif self.ngrams is not None:
+                files = [md_file for md_file in files if folded_contains(md_file, needle)]
+        uncached = sum(1 for md_file in files if str(md_file) not in self._parsed)
+        if self.scanner.use_parallel(uncached):
+            results = self._scan(_keyword_shard, files, query_lower, filters, fuzzy)
+            return top_k(results, limit, key=lambda x: x["score"])
+
+        results = []
+
+        # 遍历所有记忆文件
+        for md_file in files:
+            try:
+                frontmatter, body = self.load_file(md_file)
+
+                # 计算匹配分数
+                score, match_details, needle = keyword_score(frontmatter, body, query_lower, fuzzy)
+
+                # 如果有匹配且满足过滤条件，添加到结果
+                if score > 0 and matches_filters(frontmatter, filters):
+                    results.append({
+                        "file": md_file,
+                        "frontmatter": frontmatter,
+                        "body": body,
+                        "score": score,
+                        "matches": match_details,
+                        # 命中的片段（近似匹配时与查询不同）
+                        "needle": needle,
+                        # 命中在文件中的字节区间（摘要和高亮直接按区间截取）
+                        "offsets": match_offsets(body, needle, self.body_offset(md_file)),
+                        # 正文命中的具体条目
+                        "entries": [
+                            entry for entry in self.load_entries(md_file)
+                            if needle in entry["text"].lower()
+                        ]
+                    })
+
+            except Exception as e:
+                print(f"⚠️  跳过文件 {md_file}: {e}")
+                continue
+
+        # 按分数排序
+        return top_k(results, limit, key=lambda x: x["score"])
+
+    def _phrase(self, plan, filters=None, include_archive=False, limit=None):
+        """
+        短语/邻近查询：位置倒排表给出命中的文件和字节区间，只解析命中的文件
+
+        打分与关键词搜索一致（标题 10、内容 5、每个标签 3）；未建立位置索引的
+        文件（归档日志，或关闭了 ngram_index）逐个读取后按词元匹配。
+
+        Returns:
+            结果列表，按分数降序
+        """
+        files = self.candidate_files(filters, include_archive)
+        indexed, matched = {}, {}
+        if self.ngrams is not None:
+            indexed = {md_file: name for name, md_file in self.ngrams.refresh(files, positions=True).items()}
+            self.ngrams.save()
+            matched = self.ngrams.positional(plan)
+
+        results = []
+        for md_file in files:
+            try:
+                if md_file in indexed:
+                    spans = matched.get(indexed[md_file])
+                else:
+                    spans = match_text(plan, md_file.read_bytes().decode("utf-8", errors="replace"))
+                if not spans:
+                    continue
+                frontmatter, body = self.load_file(md_file)
+                if not matches_filters(frontmatter, filters):
+                    continue
+
+                # 区间落在 frontmatter 中的只可能是标题或标签，单独匹配
+                body_start = self.body_offset(md_file)
+                offsets = [span for span in spans if span[0] >= body_start]
+                score, match_details = 0, []
+                if match_text(plan, str(frontmatter.get("title", ""))):
+                    score += 10
+                    match_details.append("标题")
+                if offsets:
+                    score += 5
+                    match_details.append("内容")
+                tags = frontmatter.get("tags", [])
+                for tag in [tags] if isinstance(tags, str) else tags:
+                    if match_text(plan, tag):
+                        score += 3
+                        match_details.append(f"标签: {tag}")
+                if score == 0:
+                    continue
+
+                results.append({
+                    "file": md_file,
+                    "frontmatter": frontmatter,
+                    "body": body,
+                    "score": score,
+                    "matches": match_details,
+                    "offsets": offsets[:MAX_MATCH_OFFSETS],
+                    # 包含命中区间的条目
+                    "entries": [
+                        entry for entry in self.load_entries(md_file)
+                        if any(entry["start"] <= start < entry["end"] for start, _ in offsets)
+                    ]
+                })
+            except Exception as e:
+                print(f"⚠️  跳过文件 {md_file}: {e}")
+                continue
+
+        return top_k(results, limit, key=lambda x: x["score"])
+
+    def _ngram_filter(self, files, query_lower, fuzzy=False):
+        """
+        用 N 元组倒排索引筛选候选文件（先增量索引变化过的文件）
+
+        Args:
+            files: 候选文件列表
+            query_lower: 小写查询
+            fuzzy: 是否同时保留与查询近似（共享足够多的键）的文件
+
+        Returns:
+            (文件列表, 是否精确)；精确时保留的索引内文件一定包含查询，
+            未建立索引的文件（如归档日志）总是保留
+        """
+        indexed = {md_file: name for name, md_file in self.ngrams.refresh(files).items()}
+        self.ngrams.save()
+        names, exact = self.ngrams.lookup(query_lower)
+        if names is None:
+            names = set(indexed.values())
+        if fuzzy:
+            names |= set(self.ngrams.similar(query_lower))
+        selected = [md_file for md_file in files if md_file not in indexed or indexed[md_file] in names]
+        return selected, exact and not fuzzy
+
+    def semantic(self, query, threshold=0.7, filters=None, probes=None, granularity="week",
+                 since=None, until=None, limit=None):
+        """
+        语义搜索
+
+        先按时间分区质心排序，指定 probes 时只扫描最相关的 probes 个分区；
+        分区内通过倒排表 (桶 -> 文件, 权重) 计算点积，只访问查询包含的桶。
+        配置中关闭 partition_index 时，逐文件生成向量全量扫描（并行）
+
+        Args:
+            query: 搜索查询
+            threshold: 相似度阈值
+            filters: 过滤条件
+            probes: 扫描的分区数量，None 表示扫描全部分区
+            granularity: 分区粒度 (day / week / month)
+            since: 起始日期（含），可选
+            until: 结束日期（含），可选
+            limit: 只返回相似度最高的 limit 条，None 表示全部
+
+        Returns:
+            结果列表，按相似度降序
+        """
+        if not self.memory_folder.exists():
+            print("❌ 错误: memory 文件夹不存在")
+            return []
+
+        query_vector = self.embed_query(query)
+        # 过滤条件中的日期同样用于裁剪分区
+        since, until = date_bounds(filters, since, until)
+
+        if not get_setting(self.config, "partition_index.enabled", True):
+            return self._semantic_scan(query_vector, threshold, filters, since, until, limit)
+
+        # 增量更新分区索引（只为变更过的文件重新生成向量）
+        index = self.partition_index(granularity)
+
+        results = []
+
+        # 只对候选分区内与查询共享桶的文件打分
+        # 过滤条件先转换为行掩码，只对满足条件的文件计算相似度
+        scored = index.score(query_vector, probes, since, until, include_zero=threshold <= 0, filters=filters)
+        for md_file, similarity in scored:
+            if similarity < threshold:
+                continue
+            try:
+                frontmatter, body = self.load_file(md_file)
+                if matches_filters(frontmatter, filters):
+                    results.append({
+                        "file": md_file,
+                        "frontmatter": frontmatter,
+                        "body": body,
+                        "similarity": similarity
+                    })
+            except Exception as e:
+                print(f"⚠️  跳过文件 {md_file}: {e}")
+                continue
+
+        # 按相似度排序
+        return top_k(results, limit, key=lambda x: x["similarity"])
+
+    def _semantic_scan(self, query_vector, threshold, filters, since, until, limit):
+        """
+        不使用分区索引的语义检索：逐文件生成向量并计算相似度
+
+        候选文件较多时由并行扫描执行器分片处理，结果用有界堆取前 limit 条。
+        """
+        scope = dict(filters or {})
+        if since:
+            scope["since"] = since
+        if until:
+            scope["until"] = until
+        files = self.candidate_files(scope, include_archive=True)
+
+        uncached = sum(1 for md_file in files if str(md_file) not in self._parsed)
+        if self.scanner.use_parallel(uncached):
+            results = self._scan(_semantic_shard, files, query_vector, threshold, filters)
+            return top_k(results, limit, key=lambda x: x["similarity"])
+
+        results = []
+        for md_file in files:
+            try:
+                frontmatter, body = self.load_file(md_file)
+            except Exception as e:
+                print(f"⚠️  跳过文件 {md_file}: {e}")
+                continue
+            vector = generate_sparse_embedding(embedding_text(frontmatter, body))
+            similarity = sum(w * vector.get(b, 0.0) for b, w in query_vector.items())
+            if similarity >= threshold and matches_filters(frontmatter, filters):
+                results.append({
+                    "file": md_file,
+                    "frontmatter": frontmatter,
+                    "body": body,
+                    "similarity": similarity
+                })
+        return top_k(results, limit, key=lambda x: x["similarity"])
+
+    def hybrid(self, query, keyword_weight=0.3, semantic_weight=0.7, filters=None):
+        """
+        混合搜索
+
+        Args:
+            query: 搜索查询
+            keyword_weight: 关键词权重
+            semantic_weight: 语义权重
+            filters: 过滤条件
+
+        Returns:
+            结果列表，按加权总分降序
+        """
+        if not self.memory_folder.exists():
+            print("❌ 错误: memory 文件夹不存在")
+            return []
+
+        keyword_results = self.keyword(query, filters)
+        # 与 semantic_search.py 使用相同的分区设置
+        semantic_results = self.semantic(
+            query, threshold=0.5, filters=filters,
+            probes=get_setting(self.config, "partition_index.probes"),
+            granularity=get_setting(self.config, "partition_index.granularity", "week"),
+        )
+
+        # 合并结果
+        combined_results = {}
+
+        for record in keyword_results:
+            file_path = str(record["file"])
+            combined_results[file_path] = {
+                "file": record["file"],
+                "frontmatter": record["frontmatter"],
+                "body": record["body"],
+                "keyword_score": record["score"],
+                "semantic_score": 0.0
+            }
+
+        for record in semantic_results:
+            file_path = str(record["file"])
+            if file_path not in combined_results:
+                combined_results[file_path] = {
+                    "file": record["file"],
+                    "frontmatter": record["frontmatter"],
+                    "body": record["body"],
+                    "keyword_score": 0.0,
+                    "semantic_score": record["similarity"]
+                }
+            else:
+                combined_results[file_path]["semantic_score"] = record["similarity"]
+
+        # 计算总分
+        results = []
+        for record_data in combined_results.values():
+            # 归一化分数
+            normalized_keyword = record_data["keyword_score"] / 10.0  # 假设最大关键词分为10
+            normalized_semantic = record_data["semantic_score"]  # 已经是0-1
+
+            # 计算加权总分
+            record_data["total_score"] = (keyword_weight * normalized_keyword) + (semantic_weight * normalized_semantic)
+            results.append(record_data)
+
+        # 按总分排序
+        results.sort(key=lambda x: x["total_score"], reverse=True)
+        return results
+
+    def filter(self, filters=None, include_archive=False):
+        """
+        仅按过滤条件列出记录（不做相关性打分）
+
+        Args:
+            filters: 过滤条件字典
+            include_archive: 是否同时列出已归档的日志
+
+        Returns:
+            结果列表，按日期降序
+        """
+        if not self.memory_folder.exists():
+            print("❌ 错误: memory 文件夹不存在")
+            return []
+
+        results = []
+        for md_file in self.candidate_files(filters, include_archive):
+            try:
+                frontmatter, body = self.load_file(md_file)
+                if matches_filters(frontmatter, filters):
+                    results.append({
+                        "file": md_file,
+                        "frontmatter": frontmatter,
+                        "body": body
+                    })
+            except Exception as e:
+                print(f"⚠️  跳过文件 {md_file}: {e}")
+                continue
+
+        results.sort(key=lambda x: x["file"].name, reverse=True)
+        return results
+
+
+# 笔记库路径 -> RetrieverEngine
+_ENGINES = {}
+
+
+def get_engine(vault_path):
+    """
+    获取笔记库的共享引擎实例
+
+    Args:
+        vault_path: 笔记库路径
+
+    Returns:
+        RetrieverEngine 实例
+    """
+    key = str(Path(vault_path).resolve())
+    if key not in _ENGINES:
+        _ENGINES[key] = RetrieverEngine(key)
+    return _ENGINES[key]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Frontmatter 解析
+
+记录脚本生成的 frontmatter 总是同一组扁平字段（date、time、type、title、
+tags、importance、project、status、updated），取值只有几种固定形式:
+
+    date: 2026-02-03              日期
+    time: "14:30"                 双引号字符串
+    tags: ['#技术', '#数据库']     引号字符串组成的行内列表
+    importance: 4                 整数
+    updated: 2026-02-03 14:30     日期 + 时分（YAML 中是普通字符串）
+
+快速路径逐行解析这些形式，结果与 yaml.safe_load 完全一致；任何一行不属于
+这些形式（多行值、块列表、转义、注释、true/null 等）时，整段交给 YAML
+解析（有 LibYAML 时使用 C 实现的 CSafeLoader）。
+
+结束分隔符按行查找（单独一行的 ---），正文中或字段值里的 --- 不会被当作边界。
+"""
+
+import re
+from datetime import date
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+
+CLOSING_DELIMITER = re.compile(r"^---[ \t]*\r?$", re.M)
+
+KEY_LINE = re.compile(r"^([A-Za-z_][\w-]*):(?:[ \t]+(.*?))?[ \t]*\r?$")
+INTEGER = re.compile(r"^(?:0|-?[1-9][0-9]*)$")
+DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+DATE_MINUTES = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}$")
+PLAIN_WORD = re.compile(r"^[^\W\d_][\w-]*$")
+DOUBLE_QUOTED = re.compile(r'^"([^"\\]*)"$')
+SINGLE_QUOTED = re.compile(r"^'([^']*)'$")
+FLOW_ITEM = re.compile(r"""^(?:"([^"\\,]*)"|'([^',]*)')$""")
+
+# YAML 1.1 中会被解析为布尔值或 null 的普通单词
+YAML_RESERVED = {"yes", "no", "true", "false", "on", "off", "null", "y", "n"}
+
+_UNPARSED = object()
+
+
+def _fast_value(text):
+    """
+    解析已知形式的取值
+
+    Returns:
+        解析结果，不属于已知形式时返回 _UNPARSED
+    """
+    match = DOUBLE_QUOTED.match(text) or SINGLE_QUOTED.match(text)
+    if match:
+        return match.group(1)
+    if INTEGER.match(text):
+        return int(text)
+    match = DATE.match(text)
+    if match:
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return _UNPARSED
+    if DATE_MINUTES.match(text):
+        return text
+    if text.startswith("[") and text.endswith("]"):
+        inner = text[1:-1].strip()
+        if not inner:
+            return []
+        items = []
+        for item in inner.split(","):
+            match = FLOW_ITEM.match(item.strip())
+            if not match:
+                return _UNPARSED
+            items.append(match.group(1) if match.group(1) is not None else match.group(2))
+        return items
+    if PLAIN_WORD.match(text) and text.lower() not in YAML_RESERVED:
+        return text
+    return _UNPARSED
+
+
+def parse_frontmatter_text(text):
+    """
+    解析 frontmatter 文本（不含分隔符）
+
+    Args:
+        text: frontmatter 文本
+
+    Returns:
+        字段字典，解析失败或不是映射时返回 {}
+    """
+    fields = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        match = KEY_LINE.match(line)
+        value = _UNPARSED
+        if match:
+            value = None if match.group(2) is None else _fast_value(match.group(2))
+        if value is _UNPARSED or value is None:
+            break
+        fields[match.group(1)] = value
+    else:
+        return fields
+
+    # 非常规 frontmatter，交给完整的 YAML 解析
+    try:
+        data = yaml.load(text, Loader=YamlLoader)
+    except Exception:
+        # 语法错误或非法取值（如 2026-13-01）
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def split_frontmatter(content):
+    """
+    按行定位 frontmatter 的起止分隔符
+
+    Returns:
+        (frontmatter 文本, 正文)，没有 frontmatter 时返回 (None, content)
+    """
+    if not content.startswith("---"):
+        return None, content
+    first_newline = content.find("\n")
+    if first_newline < 0 or content[3:first_newline].strip():
+        return None, content
+    closing = CLOSING_DELIMITER.search(content, first_newline + 1)
+    if closing is None:
+        return None, content
+    return content[first_newline + 1:closing.start()], content[closing.end():]
+
+
+def parse_frontmatter(content):
+    """
+    解析 YAML frontmatter
+
+    Args:
+        content: 文件内容
+
+    Returns:
+        (frontmatter, body)
+    """
+    text, body = split_frontmatter(content)
+    if text is None:
+        return {}, content
+    return parse_frontmatter_text(text), body
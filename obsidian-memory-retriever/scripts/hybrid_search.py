@@ -6,14 +6,11 @@
 """
 
 import sys
-from pathlib import Path
-import yaml
 
-
-# 导入搜索脚本中的函数
-# 注意: 在实际使用中，这些函数应该在共享模块中
-from search import keyword_search, parse_frontmatter
-from semantic_search import semantic_search, cosine_similarity
+from engine import get_engine
+from query_service import forward
+from retriever_config import load_retriever_config
+from date_filters import resolve_quick_filter, date_option
 
 
 def hybrid_search(query, database_path, keyword_weight=0.3, semantic_weight=0.7, filters=None):
@@ -30,67 +27,7 @@ def hybrid_search(query, database_path, keyword_weight=0.3, semantic_weight=0.7,
     Returns:
         结果列表 [(record, total_score, keyword_score, semantic_score), ...]
     """
-    vault = Path(database_path)
-    memory_folder = vault / "memory"
-
-    if not memory_folder.exists():
-        print("❌ 错误: memory 文件夹不存在")
-        return []
-
-    # 执行关键词搜索
-    keyword_results = keyword_search(query, database_path, filters)
-
-    # 执行语义搜索
-    semantic_results = semantic_search(query, database_path, threshold=0.5, filters=filters)
-
-    # 合并结果
-    combined_results = {}
-
-    # 处理关键词搜索结果
-    for record in keyword_results:
-        file_path = str(record["file"])
-        if file_path not in combined_results:
-            combined_results[file_path] = {
-                "file": record["file"],
-                "frontmatter": record["frontmatter"],
-                "body": record["body"],
-                "keyword_score": record["score"],
-                "semantic_score": 0.0
-            }
-        else:
-            combined_results[file_path]["keyword_score"] = record["score"]
-
-    # 处理语义搜索结果
-    for record in semantic_results:
-        file_path = str(record["file"])
-        if file_path not in combined_results:
-            combined_results[file_path] = {
-                "file": record["file"],
-                "frontmatter": record["frontmatter"],
-                "body": record["body"],
-                "keyword_score": 0.0,
-                "semantic_score": record["similarity"]
-            }
-        else:
-            combined_results[file_path]["semantic_score"] = record["similarity"]
-
-    # 计算总分
-    results = []
-    for file_path, record_data in combined_results.items():
-        # 归一化分数
-        normalized_keyword = record_data["keyword_score"] / 10.0  # 假设最大关键词分为10
-        normalized_semantic = record_data["semantic_score"]  # 已经是0-1
-
-        # 计算加权总分
-        total_score = (keyword_weight * normalized_keyword) + (semantic_weight * normalized_semantic)
-
-        record_data["total_score"] = total_score
-        results.append(record_data)
-
-    # 按总分排序
-    results.sort(key=lambda x: x["total_score"], reverse=True)
-
-    return results
+    return get_engine(database_path).hybrid(query, keyword_weight, semantic_weight, filters)
 
 
 def display_results(results, query, max_results=10):
@@ -158,7 +95,11 @@ if __name__ == "__main__":
         print("  --semantic-weight <数字>  设置语义权重 (默认: 0.7)")
         print("  --type <类型>          仅搜索指定类型")
         print("  --date <日期>          仅搜索指定日期")
+        print("  --since <日期>         仅搜索该日期及之后的记录")
+        print("  --until <日期>         仅搜索该日期及之前的记录")
+        print("  --today / --this-week / --this-month  快捷日期过滤（也可写作 /today 等）")
         print("  --importance <数字>    仅搜索重要程度>=N的记录")
+        print("  --tag <标签>           仅搜索带该标签的记录（可重复）")
         print("  --max <数字>           最多显示N条结果")
         print("\n示例:")
         print("  python hybrid_search.py ~/Obsidian/Vault \"找到技术决策，特别是关于 API 的\"")
@@ -170,6 +111,7 @@ if __name__ == "__main__":
     query = sys.argv[2]
 
     # 解析选项
+    config = load_retriever_config()
     keyword_weight = 0.3
     semantic_weight = 0.7
     filters = {}
@@ -189,7 +131,19 @@ if __name__ == "__main__":
             filters["type"] = sys.argv[i + 1]
             i += 2
         elif arg == "--date" and i + 1 < len(sys.argv):
-            filters["date"] = sys.argv[i + 1]
+            filters["date"] = date_option(sys.argv[i + 1], "--date")
+            i += 2
+        elif arg == "--since" and i + 1 < len(sys.argv):
+            filters["since"] = date_option(sys.argv[i + 1], "--since")
+            i += 2
+        elif arg == "--until" and i + 1 < len(sys.argv):
+            filters["until"] = date_option(sys.argv[i + 1], "--until")
+            i += 2
+        elif resolve_quick_filter(arg, config):
+            filters["since"], filters["until"] = resolve_quick_filter(arg, config)
+            i += 1
+        elif arg == "--tag" and i + 1 < len(sys.argv):
+            filters.setdefault("tags", []).append(sys.argv[i + 1])
             i += 2
         elif arg == "--importance" and i + 1 < len(sys.argv):
             filters["importance"] = int(sys.argv[i + 1])
@@ -200,8 +154,15 @@ if __name__ == "__main__":
         else:
             i += 1
 
-    # 执行搜索
-    results = hybrid_search(query, vault_path, keyword_weight, semantic_weight, filters)
+    # 查询服务运行时转发，否则在进程内搜索
+    search_kwargs = {
+        "keyword_weight": keyword_weight,
+        "semantic_weight": semantic_weight,
+        "filters": filters
+    }
+    results = forward("hybrid", vault_path, query, **search_kwargs)
+    if results is None:
+        results = hybrid_search(query, vault_path, **search_kwargs)
 
     # 显示结果
     display_results(results, query, max_results)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+每文件 Bloom 过滤器草图
+
+完整的倒排索引对小型笔记库太重，但没有索引时每次关键词查询都要打开每个
+文件。这里为每个记忆文件保存一个小型 Bloom 过滤器，全部放在一个 sidecar 中:
+
+    <笔记库>/.retriever_cache/keyword_sketch.json
+
+过滤器的键取自小写后的文本:
+  - 非 CJK 的词（字母、数字、下划线的连续串）: 词内的所有三元组，短于 3 个
+    字符的词整体作为一个键
+  - CJK 字符串: 每个字和相邻两字（二元组）
+
+关键词搜索是子串匹配（query.lower() in text.lower()），因此查询只取一定会
+出现在命中文件中的键：查询中每个词的三元组、被其他字符包围的完整短词、每个
+CJK 字和二元组。只要有一个键不在某文件的过滤器中，该文件一定不包含查询，
+无需打开；过滤器只会误报（约 2%），不会漏报。
+
+条目按文件 mtime 和大小校验，文件变化后在下次查询时重建。
+"""
+
+import base64
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+
+from partition_index import CACHE_DIR_NAME
+
+
+SKETCH_FILE = "keyword_sketch.json"
+SKETCH_VERSION = 1
+# 每个键 8 位、5 个哈希函数，误报率约 2%
+BITS_PER_KEY = 8
+NUM_HASHES = 5
+MIN_BITS = 64
+# 第二个哈希的 crc32 初值
+HASH_SEED = 0x9E3779B9
+
+# 假名、CJK 统一表意文字（含扩展 A）、谚文、兼容表意文字
+CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+CJK_CHAR = re.compile(f"[{CJK_RANGES}]")
+# CJK 串，或不含 CJK 的词
+RUN = re.compile(f"[{CJK_RANGES}]+|[^\\W{CJK_RANGES}]+")
+
+
+def text_keys(text):
+    """
+    文件文本（已小写）的全部草图键
+
+    Returns:
+        键集合
+    """
+    keys = set()
+    for match in RUN.finditer(text):
+        run = match.group()
+        if CJK_CHAR.match(run):
+            keys.update(run)
+            keys.update(run[i:i + 2] for i in range(len(run) - 1))
+        elif len(run) < 3:
+            keys.add(run)
+        else:
+            keys.update(run[i:i + 3] for i in range(len(run) - 2))
+    return keys
+
+
+def query_keys(query):
+    """
+    查询（已小写）中一定出现在命中文件里的键
+
+    查询首尾的词可能只是文件中某个更长的词的一部分，短于 3 个字符时不能
+    作为完整的词使用。
+
+    Returns:
+        键集合，为空时无法预筛
+    """
+    keys = set()
+    for match in RUN.finditer(query):
+        run = match.group()
+        if CJK_CHAR.match(run):
+            keys.update(run)
+            keys.update(run[i:i + 2] for i in range(len(run) - 1))
+        elif len(run) >= 3:
+            keys.update(run[i:i + 3] for i in range(len(run) - 2))
+        elif match.start() > 0 and match.end() < len(query):
+            keys.add(run)
+    return keys
+
+
+def key_hashes(key):
+    """键的两个基础哈希（双重哈希生成 NUM_HASHES 个位置，crc32 跨进程稳定）"""
+    data = key.encode("utf-8")
+    return zlib.crc32(data), zlib.crc32(data, HASH_SEED) | 1
+
+
+def build_bloom(keys):
+    """
+    为键集合生成 Bloom 过滤器
+
+    Returns:
+        位数组 (bytearray)，长度为 8 的倍数位
+    """
+    size = max(MIN_BITS, len(keys) * BITS_PER_KEY)
+    size = (size + 7) // 8 * 8
+    bits = bytearray(size // 8)
+    for key in keys:
+        h1, h2 = key_hashes(key)
+        for i in range(NUM_HASHES):
+            position = (h1 + i * h2) % size
+            bits[position >> 3] |= 1 << (position & 7)
+    return bits
+
+
+def bloom_contains(bits, hashes):
+    """过滤器是否（可能）包含全部键，hashes 为 key_hashes() 的结果列表"""
+    size = len(bits) * 8
+    for h1, h2 in hashes:
+        for i in range(NUM_HASHES):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+    return True
+
+
+class SketchStore:
+    """memory/ 中记忆文件的 Bloom 过滤器 sidecar"""
+
+    def __init__(self, vault_path, layout):
+        """
+        Args:
+            vault_path: 笔记库路径
+            layout: MemoryLayout（条目按相对 memory/ 的路径存放）
+        """
+        self.layout = layout
+        self.sketch_file = Path(vault_path) / CACHE_DIR_NAME / SKETCH_FILE
+        # 相对路径 -> {"mtime", "size", "bits"}（bits 在内存中为 bytes，磁盘上为 base64）
+        self.files = {}
+        self._loaded = False
+        self._dirty = False
+
+    def load(self):
+        """从磁盘加载，版本不符时丢弃"""
+        self._loaded = True
+        try:
+            with open(self.sketch_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return
+        if data.get("version") != SKETCH_VERSION:
+            return
+        self.files = {
+            name: dict(entry, bits=base64.b64decode(entry["bits"]))
+            for name, entry in data.get("files", {}).items()
+        }
+
+    def save(self):
+        """有变更时写回磁盘（先写临时文件再替换）"""
+        if not self._dirty:
+            return
+        self.sketch_file.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": SKETCH_VERSION,
+            "files": {
+                name: dict(entry, bits=base64.b64encode(entry["bits"]).decode("ascii"))
+                for name, entry in self.files.items()
+            }
+        }
+        tmp_file = self.sketch_file.with_name(f".{self.sketch_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_file, self.sketch_file)
+        self._dirty = False
+
+    def _name(self, md_file):
+        """条目键（相对 memory/ 的路径），不是 memory/ 中的文件时返回 None"""
+        if not isinstance(md_file, Path) or not self.layout.is_memory_file(md_file):
+            return None
+        try:
+            return self.layout.relative(md_file)
+        except ValueError:
+            return None
+
+    def sketch(self, md_file):
+        """
+        文件的 Bloom 过滤器，mtime 或大小变化时重建
+
+        Returns:
+            位数组，没有可用草图（如归档日志）时返回 None
+        """
+        if not self._loaded:
+            self.load()
+        name = self._name(md_file)
+        if name is None:
+            return None
+        stat = md_file.stat()
+        entry = self.files.get(name)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return entry["bits"]
+
+        text = md_file.read_bytes().decode("utf-8", errors="replace").lower()
+        bits = bytes(build_bloom(text_keys(text)))
+        self.files[name] = {"mtime": stat.st_mtime, "size": stat.st_size, "bits": bits}
+        self._dirty = True
+        return bits
+
+    def filter(self, files, query):
+        """
+        预筛：只保留可能包含查询的文件（只 stat，不打开未变化的文件）
+
+        Args:
+            files: 候选文件列表
+            query: 小写查询
+
+        Returns:
+            可能包含查询的文件列表
+        """
+        keys = query_keys(query)
+        if not keys:
+            return list(files)
+        hashes = [key_hashes(key) for key in keys]
+        selected = []
+        for md_file in files:
+            try:
+                bits = self.sketch(md_file)
+            except OSError:
+                bits = None
+            if bits is None or bloom_contains(bits, hashes):
+                selected.append(md_file)
+        self.save()
+        return selected
+
+    def discard(self, path):
+        """移除已删除文件的条目"""
+        if not self._loaded:
+            self.load()
+        name = self._name(path)
+        if name is not None and self.files.pop(name, None) is not None:
+            self._dirty = True
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+列式元数据与预过滤掩码
+
+分区索引中每个文件占一行，元数据按列存放:
+  importance        数值列 (array 'b')
+  date              数值列 (日期序数, array 'l')，行按日期排序
+  type/status/project  字典编码列 (值 -> 编号, array 'H')
+  tags              每行一个标签位集（标签 -> 位）
+
+每个取值另有一张行位图（Python 整数，第 i 位表示第 i 行），过滤条件因此
+变成位图的与/或运算，一次处理所有行，无需逐条比较；日期范围是按日期排序
+后连续的一段行。检索时先求出掩码，只对掩码中的行计算相似度。
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+
+# 字典编码的列及其在过滤条件中的键
+DICTIONARY_COLUMNS = ("type", "status", "project")
+
+
+def extract_metadata(frontmatter):
+    """
+    从 frontmatter 提取参与过滤的字段
+
+    Args:
+        frontmatter: 记录的 frontmatter
+
+    Returns:
+        {"importance", "type", "status", "project", "tags"}
+    """
+    frontmatter = frontmatter or {}
+    try:
+        importance = int(frontmatter.get("importance", 0) or 0)
+    except (TypeError, ValueError):
+        importance = 0
+    tags = frontmatter.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tags]
+    return {
+        "importance": importance,
+        "type": str(frontmatter.get("type", "") or ""),
+        "status": str(frontmatter.get("status", "") or ""),
+        "project": str(frontmatter.get("project", "") or ""),
+        "tags": [str(t) for t in tags or []]
+    }
+
+
+def iter_rows(mask):
+    """按行号升序遍历位图中置位的行"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _ordinal(date_str):
+    """日期字符串 -> 序数，无日期时为 0"""
+    if not date_str:
+        return 0
+    try:
+        return date.fromisoformat(str(date_str)).toordinal()
+    except ValueError:
+        return 0
+
+
+class MetadataColumns:
+    """一组文件的列式元数据和按取值的行位图"""
+
+    def __init__(self, files):
+        """
+        Args:
+            files: {文件名: 索引条目}，条目含 "date" 和 "meta"
+        """
+        # 按日期排序：日期范围对应连续的行
+        self.names = sorted(files, key=lambda n: (_ordinal(files[n].get("date")), n))
+        self.rows = {name: row for row, name in enumerate(self.names)}
+        self.all_rows = (1 << len(self.names)) - 1
+
+        self.dates = array("l")
+        self.importance = array("b")
+        self.vocab = {column: {} for column in DICTIONARY_COLUMNS}
+        self.codes = {column: array("H") for column in DICTIONARY_COLUMNS}
+        self.tag_vocab = {}
+        self.tag_bits = []
+
+        self._value_rows = {column: {} for column in DICTIONARY_COLUMNS}
+        self._importance_rows = {}
+        self._tag_rows = {}
+
+        for row, name in enumerate(self.names):
+            entry = files[name]
+            meta = entry.get("meta") or {}
+            bit = 1 << row
+            self.dates.append(_ordinal(entry.get("date")))
+
+            level = max(-128, min(127, meta.get("importance", 0)))
+            self.importance.append(level)
+            self._importance_rows[level] = self._importance_rows.get(level, 0) | bit
+
+            for column in DICTIONARY_COLUMNS:
+                value = meta.get(column, "")
+                code = self.vocab[column].setdefault(value, len(self.vocab[column]))
+                self.codes[column].append(code)
+                self._value_rows[column][code] = self._value_rows[column].get(code, 0) | bit
+
+            tag_set = 0
+            for tag in meta.get("tags", []):
+                tag_bit = self.tag_vocab.setdefault(tag, len(self.tag_vocab))
+                tag_set |= 1 << tag_bit
+                self._tag_rows[tag_bit] = self._tag_rows.get(tag_bit, 0) | bit
+            self.tag_bits.append(tag_set)
+
+        # 第一个有日期的行（无日期的行排在最前面）
+        self._first_dated = bisect_right(self.dates, 0)
+
+    def rows_of(self, names):
+        """文件名集合对应的行位图"""
+        mask = 0
+        for name in names:
+            mask |= 1 << self.rows[name]
+        return mask
+
+    def date_mask(self, since=None, until=None):
+        """日期范围内的行（按日期排序后的连续一段）"""
+        if not since and not until:
+            return self.all_rows
+        lo = bisect_left(self.dates, _ordinal(since)) if since else self._first_dated
+        lo = max(lo, self._first_dated)
+        hi = bisect_right(self.dates, _ordinal(until)) if until else len(self.names)
+        if hi <= lo:
+            return 0
+        return ((1 << hi) - 1) ^ ((1 << lo) - 1)
+
+    def mask(self, filters=None, since=None, until=None):
+        """
+        把过滤条件转换为行位图
+
+        Args:
+            filters: 过滤条件字典 (type / status / project / importance / tags)
+            since: 起始日期（含），可选
+            until: 结束日期（含），可选
+
+        Returns:
+            满足条件的行位图，没有任何条件时返回 None
+        """
+        filters = filters or {}
+        predicates = [k for k in DICTIONARY_COLUMNS + ("importance", "tags") if filters.get(k)]
+        if not predicates and not since and not until:
+            return None
+
+        mask = self.date_mask(since, until)
+        for column in DICTIONARY_COLUMNS:
+            if column in predicates:
+                code = self.vocab[column].get(str(filters[column]))
+                mask &= self._value_rows[column].get(code, 0) if code is not None else 0
+
+        if "importance" in predicates:
+            threshold = int(filters["importance"])
+            level_rows = 0
+            for level, rows in self._importance_rows.items():
+                if level >= threshold:
+                    level_rows |= rows
+            mask &= level_rows
+
+        if "tags" in predicates:
+            tags = filters["tags"]
+            for tag in [tags] if isinstance(tags, str) else tags:
+                tag_bit = self.tag_vocab.get(tag)
+                mask &= self._tag_rows.get(tag_bit, 0) if tag_bit is not None else 0
+
+        return mask
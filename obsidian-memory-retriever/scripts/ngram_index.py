@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+N 元组倒排索引（CJK 子串与近似关键词搜索）
+
+记忆大多是中文（决策、数据库、会议），关键词搜索却只能逐文件做小写子串匹配。
+NgramIndex 为 memory/ 中的每个文件记录与 keyword_sketch 相同的键（CJK 字和
+二元组、其他词的三元组与短词），并维护倒排表 键 -> [文件编号]:
+
+    <笔记库>/.retriever_cache/ngram_index.json
+
+- 子串查询: 查询的所有键的倒排表求交得到候选文件。查询本身就是一个键时
+  （1~2 个汉字，或 3 个字符的词片段）结果是精确的，无需再读取正文；更长的
+  查询只对候选文件做验证。
+- 近似查询: 按 q-gram 引理，与查询编辑距离不超过 k 的子串至少保留
+  len(键) - 3k 个查询键（一次编辑最多破坏 3 个键），重叠数达到该下限的文件
+  再在共享键附近用编辑距离验证。
+
+- 短语/邻近查询（见 phrase_query）: 位置倒排表 词元 -> [[文件编号, 序号, 字节偏移,
+  序号, 字节偏移...]] 按词元的哈希分为 POSITION_SHARDS 个分片，查询只加载所含
+  词元所在的分片:
+
+    <笔记库>/.retriever_cache/ngram_positions/tokens_XX.json
+    <笔记库>/.retriever_cache/ngram_positions/manifest.json
+
+  manifest 记录已并入分片的文件编号，以及最近建立位置的文件（增量，每个文件
+  词元 -> [序号, 字节偏移...]）；增量超过 DELTA_FILES 个文件时才并入分片，单个
+  文件变化不必改写全部分片。命中直接给出文件中的字节区间，摘要和高亮按区间
+  截取，无需重新扫描正文。
+
+文件变化时分配新的编号并追加倒排表（编号递增，倒排表保持有序），旧编号在
+读取时被过滤；失效编号超过有效文件数的 1/4 时压缩倒排表。压缩会重新编号，
+主索引与 manifest 中的 epoch 不一致时丢弃位置数据。位置数据未加载时变化的
+文件缺少位置，在下次短语查询时补建。
+"""
+
+import json
+import os
+import zlib
+from pathlib import Path
+
+from partition_index import CACHE_DIR_NAME
+from keyword_sketch import RUN, CJK_CHAR, text_keys, query_keys
+from phrase_query import tokenize, plan_tokens, match
+
+
+INDEX_FILE = "ngram_index.json"
+POSITIONS_DIR = "ngram_positions"
+MANIFEST_FILE = "manifest.json"
+# 旧版本的单文件位置倒排表（存在时删除）
+LEGACY_POSITIONS_FILE = "ngram_positions.json"
+INDEX_VERSION = 1
+# 位置倒排表的分片数（按词元的 CRC32 分配）
+POSITION_SHARDS = 64
+# 增量中的文件数超过该值时并入分片
+DELTA_FILES = 32
+# 失效编号占有效文件数的比例超过该值时压缩倒排表
+COMPACT_RATIO = 0.25
+# 一次编辑最多破坏的查询键数（CJK: 1 个字 + 2 个二元组；其他: 3 个三元组）
+KEYS_PER_EDIT = 3
+# 每个文件最多验证的候选位置数
+MAX_FUZZY_WINDOWS = 64
+
+
+def max_edits(query):
+    """近似匹配允许的编辑距离：3 个字符以上 1 次，8 个字符以上 2 次"""
+    length = len(query.strip())
+    if length >= 8:
+        return 2
+    if length >= 3:
+        return 1
+    return 0
+
+
+def is_exact_key(query):
+    """查询本身是否就是一个索引键（倒排表即精确答案）"""
+    runs = list(RUN.finditer(query))
+    if len(runs) != 1 or runs[0].group() != query:
+        return False
+    if CJK_CHAR.match(query):
+        return len(query) <= 2
+    return len(query) == 3
+
+
+def fuzzy_find(pattern, text, limit):
+    """
+    在 text 中查找与 pattern 编辑距离最小的子串（Sellers 算法）
+
+    Args:
+        pattern: 查询
+        text: 被搜索的文本
+        limit: 允许的最大编辑距离
+
+    Returns:
+        (编辑距离, 起始位置, 结束位置)，没有距离不超过 limit 的子串时返回 None
+    """
+    m = len(pattern)
+    # 每个单元格记录 (距离, 对齐的起始位置)；子串可以从任意位置开始
+    previous = [(i, 0) for i in range(m + 1)]
+    best = None
+    for j, char in enumerate(text, 1):
+        current = [(0, j)]
+        for i in range(1, m + 1):
+            cost, start = previous[i - 1]
+            candidate = (cost + (pattern[i - 1] != char), start)
+            if previous[i][0] + 1 < candidate[0]:
+                candidate = (previous[i][0] + 1, previous[i][1])
+            if current[i - 1][0] + 1 < candidate[0]:
+                candidate = (current[i - 1][0] + 1, current[i - 1][1])
+            current.append(candidate)
+        distance, start = current[m]
+        if distance <= limit and (best is None or distance < best[0]):
+            best = (distance, start, j)
+            if distance == 0:
+                break
+        previous = current
+    return best
+
+
+def shard_of(token):
+    """词元所在的位置分片"""
+    return zlib.crc32(token.encode("utf-8")) % POSITION_SHARDS
+
+
+class NgramIndex:
+    """memory/ 中记忆文件的 N 元组倒排索引"""
+
+    def __init__(self, vault_path, layout):
+        """
+        Args:
+            vault_path: 笔记库路径
+            layout: MemoryLayout（条目按相对 memory/ 的路径存放）
+        """
+        self.layout = layout
+        self.index_file = Path(vault_path) / CACHE_DIR_NAME / INDEX_FILE
+        self.positions_dir = Path(vault_path) / CACHE_DIR_NAME / POSITIONS_DIR
+        # 相对路径 -> {"id", "mtime", "size"}
+        self.files = {}
+        # 键 -> [文件编号]（升序，可能含失效编号）
+        self.postings = {}
+        self.next_id = 0
+        # 压缩（重新编号）的次数，位置数据的 epoch 不同时作废
+        self.epoch = 0
+        # 已并入分片的文件编号，与 文件编号 -> {词元: [序号, 字节偏移...]}（惰性加载）
+        self.merged = None
+        self.delta = None
+        # 分片编号 -> {词元: [[文件编号, 序号, 字节偏移...], ...]}（按需加载）
+        self._shards = {}
+        self._dirty_shards = set()
+        self._names = {}
+        # 文件路径 -> 相对路径（每次查询都要对全部候选文件求值）
+        self._relative = {}
+        self._loaded = False
+        self._dirty = False
+        self._positions_dirty = False
+
+    # ------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------
+
+    def load(self):
+        """从磁盘加载索引，版本不符时丢弃"""
+        self._loaded = True
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.files = data.get("files", {})
+        self.postings = data.get("postings", {})
+        self.next_id = data.get("next_id", 0)
+        self.epoch = data.get("epoch", 0)
+        self._names = {entry["id"]: name for name, entry in self.files.items()}
+
+    def load_positions(self):
+        """加载位置数据的 manifest（分片在查询时按需加载；epoch 或版本不符时丢弃）"""
+        if self.merged is not None:
+            return
+        if not self._loaded:
+            self.load()
+        self.merged, self.delta = set(), {}
+        data = self._read(self.positions_dir / MANIFEST_FILE)
+        if data is None or data.get("epoch") != self.epoch:
+            return
+        # 只保留仍然有效的编号（位置数据未加载时失效的文件）
+        self.delta = {
+            int(file_id): positions for file_id, positions in data.get("delta", {}).items()
+            if int(file_id) in self._names
+        }
+        self.merged = {i for i in data.get("merged", ()) if i in self._names} - self.delta.keys()
+
+    def _shard(self, shard):
+        """加载一个位置分片"""
+        if shard not in self._shards:
+            data = self._read(self.positions_dir / f"tokens_{shard:02x}.json")
+            self._shards[shard] = data.get("tokens", {}) if data else {}
+        return self._shards[shard]
+
+    def _read(self, path):
+        """读取 JSON 文件，不存在、损坏或版本不符时返回 None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return None
+        return data if data.get("version") == INDEX_VERSION else None
+
+    def save(self):
+        """有变更时写回磁盘（必要时先压缩倒排表，增量过大时并入分片）"""
+        if not self._dirty and not self._positions_dirty:
+            return
+        if self.next_id - len(self.files) > max(1, len(self.files)) * COMPACT_RATIO:
+            self.compact()
+        if self._dirty:
+            self._write(self.index_file, {
+                "version": INDEX_VERSION,
+                "epoch": self.epoch,
+                "next_id": self.next_id,
+                "files": self.files,
+                "postings": self.postings
+            })
+            self._dirty = False
+        if self._positions_dirty:
+            if len(self.delta) > DELTA_FILES:
+                self._merge()
+            # 先写分片再写 manifest：中途崩溃时 manifest 仍指向旧的有效数据
+            for shard in sorted(self._dirty_shards):
+                self._write(self.positions_dir / f"tokens_{shard:02x}.json", {
+                    "version": INDEX_VERSION,
+                    "tokens": self._shards[shard]
+                })
+            self._dirty_shards.clear()
+            self._write(self.positions_dir / MANIFEST_FILE, {
+                "version": INDEX_VERSION,
+                "epoch": self.epoch,
+                "merged": sorted(self.merged),
+                "delta": self.delta
+            })
+            self._positions_dirty = False
+            legacy = self.index_file.with_name(LEGACY_POSITIONS_FILE)
+            if legacy.exists():
+                legacy.unlink()
+
+    def _write(self, path, data):
+        """先写临时文件再替换"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        # json.dumps 一次性编码（C 实现），比 json.dump 逐块写入快得多
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+        os.replace(tmp_file, path)
+
+    def _merge(self):
+        """把增量并入全部分片，同时去掉失效编号的行"""
+        added = {}
+        for file_id, positions in self.delta.items():
+            for token, flat in positions.items():
+                added.setdefault(shard_of(token), {}).setdefault(token, []).append([file_id] + flat)
+        for shard in range(POSITION_SHARDS):
+            tokens = {}
+            for token, rows in self._shard(shard).items():
+                live = [row for row in rows if row[0] in self.merged]
+                if live:
+                    tokens[token] = live
+            for token, rows in added.get(shard, {}).items():
+                tokens.setdefault(token, []).extend(rows)
+            self._shards[shard] = tokens
+            self._dirty_shards.add(shard)
+        self.merged.update(self.delta)
+        self.delta = {}
+
+    def compact(self):
+        """去掉倒排表中的失效编号，并把有效编号重新编为 0..n-1"""
+        # 位置数据与主索引共用编号，必须一起重新编号（epoch 随之递增）
+        self.load_positions()
+        renumber = {}
+        for name in sorted(self.files, key=lambda n: self.files[n]["id"]):
+            renumber[self.files[name]["id"]] = len(renumber)
+            self.files[name]["id"] = renumber[self.files[name]["id"]]
+        postings = {}
+        for key, ids in self.postings.items():
+            live = [renumber[i] for i in ids if i in renumber]
+            if live:
+                postings[key] = live
+        if self.merged:
+            for shard in range(POSITION_SHARDS):
+                tokens = {}
+                for token, rows in self._shard(shard).items():
+                    live = [[renumber[row[0]]] + row[1:] for row in rows if row[0] in self.merged]
+                    if live:
+                        tokens[token] = live
+                self._shards[shard] = tokens
+                self._dirty_shards.add(shard)
+        self.postings = postings
+        self.merged = {renumber[i] for i in self.merged if i in renumber}
+        self.delta = {renumber[i]: positions for i, positions in self.delta.items() if i in renumber}
+        self.next_id = len(renumber)
+        self.epoch += 1
+        self._names = {entry["id"]: name for name, entry in self.files.items()}
+        self._dirty = self._positions_dirty = True
+
+    # ------------------------------------------------------------
+    # 增量更新
+    # ------------------------------------------------------------
+
+    def _name(self, md_file):
+        """条目键（相对 memory/ 的路径），不是 memory/ 中的文件时返回 None"""
+        if md_file in self._relative:
+            return self._relative[md_file]
+        name = None
+        if isinstance(md_file, Path) and self.layout.is_memory_file(md_file):
+            try:
+                name = self.layout.relative(md_file)
+            except ValueError:
+                pass
+        self._relative[md_file] = name
+        return name
+
+    def refresh(self, files, positions=False):
+        """
+        确保给定文件的索引条目是最新的（mtime 或大小变化时重新索引）
+
+        Args:
+            files: 文件路径列表
+            positions: 是否同时需要位置倒排表（缺少位置的文件重新索引）
+
+        Returns:
+            {相对路径: 文件}，只含已建立索引的文件
+        """
+        if not self._loaded:
+            self.load()
+        if positions:
+            self.load_positions()
+        indexed = {}
+        for md_file in files:
+            name = self._name(md_file)
+            if name is None:
+                continue
+            try:
+                stat = md_file.stat()
+                entry = self.files.get(name)
+                if not entry or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                    self._index(name, md_file, stat)
+                elif positions and entry["id"] not in self.merged and entry["id"] not in self.delta:
+                    # 位置数据加载前索引的文件：沿用原编号补建位置
+                    text = md_file.read_bytes().decode("utf-8", errors="replace")
+                    self._index_positions(entry["id"], text)
+            except OSError:
+                continue
+            indexed[name] = md_file
+        return indexed
+
+    def _index(self, name, md_file, stat):
+        """为文件分配新编号并追加到倒排表（旧编号随之失效）"""
+        text = md_file.read_bytes().decode("utf-8", errors="replace")
+        old = self.files.get(name)
+        if old:
+            self._forget(old["id"])
+        file_id = self.next_id
+        self.next_id += 1
+        for key in text_keys(text.lower()):
+            self.postings.setdefault(key, []).append(file_id)
+        if self.delta is not None:
+            self._index_positions(file_id, text)
+        self.files[name] = {"id": file_id, "mtime": stat.st_mtime, "size": stat.st_size}
+        self._names[file_id] = name
+        self._dirty = True
+
+    def _index_positions(self, file_id, text):
+        """把文件中每个词元的序号和字节偏移记入增量"""
+        positions = {}
+        for ordinal, (token, start, _) in enumerate(tokenize(text)):
+            positions.setdefault(token, []).extend((ordinal, start))
+        self.delta[file_id] = positions
+        self._positions_dirty = True
+
+    def _forget(self, file_id):
+        """使编号失效（倒排表中的编号在读取时过滤，压缩时移除）"""
+        self._names.pop(file_id, None)
+        if self.delta is None:
+            return
+        if self.delta.pop(file_id, None) is not None or file_id in self.merged:
+            self.merged.discard(file_id)
+            self._positions_dirty = True
+
+    def discard(self, path):
+        """移除已删除文件的条目（倒排表中的编号随之失效）"""
+        if not self._loaded:
+            self.load()
+        name = self._name(path)
+        entry = self.files.pop(name, None) if name is not None else None
+        if entry:
+            self._forget(entry["id"])
+            self._dirty = True
+
+    # ------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------
+
+    def _live(self, key):
+        """键的倒排表中仍然有效的文件编号"""
+        return {i for i in self.postings.get(key, ()) if i in self._names}
+
+    def lookup(self, query):
+        """
+        可能包含查询的文件
+
+        Args:
+            query: 小写查询
+
+        Returns:
+            (相对路径集合, 是否精确)，查询没有可用的键时返回 (None, False)
+        """
+        keys = query_keys(query)
+        if not keys:
+            return None, False
+        # 从最短的倒排表开始求交
+        ids = None
+        for key in sorted(keys, key=lambda k: len(self.postings.get(k, ()))):
+            ids = self._live(key) if ids is None else ids & self._live(key)
+            if not ids:
+                break
+        return {self._names[i] for i in ids}, is_exact_key(query)
+
+    def similar(self, query):
+        """
+        近似查询的候选文件（共享查询键的数量达到 q-gram 下限）
+
+        Args:
+            query: 小写查询
+
+        Returns:
+            {相对路径: 共享键数}
+        """
+        keys = query_keys(query)
+        edits = max_edits(query)
+        if not keys or not edits:
+            return {}
+        # 编辑距离不超过 edits 的匹配至少保留的查询键数
+        threshold = max(1, len(keys) - KEYS_PER_EDIT * edits)
+        counts = {}
+        for key in keys:
+            for file_id in self._live(key):
+                counts[file_id] = counts.get(file_id, 0) + 1
+        return {self._names[i]: n for i, n in counts.items() if n >= threshold}
+
+    def positional(self, plan):
+        """
+        按位置倒排表匹配短语/邻近查询（需先 refresh(files, positions=True)）
+
+        Args:
+            plan: phrase_query.parse_query() 的结果
+
+        Returns:
+            {相对路径: [(字节起始, 字节结束), ...]}，只含匹配的文件
+        """
+        self.load_positions()
+        # 每个词元: 文件编号 -> [序号, 字节偏移...]（只读取词元所在的分片；增量覆盖分片）
+        postings = {}
+        for token in plan_tokens(plan):
+            files = {row[0]: row[1:] for row in self._shard(shard_of(token)).get(token, ()) if row[0] in self.merged}
+            for file_id, positions in self.delta.items():
+                if token in positions:
+                    files[file_id] = positions[token]
+            postings[token] = files
+        if not postings or not all(postings.values()):
+            return {}
+
+        # 只有含全部词元的文件才可能匹配
+        ids = set.intersection(*(set(files) for files in postings.values()))
+        matched = {}
+        for file_id in ids:
+            flat = {token: files[file_id] for token, files in postings.items()}
+            spans = match(plan, {token: positions[0::2] for token, positions in flat.items()})
+            if spans:
+                # 序号 -> (字节偏移, 词元)；结束位置按最后一个词元的长度计算（词元已小写，与原文长度一致）
+                at = {
+                    positions[i]: (positions[i + 1], token)
+                    for token, positions in flat.items() for i in range(0, len(positions), 2)
+                }
+                matched[self._names[file_id]] = [
+                    (at[start][0], at[end][0] + len(at[end][1].encode("utf-8")))
+                    for start, end in spans
+                ]
+        return matched
+
+
+def fuzzy_match(query, text, limit=None):
+    """
+    在文本中查找与查询近似的片段，只在共享查询键的位置附近验证
+
+    Args:
+        query: 小写查询
+        text: 小写文本
+        limit: 允许的最大编辑距离，默认按查询长度（见 max_edits）
+
+    Returns:
+        (编辑距离, 匹配片段)，没有时返回 None
+    """
+    limit = max_edits(query) if limit is None else limit
+    if not limit:
+        return None
+    margin = len(query) + limit
+    positions = []
+    for key in sorted(query_keys(query), key=len, reverse=True):
+        start = text.find(key)
+        while start != -1 and len(positions) < MAX_FUZZY_WINDOWS:
+            positions.append(start)
+            start = text.find(key, start + 1)
+        if len(positions) >= MAX_FUZZY_WINDOWS:
+            break
+
+    best = None
+    covered = -1
+    for position in sorted(set(positions)):
+        lo = max(0, position - margin, covered)
+        hi = min(len(text), position + margin)
+        if hi <= lo:
+            continue
+        found = fuzzy_find(query, text[lo:hi], limit)
+        covered = hi - margin
+        if found and (best is None or found[0] < best[0]):
+            best = (found[0], text[lo + found[1]:lo + found[2]])
+            if best[0] == 0:
+                break
+    return best
+
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+时间分区向量索引
+
+记忆文件天然按日期分区（memory/YYYY-MM-DD.md 或分片后的 memory/YYYY/MM/YYYY-MM-DD.md）。本模块为每个分区（日/周/月）
+维护一个质心向量和分区内的倒排表 (桶 -> [(文件, 权重)])：查询时先按质心
+对分区排序，再只在最相关的若干分区中对查询包含的桶累加点积，
+可选按日期范围裁剪。向量均为稀疏表示 {桶编号: 权重}。
+
+索引持久化在 <笔记库>/.retriever_cache/ 下，按文件 mtime 和大小增量更新。
+已归档到 archive/logs/ 压缩包的日志保留在索引中（条目标记 archived），
+catalog 记录的原 mtime 和大小不变时无需解压重新生成向量。
+
+每个文件还缓存参与过滤的元数据（重要程度、类型、状态、项目、标签），
+构建分区时转换为列式数组和行位图（见 metadata_columns.py）：带过滤条件的
+查询先求出满足条件的行，跳过没有这些行的分区，只对剩下的行计算相似度。
+"""
+
+import json
+import math
+import os
+import re
+import sys
+from datetime import date
+from pathlib import Path
+
+# 同级的记录技能，提供 memory/ 布局解析（平铺或按年月分片）
+RECORDER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-recorder" / "scripts"
+if str(RECORDER_SCRIPTS) not in sys.path:
+    sys.path.append(str(RECORDER_SCRIPTS))
+from memory_paths import MemoryLayout
+
+from metadata_columns import MetadataColumns, iter_rows
+
+
+CACHE_DIR_NAME = ".retriever_cache"
+INDEX_VERSION = 3
+GRANULARITIES = ("day", "week", "month")
+UNDATED_PARTITION = "undated"
+
+DATE_STEM_PATTERN = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+
+
+def file_date(md_file):
+    """
+    从文件名解析日期
+
+    Args:
+        md_file: 记忆文件路径
+
+    Returns:
+        日期字符串 (YYYY-MM-DD)，文件名不是日期时返回 None
+    """
+    match = DATE_STEM_PATTERN.match(Path(md_file).stem)
+    if not match:
+        return None
+    try:
+        date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+    return Path(md_file).stem
+
+
+def partition_key(date_str, granularity="week"):
+    """
+    计算日期所属的分区键
+
+    Args:
+        date_str: 日期字符串 (YYYY-MM-DD)，可为 None
+        granularity: 分区粒度 (day / week / month)
+
+    Returns:
+        分区键，如 "2026-01-15"、"2026-W03"、"2026-01"
+    """
+    if not date_str:
+        return UNDATED_PARTITION
+    if granularity == "day":
+        return date_str
+    if granularity == "month":
+        return date_str[:7]
+    year, week, _ = date.fromisoformat(date_str).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _add_into(total, vector):
+    """将稀疏向量累加到 total（原地修改）"""
+    for bucket, weight in vector.items():
+        total[bucket] = total.get(bucket, 0.0) + weight
+
+
+class PartitionIndex:
+    """
+    两级时间分区索引
+
+    第一级是每个分区的质心，第二级是分区内各文件向量组成的倒排表。
+    """
+
+    def __init__(self, vault_path, embed_file, granularity="week", archive=None,
+                 layout=None, describe_file=None):
+        """
+        Args:
+            vault_path: 笔记库路径
+            embed_file: 为单个记忆文件生成稀疏向量的函数 (Path) -> {桶: 权重}
+            granularity: 分区粒度 (day / week / month)
+            archive: 可选的 ArchiveStore，归档日志同样参与语义检索
+            layout: 可选的 MemoryLayout（与引擎共享目录列表缓存）
+            describe_file: 可选，返回文件过滤元数据的函数 (Path) -> dict（见 extract_metadata）
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"无效的分区粒度: {granularity}")
+
+        self.vault = Path(vault_path)
+        self.memory_folder = self.vault / "memory"
+        self.embed_file = embed_file
+        self.describe_file = describe_file
+        self.granularity = granularity
+        self.archive = archive
+        self.layout = layout or MemoryLayout(self.vault)
+        self.index_file = self.vault / CACHE_DIR_NAME / f"partition_index_{granularity}.json"
+
+        # 文件名 -> {"mtime", "size", "date", "path", "meta", "vector", "archived"}
+        # path 为相对 memory/ 的路径（平铺或 YYYY/MM/ 分片），归档日志没有 path
+        self.files = {}
+        # 分区键 -> {"centroid", "norm", "files", "rows", "postings", "start", "end"}
+        self.partitions = {}
+        self.columns = MetadataColumns({})
+        self._loaded = False
+
+    def load(self):
+        """从磁盘加载索引，版本或粒度不符时丢弃"""
+        self._loaded = True
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("granularity") != self.granularity:
+            return
+        # JSON 对象的键总是字符串，还原为整数桶编号
+        self.files = {
+            name: dict(entry, vector={int(b): w for b, w in entry["vector"].items()})
+            for name, entry in data.get("files", {}).items()
+        }
+
+    def save(self):
+        """将索引写回磁盘"""
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": INDEX_VERSION,
+            "granularity": self.granularity,
+            "files": self.files
+        }
+        # 先写临时文件再替换，其他进程不会读到写了一半的索引
+        # （索引可以重建，不需要 fsync）
+        tmp_file = self.index_file.with_name(f".{self.index_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.index_file)
+
+    def _index_file(self, md_file, archived=False):
+        """
+        为文件生成索引条目，mtime 和大小未变时复用已有条目
+
+        Returns:
+            是否重新生成了向量
+        """
+        name = md_file.name
+        stat = md_file.stat()
+        cached = self.files.get(name)
+        if cached and cached["mtime"] == stat.st_mtime and cached["size"] == stat.st_size:
+            self._set_location(cached, md_file, archived)
+            return False
+        vector = self.embed_file(md_file)
+        entry = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "date": file_date(md_file),
+            "meta": self.describe_file(md_file) if self.describe_file else {},
+            "vector": vector
+        }
+        self._set_location(entry, md_file, archived)
+        self.files[name] = entry
+        return True
+
+    def _set_location(self, entry, md_file, archived):
+        """记录文件位置：memory/ 中的相对路径，或归档标记"""
+        if archived:
+            entry["archived"] = True
+            entry.pop("path", None)
+        else:
+            entry.pop("archived", None)
+            entry["path"] = self.layout.relative(md_file)
+
+    def refresh(self):
+        """
+        增量同步索引与 memory 文件夹（及归档 catalog）
+
+        只为新增或修改过的文件重新生成向量，删除的文件从索引移除。
+
+        Returns:
+            重新生成向量的文件数量
+        """
+        if not self._loaded:
+            self.load()
+
+        seen = set()
+        updated = 0
+        candidates = [(md_file, False) for md_file in self.layout.files()]
+        if self.archive:
+            candidates += [(archived, True) for archived in self.archive.files()]
+        for md_file, archived in candidates:
+            # memory/ 中的版本优先于归档中的同名日志
+            if md_file.name in seen:
+                continue
+            seen.add(md_file.name)
+            try:
+                updated += self._index_file(md_file, archived)
+            except Exception as e:
+                print(f"⚠️  跳过文件 {md_file}: {e}")
+                continue
+
+        removed = [name for name in self.files if name not in seen]
+        for name in removed:
+            del self.files[name]
+
+        if updated or removed or not self.index_file.exists():
+            self.save()
+
+        if updated or removed or not self.partitions:
+            self._build_partitions()
+        return updated
+
+    def update(self, paths):
+        """
+        只更新指定文件（由文件监视器调用），无需扫描整个 memory 文件夹
+
+        Args:
+            paths: 变更（含删除）的文件路径
+
+        Returns:
+            重新生成向量的文件数量
+        """
+        if not self._loaded:
+            self.load()
+
+        updated = 0
+        changed = False
+        for path in paths:
+            path = Path(path)
+            if not self.layout.is_memory_file(path):
+                continue
+            name = path.name
+            if not path.exists():
+                # 迁移布局时同名文件被移到了新位置，由新路径的事件更新
+                cached = self.files.get(name)
+                if cached and not cached.get("archived") and cached.get("path", name) != self.layout.relative(path):
+                    continue
+                # 被归档的日志改为指向压缩包，向量继续复用
+                archived = self.archive.get(name) if self.archive else None
+                if archived is not None:
+                    try:
+                        updated += self._index_file(archived, archived=True)
+                    except Exception as e:
+                        print(f"⚠️  跳过文件 {archived}: {e}")
+                    changed = True
+                    continue
+                changed = self.files.pop(name, None) is not None or changed
+                continue
+            # 内容未变（如迁移布局时的 rename）只更新位置，不重新生成向量
+            try:
+                updated += self._index_file(path)
+            except Exception as e:
+                print(f"⚠️  跳过文件 {path}: {e}")
+                continue
+            changed = True
+
+        if changed:
+            self.save()
+            self._build_partitions()
+        return updated
+
+    def _build_partitions(self):
+        """根据文件向量计算各分区的质心、倒排表和日期范围"""
+        partitions = {}
+        for name, entry in self.files.items():
+            key = partition_key(entry["date"], self.granularity)
+            partition = partitions.setdefault(key, {
+                "centroid": {},
+                "files": [],
+                "postings": {},
+                "start": entry["date"],
+                "end": entry["date"]
+            })
+            partition["files"].append(name)
+            _add_into(partition["centroid"], entry["vector"])
+            for bucket, weight in entry["vector"].items():
+                partition["postings"].setdefault(bucket, []).append((name, weight))
+            if entry["date"]:
+                partition["start"] = min(partition["start"], entry["date"])
+                partition["end"] = max(partition["end"], entry["date"])
+
+        self.columns = MetadataColumns(self.files)
+        for partition in partitions.values():
+            count = len(partition["files"])
+            partition["centroid"] = {b: w / count for b, w in partition["centroid"].items()}
+            partition["norm"] = math.sqrt(sum(w * w for w in partition["centroid"].values()))
+            partition["rows"] = self.columns.rows_of(partition["files"])
+
+        self.partitions = partitions
+
+    def rank_partitions(self, query_vector, since=None, until=None, mask=None):
+        """
+        按质心相似度对分区排序
+
+        Args:
+            query_vector: 归一化的稀疏查询向量
+            since: 起始日期（含），可选
+            until: 结束日期（含），可选
+            mask: 可选的行位图，不含其中任何行的分区被跳过
+
+        Returns:
+            [(分区键, 质心相似度), ...]，按相似度降序
+        """
+        ranked = []
+        for key, partition in self.partitions.items():
+            if mask is not None and not partition["rows"] & mask:
+                continue
+            if since or until:
+                if key == UNDATED_PARTITION:
+                    continue
+                if since and partition["end"] < since:
+                    continue
+                if until and partition["start"] > until:
+                    continue
+            centroid = partition["centroid"]
+            score = 0.0
+            if partition["norm"] > 0:
+                dot = sum(w * centroid.get(b, 0.0) for b, w in query_vector.items())
+                score = dot / partition["norm"]
+            ranked.append((key, score))
+
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        return ranked
+
+    def _in_range(self, name, since, until):
+        """判断文件日期是否在范围内"""
+        file_day = self.files[name]["date"]
+        if since and (not file_day or file_day < since):
+            return False
+        if until and (not file_day or file_day > until):
+            return False
+        return True
+
+    def score(self, query_vector, probes=None, since=None, until=None, include_zero=False, filters=None):
+        """
+        在最相关的分区内通过倒排表计算相似度
+
+        向量已归一化，点积即余弦相似度；只访问查询包含的桶，
+        代价与查询长度（而非向量维度）成正比。
+
+        有过滤条件或日期范围时，先由列式元数据求出满足条件的行，
+        只对这些行计算相似度。
+
+        Args:
+            query_vector: 归一化的稀疏查询向量
+            probes: 扫描的分区数量，None 表示扫描所有符合条件的分区
+            since: 起始日期（含），可选
+            until: 结束日期（含），可选
+            include_zero: 是否包含与查询没有公共桶（相似度为 0）的文件
+            filters: 过滤条件字典 (type / status / project / importance / tags)
+
+        Returns:
+            [(文件路径, 相似度), ...]
+        """
+        mask = self.columns.mask(filters, since, until)
+        ranked = self.rank_partitions(query_vector, since, until, mask)
+        if probes is not None and probes > 0:
+            ranked = ranked[:probes]
+
+        if mask is not None:
+            return self._score_rows(query_vector, ranked, mask, include_zero)
+
+        scores = {}
+        for key, _ in ranked:
+            partition = self.partitions[key]
+            if include_zero:
+                for name in partition["files"]:
+                    scores.setdefault(name, 0.0)
+            for bucket, query_weight in query_vector.items():
+                for name, weight in partition["postings"].get(bucket, ()):
+                    scores[name] = scores.get(name, 0.0) + query_weight * weight
+
+        return [
+            (self.path(name), similarity)
+            for name, similarity in scores.items()
+            if self._in_range(name, since, until)
+        ]
+
+    def _score_rows(self, query_vector, ranked, mask, include_zero):
+        """只对分区中掩码选中的行计算相似度"""
+        names = self.columns.names
+        results = []
+        for key, _ in ranked:
+            for row in iter_rows(self.partitions[key]["rows"] & mask):
+                name = names[row]
+                entry = self.files[name]
+                vector = entry["vector"]
+                similarity = sum(w * vector.get(b, 0.0) for b, w in query_vector.items())
+                if similarity == 0.0 and not include_zero:
+                    continue
+                results.append((self.path(name), similarity))
+        return results
+
+    def path(self, name):
+        """索引中文件名对应的路径（归档日志返回 ArchivedFile 句柄）"""
+        entry = self.files[name]
+        if entry.get("archived") and self.archive:
+            archived = self.archive.get(name)
+            if archived is not None:
+                return archived
+        if "path" in entry:
+            return self.memory_folder / entry["path"]
+        return self.layout.locate(name)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+短语与邻近查询
+
+关键词搜索默认是小写子串匹配。查询中含有引号或 NEAR 运算符时按词元位置匹配:
+
+    "数据库 选择"              短语：词元依次相邻
+    数据库 NEAR/5 PostgreSQL   邻近：两段之间最多隔 5 个词元（任意顺序）
+    "学习 rust" NEAR 所有权     NEAR 不带距离时为 DEFAULT_NEAR_DISTANCE
+
+词元是小写的非 CJK 词（字母、数字、下划线的连续串）或单个 CJK 字，因此英文
+按整词匹配（rust 不匹配 rusty），中文逐字相邻即可（"数据库选择" 与
+"数据库 选择" 等价）。NEAR 只能是大写，可以串联（A NEAR B NEAR C 要求每对
+相邻的段都满足距离）；每段内的引号只起分组作用，段内的词元构成一个短语。
+
+匹配结果是词元区间，由调用方换算为文件中的字节区间（用于摘要和高亮）。
+"""
+
+import re
+
+from keyword_sketch import RUN, CJK_CHAR
+
+
+# NEAR 不指定距离时允许间隔的词元数
+DEFAULT_NEAR_DISTANCE = 10
+# 查询中的 NEAR 运算符（只识别大写，避免与普通单词 near 混淆）
+NEAR_OPERATOR = re.compile(r"\s+NEAR(?:/(\d+))?\s+")
+# 半角与全角引号
+QUOTES = "\"“”「」"
+
+
+def tokenize(text):
+    """
+    切分词元
+
+    Args:
+        text: 文本
+
+    Returns:
+        [(小写词元, 字节起始, 字节结束), ...]，字节位置为 text 的 UTF-8 编码中的位置
+    """
+    tokens = []
+    byte_pos = 0
+    last = 0
+    for match in RUN.finditer(text):
+        byte_pos += len(text[last:match.start()].encode("utf-8"))
+        run = match.group()
+        if CJK_CHAR.match(run):
+            for char in run:
+                size = len(char.encode("utf-8"))
+                tokens.append((char, byte_pos, byte_pos + size))
+                byte_pos += size
+        else:
+            size = len(run.encode("utf-8"))
+            tokens.append((run.lower(), byte_pos, byte_pos + size))
+            byte_pos += size
+        last = match.end()
+    return tokens
+
+
+def parse_query(query):
+    """
+    解析短语/邻近查询
+
+    Args:
+        query: 原始查询
+
+    Returns:
+        {"operands": [[词元, ...], ...], "distances": [距离, ...]}；
+        不含引号和 NEAR 的普通查询返回 None（按子串匹配）
+    """
+    has_quotes = any(quote in query for quote in QUOTES)
+    if not has_quotes and not NEAR_OPERATOR.search(query):
+        return None
+
+    operands, distances = [], []
+    parts = NEAR_OPERATOR.split(query)
+    # split 的结果交替为 段, 距离, 段, 距离, ...
+    for i in range(0, len(parts), 2):
+        operands.append([token for token, _, _ in tokenize(parts[i])])
+        if i + 1 < len(parts):
+            distance = parts[i + 1]
+            distances.append(int(distance) if distance else DEFAULT_NEAR_DISTANCE)
+    return {"operands": operands, "distances": distances}
+
+
+def plan_tokens(plan):
+    """查询涉及的全部词元"""
+    return {token for operand in plan["operands"] for token in operand}
+
+
+def occurrences(operand, positions):
+    """
+    短语在文件中的出现位置
+
+    Args:
+        operand: 短语的词元列表
+        positions: {词元: 词元序号集合或列表}
+
+    Returns:
+        [(起始序号, 结束序号), ...]（含两端），按起始序号排序
+    """
+    if not operand:
+        return []
+    first = positions.get(operand[0], ())
+    rest = [set(positions.get(token, ())) for token in operand[1:]]
+    return [
+        (start, start + len(operand) - 1)
+        for start in sorted(first)
+        if all(start + i in ordinals for i, ordinals in enumerate(rest, 1))
+    ]
+
+
+def _near(a, b, distance):
+    """两个出现位置之间（任意顺序）最多隔 distance 个词元"""
+    gap = b[0] - a[1] - 1 if b[0] > a[1] else a[0] - b[1] - 1
+    return gap <= distance
+
+
+def match(plan, positions):
+    """
+    按词元位置匹配查询
+
+    Args:
+        plan: parse_query() 的结果
+        positions: {词元: 词元序号集合或列表}
+
+    Returns:
+        参与匹配的出现位置 [(起始序号, 结束序号), ...]，不匹配时为空列表
+    """
+    levels = [occurrences(operand, positions) for operand in plan["operands"]]
+    if not all(levels):
+        return []
+    # 正向：保留与前一段某个有效位置相邻的位置；反向：再去掉走不到最后一段的位置
+    for i, distance in enumerate(plan["distances"]):
+        levels[i + 1] = [b for b in levels[i + 1] if any(_near(a, b, distance) for a in levels[i])]
+        if not levels[i + 1]:
+            return []
+    for i in range(len(plan["distances"]) - 1, -1, -1):
+        distance = plan["distances"][i]
+        levels[i] = [a for a in levels[i] if any(_near(a, b, distance) for b in levels[i + 1])]
+    return sorted(span for level in levels for span in level)
+
+
+def match_text(plan, text):
+    """
+    在文本中匹配查询（没有位置索引可用时，如归档日志、标题和标签）
+
+    Returns:
+        参与匹配的字节区间 [(起始, 结束), ...]，不匹配时为空列表
+    """
+    tokens = tokenize(text)
+    positions = {}
+    for ordinal, (token, _, _) in enumerate(tokens):
+        positions.setdefault(token, []).append(ordinal)
+    return [(tokens[start][1], tokens[end][2]) for start, end in match(plan, positions)]
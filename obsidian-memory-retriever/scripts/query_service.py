@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+常驻检索查询服务
+
+在后台进程中保持已解析文件、分区索引和各类缓存常驻内存，通过本地
+Unix 域套接字应答查询。search.py、semantic_search.py 和 hybrid_search.py
+在服务运行时自动转发查询，服务未运行时回退到进程内搜索。
+
+协议: 每个连接发送一行 JSON 请求，返回一行 JSON 响应
+  请求: {"mode": "keyword|semantic|hybrid|filter|ping|shutdown", "query": "...", "kwargs": {...}}
+        {"mode": "index", "paths": [...]}  (写入方通知文件已变更)
+  响应: {"ok": true, "results": [...]} 或 {"ok": false, "error": "..."}
+
+查询由服务持有的 RetrieverEngine 执行。
+
+套接字放在只有当前用户可访问的目录中（$XDG_RUNTIME_DIR/obsidian-retriever，
+没有时为 <临时目录>/obsidian-retriever-<uid>，权限 0700）。使用前用 lstat 检查
+目录和套接字的属主与类型，其他用户无法抢占路径或冒充服务返回结果。
+"""
+
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+# 连接失败时快速回退；已连接的查询允许较长时间（首次查询可能需要建索引）
+CONNECT_TIMEOUT = 0.2
+QUERY_TIMEOUT = 30.0
+
+# 设置该环境变量可禁止命令行脚本转发查询
+DISABLE_ENV = "OBSIDIAN_RETRIEVER_NO_SERVICE"
+
+# 可转发的搜索模式（与 RetrieverEngine 的方法同名）
+SEARCH_MODES = ("keyword", "semantic", "hybrid", "filter")
+
+SOCKET_DIR_NAME = "obsidian-retriever"
+
+
+def _owned(path, kind):
+    """
+    path 是否为当前用户所有的指定类型文件（lstat，不跟随符号链接）
+
+    Args:
+        path: 路径
+        kind: stat.S_ISDIR / stat.S_ISSOCK 等
+
+    Returns:
+        是否可信，不存在时返回 False
+    """
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return kind(info.st_mode) and info.st_uid == os.getuid()
+
+
+def socket_dir():
+    """
+    套接字所在的私有目录（不存在时以 0700 创建）
+
+    Returns:
+        目录路径；目录不属于当前用户、对其他用户开放或无法创建时返回 None
+    """
+    if not hasattr(os, "getuid"):
+        return None
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        directory = Path(runtime_dir) / SOCKET_DIR_NAME
+    else:
+        directory = Path(tempfile.gettempdir()) / f"{SOCKET_DIR_NAME}-{os.getuid()}"
+    try:
+        directory.mkdir(mode=0o700, exist_ok=True)
+    except OSError:
+        return None
+    if not _owned(directory, stat.S_ISDIR) or os.lstat(directory).st_mode & 0o077:
+        return None
+    return directory
+
+
+def socket_path(vault_path):
+    """
+    计算笔记库对应的套接字路径
+
+    每个笔记库一个服务进程；放在私有的运行时目录下（路径较短，不会超出
+    套接字路径长度限制）。
+
+    Args:
+        vault_path: 笔记库路径
+
+    Returns:
+        套接字路径，没有安全的目录可用时返回 None
+    """
+    directory = socket_dir()
+    if directory is None:
+        return None
+    vault_id = hashlib.md5(str(Path(vault_path).resolve()).encode("utf-8")).hexdigest()[:12]
+    return directory / f"{vault_id}.sock"
+
+
+def _encode_record(record):
+    """将结果记录转换为可 JSON 序列化的形式"""
+    encoded = dict(record)
+    encoded["file"] = str(record["file"])
+    return encoded
+
+
+def _decode_record(record):
+    """还原结果记录中的文件路径"""
+    record["file"] = Path(record["file"])
+    return record
+
+
+def _send(vault_path, request, timeout=QUERY_TIMEOUT):
+    """
+    向查询服务发送请求
+
+    Returns:
+        响应字典，服务不可用时返回 None
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path(vault_path)
+    if path is None or not _owned(path, stat.S_ISSOCK):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(str(path))
+            sock.settimeout(timeout)
+            sock.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        return json.loads(line)
+    except (OSError, ValueError):
+        return None
+
+
+def forward(mode, vault_path, query, **kwargs):
+    """
+    将查询转发到常驻服务
+
+    Args:
+        mode: 搜索模式 (keyword / semantic / hybrid / filter)
+        vault_path: 笔记库路径
+        query: 搜索查询
+        **kwargs: 传给对应搜索函数的参数
+
+    Returns:
+        结果列表，服务未运行或出错时返回 None（调用方应回退到进程内搜索）
+    """
+    if os.environ.get(DISABLE_ENV):
+        return None
+    response = _send(vault_path, {"mode": mode, "query": query, "kwargs": kwargs})
+    if not response or not response.get("ok"):
+        return None
+    return [_decode_record(r) for r in response["results"]]
+
+
+def notify_changes(vault_path, paths):
+    """
+    通知常驻服务文件已变更，由服务立即增量更新索引
+
+    记录脚本写入后调用，使新记录无需等待文件监视或下次扫描即可检索到。
+
+    Args:
+        vault_path: 笔记库路径
+        paths: 变更的文件路径列表
+
+    Returns:
+        服务是否已处理（服务未运行时返回 False）
+    """
+    response = _send(vault_path, {"mode": "index", "paths": [str(Path(p).resolve()) for p in paths]})
+    return bool(response and response.get("ok"))
+
+
+class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """为单个笔记库服务的查询服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, vault_path):
+        from engine import RetrieverEngine
+
+        self.vault_path = str(Path(vault_path).resolve())
+        self.engine = RetrieverEngine(self.vault_path)
+        # 引擎的索引和缓存不是线程安全的，查询串行执行（每次只需毫秒级）
+        self.search_lock = threading.Lock()
+        super().__init__(str(socket_path(vault_path)), QueryHandler)
+
+    def execute(self, request):
+        """执行一次查询请求"""
+        mode = request.get("mode")
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"未知的搜索模式: {mode}")
+
+        kwargs = request.get("kwargs", {})
+        with self.search_lock:
+            if mode == "filter":
+                results = self.engine.filter(**kwargs)
+            else:
+                results = getattr(self.engine, mode)(request["query"], **kwargs)
+        return [_encode_record(r) for r in results]
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """处理单个连接: 读一行请求，写一行响应"""
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            mode = request.get("mode")
+            if mode == "ping":
+                response = {"ok": True, "vault": self.server.vault_path}
+            elif mode == "index":
+                with self.server.search_lock:
+                    self.server.engine.apply_changes(request.get("paths", []))
+                response = {"ok": True}
+            elif mode == "shutdown":
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                response = {"ok": True}
+            else:
+                response = {"ok": True, "results": self.server.execute(request)}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+
+        payload = json.dumps(response, ensure_ascii=False, default=str) + "\n"
+        self.wfile.write(payload.encode("utf-8"))
+
+
+def is_running(vault_path):
+    """检查查询服务是否在运行"""
+    response = _send(vault_path, {"mode": "ping"}, timeout=CONNECT_TIMEOUT)
+    return bool(response and response.get("ok"))
+
+
+def serve(vault_path, watch=True):
+    """
+    在前台运行查询服务
+
+    Args:
+        vault_path: 笔记库路径
+        watch: 是否监视文件变化并增量更新索引
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        print("❌ 错误: 当前平台不支持 Unix 域套接字")
+        sys.exit(1)
+
+    path = socket_path(vault_path)
+    if path is None:
+        print(f"❌ 错误: 无法创建仅当前用户可访问的套接字目录（检查 {SOCKET_DIR_NAME} 目录的属主和权限）")
+        sys.exit(1)
+    if os.path.lexists(path):
+        if is_running(vault_path):
+            print(f"ℹ️  查询服务已在运行: {path}")
+            return
+        if not _owned(path, stat.S_ISSOCK):
+            print(f"❌ 错误: {path} 不是当前用户的套接字，拒绝删除")
+            sys.exit(1)
+        # 上次异常退出留下的套接字文件
+        path.unlink()
+
+    server = QueryServer(vault_path)
+    with server.search_lock:
+        server.engine.warm_up()
+    if watch:
+        server.engine.watch(lock=server.search_lock)
+    print(f"✓ 查询服务已启动: {path}")
+    try:
+        server.serve_forever()
+    finally:
+        if server.engine.watcher:
+            server.engine.watcher.stop()
+        server.engine.scanner.shutdown()
+        server.server_close()
+        if _owned(path, stat.S_ISSOCK):
+            path.unlink()
+
+
+def start(vault_path, watch=True):
+    """
+    在后台启动查询服务并等待其就绪
+
+    Returns:
+        是否启动成功
+    """
+    if is_running(vault_path):
+        return True
+    command = [sys.executable, str(Path(__file__).resolve()), "serve", vault_path]
+    if not watch:
+        command.append("--no-watch")
+    subprocess.Popen(
+        command,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    deadline = time.time() + QUERY_TIMEOUT
+    while time.time() < deadline:
+        if is_running(vault_path):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("serve", "start", "stop", "status"):
+        print("用法: python query_service.py <serve|start|stop|status> <笔记库路径> [--no-watch]")
+        print("\n命令:")
+        print("  serve   在前台运行查询服务")
+        print("  start   在后台启动查询服务")
+        print("  stop    停止查询服务")
+        print("  status  查看查询服务状态")
+        print("\n示例:")
+        print("  python query_service.py start ~/Obsidian/Vault")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    vault_path = sys.argv[2]
+    watch = "--no-watch" not in sys.argv
+
+    if command == "serve":
+        serve(vault_path, watch)
+    elif command == "start":
+        if start(vault_path, watch):
+            print(f"✓ 查询服务运行中: {socket_path(vault_path)}")
+        else:
+            print("❌ 查询服务启动失败")
+            sys.exit(1)
+    elif command == "stop":
+        if _send(vault_path, {"mode": "shutdown"}, timeout=CONNECT_TIMEOUT):
+            print("✓ 查询服务已停止")
+        else:
+            print("ℹ️  查询服务未运行")
+    elif command == "status":
+        if is_running(vault_path):
+            print(f"✓ 查询服务运行中: {socket_path(vault_path)}")
+        else:
+            print("ℹ️  查询服务未运行")
+            sys.exit(1)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+检索配置加载
+
+读取 assets/config/retriever_config.json，供各检索脚本共享
+"""
+
+import json
+from pathlib import Path
+
+
+def get_config_path():
+    """获取配置文件路径"""
+    script_dir = Path(__file__).parent.parent
+    return script_dir / "assets" / "config" / "retriever_config.json"
+
+
+def load_retriever_config():
+    """
+    加载检索配置
+
+    Returns:
+        配置字典，文件不存在或解析失败时返回空字典
+    """
+    config_path = get_config_path()
+    if config_path.exists():
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return {}
+    return {}
+
+
+def get_setting(config, key_path, default=None):
+    """
+    获取配置值
+
+    Args:
+        config: 配置字典
+        key_path: 点分隔的路径，如 "partition_index.probes"
+        default: 未找到时的默认值
+
+    Returns:
+        配置值
+    """
+    value = config
+    for key in key_path.split('.'):
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            return default
+    return value
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+并行扫描执行器
+
+没有索引可用时（分区索引尚未建立，或配置中关闭了 partition_index），
+关键词和语义检索需要读取并处理每一个候选文件。ScanExecutor 把文件列表分片:
+
+- 线程池读取文件内容（I/O；网络挂载的笔记库上可以重叠等待）
+- 进程池解析、打分或生成向量（CPU；绕开 GIL）
+
+各分片的结果用有界的 top-k 堆合并。文件数少于 min_files、只有一个 CPU 或
+进程池不可用时，直接在当前进程中顺序处理，避免进程启动开销。
+
+内存占用与文件数无关：同时进行或等待取用的读取最多 shard_size * cpu_workers
+个，已提交但尚未完成的分片最多 PENDING_SHARDS_PER_WORKER * cpu_workers 个，
+其余文件等有分片完成后再读取。
+
+分片任务必须是模块级函数 task(shard, *args) -> [(位置, 结果), ...]，
+shard 为 [(位置, 文件内容字节), ...]，位置是文件在输入列表中的下标。
+"""
+
+import heapq
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from retriever_config import get_setting
+
+
+# 默认读取线程数（I/O 密集，可以多于 CPU 数）
+DEFAULT_IO_WORKERS = 8
+# 候选文件少于该数量时顺序处理
+DEFAULT_MIN_FILES = 64
+# 每个进程池任务处理的文件数
+DEFAULT_SHARD_SIZE = 32
+# 每个工作进程最多对应的在途分片数（一个在处理，一个排队）
+PENDING_SHARDS_PER_WORKER = 2
+
+
+def top_k(items, k, key):
+    """
+    合并结果，只保留分数最高的 k 个（有界堆，不对全部结果排序）
+
+    Args:
+        items: 结果的可迭代对象
+        k: 保留数量，None 表示全部（按分数降序排序）
+        key: 分数函数
+
+    Returns:
+        按分数降序的结果列表
+    """
+    if k is None:
+        return sorted(items, key=key, reverse=True)
+    return heapq.nlargest(k, items, key=key)
+
+
+def _read(md_file):
+    """读取文件内容，失败时返回异常（在主线程中报告）"""
+    try:
+        return md_file.read_bytes()
+    except Exception as e:
+        return e
+
+
+class ScanExecutor:
+    """按文件分片的并行扫描（读取用线程池，解析和打分用进程池）"""
+
+    def __init__(self, io_workers=None, cpu_workers=None, min_files=DEFAULT_MIN_FILES,
+                 shard_size=DEFAULT_SHARD_SIZE, parallel=True):
+        """
+        Args:
+            io_workers: 读取线程数，默认 DEFAULT_IO_WORKERS
+            cpu_workers: 解析/打分进程数，默认 CPU 核数
+            min_files: 启用并行的最少文件数
+            shard_size: 每个进程任务处理的文件数
+            parallel: 是否启用并行（False 时总是顺序处理）
+        """
+        self.io_workers = max(1, io_workers or DEFAULT_IO_WORKERS)
+        self.cpu_workers = max(1, cpu_workers or os.cpu_count() or 1)
+        self.min_files = min_files
+        self.shard_size = max(1, shard_size)
+        self.parallel = parallel
+        self._threads = None
+        self._processes = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """按检索配置中的 scan 设置创建执行器"""
+        return cls(
+            io_workers=get_setting(config, "scan.io_workers"),
+            cpu_workers=get_setting(config, "scan.cpu_workers"),
+            min_files=get_setting(config, "scan.min_files", DEFAULT_MIN_FILES),
+            shard_size=get_setting(config, "scan.shard_size", DEFAULT_SHARD_SIZE),
+            parallel=get_setting(config, "scan.parallel", True)
+        )
+
+    def use_parallel(self, count):
+        """count 个文件是否值得并行处理"""
+        return self.parallel and count >= self.min_files
+
+    def _thread_pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.io_workers, thread_name_prefix="scan-io")
+            return self._threads
+
+    def _process_pool(self):
+        """进程池（首次使用时创建），不可用时返回 None"""
+        with self._lock:
+            if self._processes is None and self.cpu_workers > 1:
+                try:
+                    self._processes = ProcessPoolExecutor(self.cpu_workers)
+                except (OSError, ImportError, NotImplementedError) as e:
+                    print(f"⚠️ 警告: 无法创建进程池，改为顺序扫描: {e}")
+                    self.cpu_workers = 1
+            return self._processes
+
+    def read_all(self, files):
+        """
+        读取文件内容（并行时由线程池读取），按输入顺序产出
+
+        Yields:
+            (位置, 文件, 内容字节)，读取失败的文件打印警告后跳过
+        """
+        if self.use_parallel(len(files)) and self.io_workers > 1:
+            contents = self._window_reads(files)
+        else:
+            contents = map(_read, files)
+        for position, (md_file, data) in enumerate(zip(files, contents)):
+            if isinstance(data, Exception):
+                print(f"⚠️  跳过文件 {md_file}: {data}")
+                continue
+            yield position, md_file, data
+
+    def _window_reads(self, files):
+        """线程池按滑动窗口读取：最多 shard_size * cpu_workers 个读取在途，按输入顺序产出"""
+        pool = self._thread_pool()
+        window = max(self.io_workers, self.shard_size * self.cpu_workers)
+        pending = deque()
+        for md_file in files:
+            if len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(pool.submit(_read, md_file))
+        while pending:
+            yield pending.popleft().result()
+
+    def map(self, task, files, *args):
+        """
+        对文件列表执行分片任务
+
+        Args:
+            task: 模块级分片函数 task(shard, *args) -> [(位置, 结果), ...]
+            files: 文件路径列表（含 ArchivedFile）
+            *args: 传给 task 的额外参数（需可 pickle）
+
+        Yields:
+            (位置, 结果)，顺序不确定
+        """
+        files = list(files)
+        if not self.use_parallel(len(files)) or self._process_pool() is None:
+            for position, _, data in self.read_all(files):
+                yield from task([(position, data)], *args)
+            return
+
+        # 读取与处理重叠：每读满一个分片就提交给进程池；在途分片达到上限时先等
+        # 一个分片完成，读取随之暂停
+        futures = {}
+        shard = []
+        for position, _, data in self.read_all(files):
+            shard.append((position, data))
+            if len(shard) < self.shard_size:
+                continue
+            yield from self._submit(futures, task, shard, args)
+            shard = []
+            if len(futures) >= PENDING_SHARDS_PER_WORKER * self.cpu_workers:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._collect(future, futures.pop(future), task, args)
+        if shard:
+            yield from self._submit(futures, task, shard, args)
+
+        for future in as_completed(futures):
+            yield from self._collect(future, futures[future], task, args)
+
+    def _submit(self, futures, task, shard, args):
+        """提交一个分片；进程池已不可用时在当前进程中处理并直接产出结果"""
+        pool = self._process_pool()
+        if pool is None:
+            yield from task(shard, *args)
+            return
+        try:
+            futures[pool.submit(task, shard, *args)] = shard
+        except (BrokenProcessPool, RuntimeError):
+            self._reset_processes()
+            yield from task(shard, *args)
+
+    def _collect(self, future, shard, task, args):
+        """分片结果；工作进程异常退出时重建进程池，本分片在当前进程中重做"""
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._reset_processes()
+            return task(shard, *args)
+
+    def _reset_processes(self):
+        with self._lock:
+            if self._processes is not None:
+                self._processes.shutdown(wait=False, cancel_futures=True)
+                self._processes = None
+
+    def shutdown(self):
+        """关闭线程池和进程池"""
+        with self._lock:
+            if self._threads is not None:
+                self._threads.shutdown(wait=False)
+                self._threads = None
+        self._reset_processes()
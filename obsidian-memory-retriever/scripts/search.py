@@ -6,11 +6,19 @@
 """
 
 import sys
-import re
-from pathlib import Path
-from datetime import datetime
 import yaml
 
+from query_service import forward
+from retriever_config import load_retriever_config, get_setting
+from date_filters import resolve_quick_filter, date_option
+
+
+# 摘要在命中位置前后保留的字符数
+SNIPPET_BEFORE = 20
+SNIPPET_AFTER = 80
+# UTF-8 中一个字符最多占的字节数
+MAX_CHAR_BYTES = 4
+
 
 def load_config(config_path):
     """
@@ -30,30 +38,7 @@ def load_config(config_path):
         return {}
 
 
-def parse_frontmatter(content):
-    """
-    解析 YAML frontmatter
-
-    Args:
-        content: 文件内容
-
-    Returns:
-        (frontmatter, body)
-    """
-    if content.startswith('---'):
-        parts = content.split('---', 2)
-        if len(parts) >= 2:
-            frontmatter_text = parts[1]
-            body = parts[2] if len(parts) > 2 else ''
-            try:
-                frontmatter = yaml.safe_load(frontmatter_text)
-                return frontmatter, body
-            except:
-                return {}, body
-    return {}, content
-
-
-def keyword_search(query, database_path, filters=None):
+def keyword_search(query, database_path, filters=None, include_archive=False, limit=None, fuzzy=False):
     """
     关键词搜索
 
@@ -61,87 +46,50 @@ def keyword_search(query, database_path, filters=None):
         query: 搜索查询
         database_path: 数据库路径
         filters: 过滤条件字典
+        include_archive: 是否同时搜索已归档的日志
+        limit: 只返回分数最高的 limit 条，None 表示全部
+        fuzzy: 是否容错匹配（与查询编辑距离 1~2 的片段也计分）
 
     Returns:
         结果列表 [(record, score), ...]
     """
-    vault = Path(database_path)
-    memory_folder = vault / "memory"
-
-    if not memory_folder.exists():
-        print("❌ 错误: memory 文件夹不存在")
-        return []
-
-    results = []
-    query_lower = query.lower()
-
-    # 遍历所有记忆文件
-    for md_file in memory_folder.glob("*.md"):
-        try:
-            content = md_file.read_text(encoding="utf-8")
-            frontmatter, body = parse_frontmatter(content)
-
-            # 计算匹配分数
-            score = 0
-            match_details = []
-
-            # 标题匹配（权重 10）
-            title = frontmatter.get("title", "")
-            if query_lower in title.lower():
-                score += 10
-                match_details.append("标题")
-
-            # 内容匹配（权重 5）
-            if query_lower in body.lower():
-                score += 5
-                match_details.append("内容")
-
-            # 标签匹配（权重 3）
-            tags = frontmatter.get("tags", [])
-            if isinstance(tags, str):
-                tags = [tags]
-            for tag in tags:
-                if query_lower in tag.lower():
-                    score += 3
-                    match_details.append(f"标签: {tag}")
-
-            # 如果有匹配，添加到结果
-            if score > 0:
-                # 应用过滤条件
-                if filters:
-                    if "date" in filters:
-                        record_date = frontmatter.get("date", "")
-                        if record_date != filters["date"]:
-                            continue
-                    if "type" in filters:
-                        record_type = frontmatter.get("type", "")
-                        if record_type != filters["type"]:
-                            continue
-                    if "importance" in filters:
-                        record_importance = frontmatter.get("importance", 0)
-                        if record_importance < filters["importance"]:
-                            continue
-
-                record = {
-                    "file": md_file,
-                    "frontmatter": frontmatter,
-                    "body": body,
-                    "score": score,
-                    "matches": match_details
-                }
-                results.append(record)
-
-        except Exception as e:
-            print(f"⚠️  跳过文件 {md_file}: {e}")
-            continue
+    from engine import get_engine
+    return get_engine(database_path).keyword(query, filters, include_archive, limit, fuzzy)
 
-    # 按分数排序
-    results.sort(key=lambda x: x["score"], reverse=True)
 
-    return results
+def offset_snippet(record, highlight=True):
+    """
+    按命中的字节区间截取摘要（只读取区间附近的字节，不扫描正文）
 
+    Args:
+        record: 搜索结果（含 "offsets"）
+        highlight: 是否用 [...] 标出命中片段
 
-def display_results(results, query, max_results=10):
+    Returns:
+        摘要文本，没有位置信息或文件无法读取时返回 None
+    """
+    offsets = record.get("offsets")
+    if not offsets:
+        return None
+    start, end = offsets[0]
+    window = max(0, start - SNIPPET_BEFORE * MAX_CHAR_BYTES)
+    try:
+        with record["file"].open("rb") as f:
+            f.seek(window)
+            data = f.read(end - window + SNIPPET_AFTER * MAX_CHAR_BYTES)
+    except (OSError, ValueError):
+        return None
+
+    # 窗口两端可能截断多字节字符，解码时丢弃
+    before = data[:start - window].decode("utf-8", errors="ignore")[-SNIPPET_BEFORE:]
+    matched = data[start - window:end - window].decode("utf-8", errors="replace")
+    after = data[end - window:].decode("utf-8", errors="ignore")[:SNIPPET_AFTER]
+    if highlight:
+        matched = f"[{matched}]"
+    return (before + matched + after).replace("\n", " ")
+
+
+def display_results(results, query, max_results=10, highlight=True):
     """
     显示搜索结果
 
@@ -149,6 +97,7 @@ def display_results(results, query, max_results=10):
         results: 结果列表
         query: 搜索查询
         max_results: 最大显示数量
+        highlight: 摘要中是否标出命中片段
     """
     if not results:
         print(f"\n🔍 未找到与 \"{query}\" 相关的记录")
@@ -176,10 +125,23 @@ def display_results(results, query, max_results=10):
         print(f"    📊 状态: {fm.get('status', '')}")
         print(f"    💡 匹配: {', '.join(matches)} (得分: {score})")
         print(f"    📁 文件: {record['file'].name}")
+        for entry in record.get("entries", [])[:3]:
+            print(f"    🕒 条目: {entry['time']} - {entry['title']}")
+
+        # 按命中位置截取摘要
+        snippet = offset_snippet(record, highlight)
+        if snippet is not None:
+            print(f"    📄 摘要: ...{snippet}...")
+            print()
+            continue
 
-        # 提取摘要
-        body = record["body"]
+        # 没有位置信息时在正文中查找（优先取命中的条目）
+        entries = record.get("entries")
+        body = entries[0]["text"] if entries else record["body"]
         snippet_start = body.find(query)
+        if snippet_start < 0 and record.get("needle"):
+            # 近似匹配：按命中的片段定位（片段为小写）
+            snippet_start = body.lower().find(record["needle"])
         if snippet_start >= 0:
             snippet = body[max(0, snippet_start-20):snippet_start+100]
             snippet = snippet.replace("\n", " ")
@@ -197,20 +159,34 @@ if __name__ == "__main__":
         print("\n选项:")
         print("  --type <类型>        仅搜索指定类型")
         print("  --date <日期>        仅搜索指定日期")
+        print("  --since <日期>       仅搜索该日期及之后的记录")
+        print("  --until <日期>       仅搜索该日期及之前的记录")
+        print("  --today / --this-week / --this-month  快捷日期过滤（也可写作 /today 等）")
         print("  --importance <数字>  仅搜索重要程度>=N的记录")
+        print("  --tag <标签>         仅搜索带该标签的记录（可重复）")
         print("  --max <数字>         最多显示N条结果")
+        print("  --archive            同时搜索已归档（超过保留期）的日志")
+        print("  --fuzzy              容错匹配（允许 1~2 个字符的拼写错误）")
+        print("\n短语与邻近查询:")
+        print("  \"数据库 选择\"          词元依次相邻的短语")
+        print("  数据库 NEAR/5 选择     两段之间最多隔 5 个词元（NEAR 默认 10）")
         print("\n示例:")
         print("  python search.py ~/Obsidian/Vault PostgreSQL")
         print("  python search.py ~/Obsidian/Vault API --type decision")
         print("  python search.py ~/Obsidian/Vault 决策 --importance 4")
+        print("  python search.py ~/Obsidian/Vault 数据库 /this-week")
+        print("  python search.py ~/Obsidian/Vault '\"学习 rust\" NEAR 所有权'")
         sys.exit(1)
 
     vault_path = sys.argv[1]
     query = sys.argv[2]
 
     # 解析选项
+    config = load_retriever_config()
     filters = {}
     max_results = 10
+    include_archive = False
+    fuzzy = False
 
     i = 3
     while i < len(sys.argv):
@@ -220,7 +196,19 @@ if __name__ == "__main__":
             filters["type"] = sys.argv[i + 1]
             i += 2
         elif arg == "--date" and i + 1 < len(sys.argv):
-            filters["date"] = sys.argv[i + 1]
+            filters["date"] = date_option(sys.argv[i + 1], "--date")
+            i += 2
+        elif arg == "--since" and i + 1 < len(sys.argv):
+            filters["since"] = date_option(sys.argv[i + 1], "--since")
+            i += 2
+        elif arg == "--until" and i + 1 < len(sys.argv):
+            filters["until"] = date_option(sys.argv[i + 1], "--until")
+            i += 2
+        elif resolve_quick_filter(arg, config):
+            filters["since"], filters["until"] = resolve_quick_filter(arg, config)
+            i += 1
+        elif arg == "--tag" and i + 1 < len(sys.argv):
+            filters.setdefault("tags", []).append(sys.argv[i + 1])
             i += 2
         elif arg == "--importance" and i + 1 < len(sys.argv):
             filters["importance"] = int(sys.argv[i + 1])
@@ -228,11 +216,19 @@ if __name__ == "__main__":
         elif arg == "--max" and i + 1 < len(sys.argv):
             max_results = int(sys.argv[i + 1])
             i += 2
+        elif arg == "--archive":
+            include_archive = True
+            i += 1
+        elif arg == "--fuzzy":
+            fuzzy = True
+            i += 1
         else:
             i += 1
 
-    # 执行搜索
-    results = keyword_search(query, vault_path, filters)
+    # 查询服务运行时转发，否则在进程内搜索
+    results = forward("keyword", vault_path, query, filters=filters, include_archive=include_archive, fuzzy=fuzzy)
+    if results is None:
+        results = keyword_search(query, vault_path, filters, include_archive, fuzzy=fuzzy)
 
     # 显示结果
-    display_results(results, query, max_results)
+    display_results(results, query, max_results, get_setting(config, "output_format.highlight_matches", True))
@@ -7,33 +7,12 @@
 
 import sys
 import re
-from pathlib import Path
-from datetime import datetime
-import yaml
 import math
+import zlib
 
-
-def parse_frontmatter(content):
-    """
-    解析 YAML frontmatter
-
-    Args:
-        content: 文件内容
-
-    Returns:
-        (frontmatter, body)
-    """
-    if content.startswith('---'):
-        parts = content.split('---', 2)
-        if len(parts) >= 2:
-            frontmatter_text = parts[1]
-            body = parts[2] if len(parts) > 2 else ''
-            try:
-                frontmatter = yaml.safe_load(frontmatter_text)
-                return frontmatter, body
-            except:
-                return {}, body
-    return {}, content
+from query_service import forward
+from retriever_config import load_retriever_config, get_setting
+from date_filters import resolve_quick_filter, date_option
 
 
 def cosine_similarity(vec1, vec2):
@@ -60,119 +39,127 @@ def cosine_similarity(vec1, vec2):
     return dot_product / (magnitude1 * magnitude2)
 
 
-def generate_simple_embedding(text):
+# 哈希词表大小（嵌入维度）
+EMBEDDING_DIMENSION = 1000
+
+
+def generate_sparse_embedding(text, dimension=EMBEDDING_DIMENSION):
     """
-    生成简单的文本嵌入（基于TF-IDF的简化版本）
+    生成稀疏文本嵌入（基于TF-IDF的简化版本）
+
+    哈希词表中只有少数桶非零，因此只保存非零桶 {桶编号: 权重}，
+    相似度计算只需遍历较短一方的非零项。
 
     注意: 这是简化实现。生产环境应使用专业的嵌入模型
     如 sentence-transformers, OpenAI embeddings, 等
 
     Args:
         text: 输入文本
+        dimension: 哈希词表大小
 
     Returns:
-        嵌入向量
+        归一化的稀疏向量 {桶编号: 权重}
     """
     # 分词（简单按空格和标点分割）
     words = re.findall(r'\w+', text.lower())
 
     if not words:
-        return []
+        return {}
 
     # 计算词频
     word_freq = {}
     for word in words:
         word_freq[word] = word_freq.get(word, 0) + 1
 
-    # 生成向量（使用固定大小的词汇表）
-    # 这是一个简化版本，实际应该使用预训练的嵌入模型
-    vocab_size = 1000
-    embedding = [0.0] * vocab_size
-
+    # 使用稳定的哈希函数将词映射到桶（跨进程一致，便于持久化向量）
+    embedding = {}
     for word, freq in word_freq.items():
-        # 使用简单的哈希函数将词映射到索引
-        word_hash = hash(word) % vocab_size
+        word_hash = zlib.crc32(word.encode('utf-8')) % dimension
         embedding[word_hash] = float(freq)
 
     # 归一化
-    magnitude = math.sqrt(sum(v * v for v in embedding))
+    magnitude = math.sqrt(sum(v * v for v in embedding.values()))
     if magnitude > 0:
-        embedding = [v / magnitude for v in embedding]
+        embedding = {k: v / magnitude for k, v in embedding.items()}
+
+    return embedding
+
+
+def generate_simple_embedding(text):
+    """
+    生成稠密文本嵌入
+
+    与 generate_sparse_embedding 相同的哈希嵌入，展开为定长列表，
+    供需要稠密向量的调用方使用。
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        嵌入向量
+    """
+    sparse = generate_sparse_embedding(text)
+    if not sparse:
+        return []
 
+    embedding = [0.0] * EMBEDDING_DIMENSION
+    for bucket, weight in sparse.items():
+        embedding[bucket] = weight
     return embedding
 
 
-def semantic_search(query, database_path, threshold=0.7, filters=None):
+def sparse_cosine_similarity(vec1, vec2):
+    """
+    计算两个稀疏向量的余弦相似度
+
+    Args:
+        vec1: 稀疏向量 {桶编号: 权重}
+        vec2: 稀疏向量 {桶编号: 权重}
+
+    Returns:
+        相似度分数 (0-1)
+    """
+    if not vec1 or not vec2:
+        return 0.0
+
+    if len(vec1) > len(vec2):
+        vec1, vec2 = vec2, vec1
+    dot_product = sum(w * vec2.get(b, 0.0) for b, w in vec1.items())
+    magnitude1 = math.sqrt(sum(w * w for w in vec1.values()))
+    magnitude2 = math.sqrt(sum(w * w for w in vec2.values()))
+
+    if magnitude1 == 0 or magnitude2 == 0:
+        return 0.0
+
+    return dot_product / (magnitude1 * magnitude2)
+
+
+def semantic_search(query, database_path, threshold=0.7, filters=None,
+                    probes=None, granularity="week", since=None, until=None, limit=None):
     """
     语义搜索
 
+    先按时间分区质心排序，只扫描最相关的 probes 个分区；
+    分区内通过倒排表 (桶 -> 文件, 权重) 计算点积，只访问查询包含的桶
+
     Args:
         query: 搜索查询
         database_path: 数据库路径
         threshold: 相似度阈值
         filters: 过滤条件
+        probes: 扫描的分区数量，None 表示扫描全部分区
+        granularity: 分区粒度 (day / week / month)
+        since: 起始日期（含），可选
+        until: 结束日期（含），可选
+        limit: 只返回相似度最高的 limit 条，None 表示全部
 
     Returns:
         结果列表 [(record, similarity), ...]
     """
-    vault = Path(database_path)
-    memory_folder = vault / "memory"
-
-    if not memory_folder.exists():
-        print("❌ 错误: memory 文件夹不存在")
-        return []
-
-    # 生成查询向量
-    query_vector = generate_simple_embedding(query)
-
-    results = []
-
-    # 遍历所有记忆文件
-    for md_file in memory_folder.glob("*.md"):
-        try:
-            content = md_file.read_text(encoding="utf-8")
-            frontmatter, body = parse_frontmatter(content)
-
-            # 生成记录向量（标题 + 内容）
-            text_to_embed = frontmatter.get("title", "") + " " + body[:500]
-            record_vector = generate_simple_embedding(text_to_embed)
-
-            # 计算相似度
-            similarity = cosine_similarity(query_vector, record_vector)
-
-            # 如果相似度超过阈值，添加到结果
-            if similarity >= threshold:
-                # 应用过滤条件
-                if filters:
-                    if "date" in filters:
-                        record_date = frontmatter.get("date", "")
-                        if record_date != filters["date"]:
-                            continue
-                    if "type" in filters:
-                        record_type = frontmatter.get("type", "")
-                        if record_type != filters["type"]:
-                            continue
-                    if "importance" in filters:
-                        record_importance = frontmatter.get("importance", 0)
-                        if record_importance < filters["importance"]:
-                            continue
-
-                record = {
-                    "file": md_file,
-                    "frontmatter": frontmatter,
-                    "body": body,
-                    "similarity": similarity
-                }
-                results.append(record)
-
-        except Exception as e:
-            print(f"⚠️  跳过文件 {md_file}: {e}")
-            continue
-
-    # 按相似度排序
-    results.sort(key=lambda x: x["similarity"], reverse=True)
-
-    return results
+    from engine import get_engine
+    return get_engine(database_path).semantic(
+        query, threshold, filters, probes, granularity, since, until, limit
+    )
 
 
 def display_results(results, query, max_results=10):
@@ -231,20 +218,32 @@ if __name__ == "__main__":
         print("  --type <类型>         仅搜索指定类型")
         print("  --date <日期>         仅搜索指定日期")
         print("  --importance <数字>   仅搜索重要程度>=N的记录")
+        print("  --tag <标签>          仅搜索带该标签的记录（可重复）")
         print("  --max <数字>          最多显示N条结果")
+        print("  --probes <数字>       只扫描最相关的N个时间分区，会降低召回 (默认: 全部分区)")
+        print("  --granularity <粒度>  时间分区粒度 day/week/month (默认: week)")
+        print("  --since <日期>        仅搜索该日期及之后的记录")
+        print("  --until <日期>        仅搜索该日期及之前的记录")
+        print("  --today / --this-week / --this-month  快捷日期过滤（也可写作 /today 等）")
         print("\n示例:")
         print("  python semantic_search.py ~/Obsidian/Vault \"我们之前讨论过数据库吗？\"")
         print("  python semantic_search.py ~/Obsidian/Vault 技术决策 --threshold 0.6")
         print("  python semantic_search.py ~/Obsidian/Vault API --type decision")
+        print("  python semantic_search.py ~/Obsidian/Vault 数据库 --since 2026-01-01 --probes 2")
         sys.exit(1)
 
     vault_path = sys.argv[1]
     query = sys.argv[2]
 
     # 解析选项
+    config = load_retriever_config()
     threshold = 0.7
     filters = {}
     max_results = 10
+    probes = get_setting(config, "partition_index.probes")
+    granularity = get_setting(config, "partition_index.granularity", "week")
+    since = None
+    until = None
 
     i = 3
     while i < len(sys.argv):
@@ -257,7 +256,10 @@ if __name__ == "__main__":
             filters["type"] = sys.argv[i + 1]
             i += 2
         elif arg == "--date" and i + 1 < len(sys.argv):
-            filters["date"] = sys.argv[i + 1]
+            filters["date"] = date_option(sys.argv[i + 1], "--date")
+            i += 2
+        elif arg == "--tag" and i + 1 < len(sys.argv):
+            filters.setdefault("tags", []).append(sys.argv[i + 1])
             i += 2
         elif arg == "--importance" and i + 1 < len(sys.argv):
             filters["importance"] = int(sys.argv[i + 1])
@@ -265,11 +267,36 @@ if __name__ == "__main__":
         elif arg == "--max" and i + 1 < len(sys.argv):
             max_results = int(sys.argv[i + 1])
             i += 2
+        elif arg == "--probes" and i + 1 < len(sys.argv):
+            probes = int(sys.argv[i + 1])
+            i += 2
+        elif arg == "--granularity" and i + 1 < len(sys.argv):
+            granularity = sys.argv[i + 1]
+            i += 2
+        elif arg == "--since" and i + 1 < len(sys.argv):
+            since = date_option(sys.argv[i + 1], "--since")
+            i += 2
+        elif arg == "--until" and i + 1 < len(sys.argv):
+            until = date_option(sys.argv[i + 1], "--until")
+            i += 2
+        elif resolve_quick_filter(arg, config):
+            since, until = resolve_quick_filter(arg, config)
+            i += 1
         else:
             i += 1
 
-    # 执行搜索
-    results = semantic_search(query, vault_path, threshold, filters)
+    # 查询服务运行时转发，否则在进程内搜索
+    search_kwargs = {
+        "threshold": threshold,
+        "filters": filters,
+        "probes": probes,
+        "granularity": granularity,
+        "since": since,
+        "until": until
+    }
+    results = forward("semantic", vault_path, query, **search_kwargs)
+    if results is None:
+        results = semantic_search(query, vault_path, **search_kwargs)
 
     # 显示结果
     display_results(results, query, max_results)
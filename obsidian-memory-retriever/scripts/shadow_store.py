@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+小写影子文件与字节级关键词预筛
+
+关键词搜索对每个文件做 query.lower() in body.lower()：每次查询都要把整个文件
+解码为 str、再分配一份小写副本。影子文件把这一步提前到文件变化时做一次:
+
+    <笔记库>/.retriever_cache/folded/<相对 memory/ 的路径>
+
+内容是原文件解码后 str.lower() 再编码的 UTF-8 字节，mtime 与原文件相同（据此
+判断是否过期）。查询时把小写查询编码为 UTF-8，在内存映射 (mmap) 的影子文件中
+直接查找字节串，不解码、不分配；只有命中的文件才解码正文并解析 frontmatter。
+
+标题和标签都以原文出现在 frontmatter 中，因此影子文件中找不到查询的文件不可能
+得分，可以安全跳过。归档日志（压缩包中）没有影子文件，总是交给完整的匹配。
+
+影子文件是整个笔记库的一份副本，默认只在关闭 N 元组索引时启用；索引开启时
+候选文件已经很少，由 folded_contains() 读取原文件当场小写后查找。
+"""
+
+import mmap
+import os
+import sys
+import time
+from pathlib import Path
+
+# 同级的记录技能，提供 memory/ 布局解析
+RECORDER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-recorder" / "scripts"
+if str(RECORDER_SCRIPTS) not in sys.path:
+    sys.path.append(str(RECORDER_SCRIPTS))
+from memory_paths import RACY_WINDOW
+
+from partition_index import CACHE_DIR_NAME
+
+
+SHADOW_FOLDER = "folded"
+
+
+def fold(data):
+    """原文件字节 -> 小写影子内容（与 str.lower() 的匹配语义一致）"""
+    return data.decode("utf-8", errors="replace").lower().encode("utf-8")
+
+
+def mapped_find(path, needle):
+    """
+    在内存映射的文件中查找字节串
+
+    Returns:
+        是否包含 needle
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return not needle
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped.find(needle) != -1
+
+
+def folded_contains(md_file, needle):
+    """
+    不借助影子文件的预筛：读取原文件，当场小写后查找（用于 N 元组索引筛出的
+    少量候选文件）
+
+    Args:
+        md_file: 记忆文件路径（或 ArchivedFile）
+        needle: 小写查询的 UTF-8 字节
+
+    Returns:
+        False 表示一定不包含；不是普通文件（如归档日志）或读取失败时返回 True
+    """
+    if not isinstance(md_file, Path):
+        return True
+    try:
+        return needle in fold(md_file.read_bytes())
+    except OSError:
+        return True
+
+
+class ShadowStore:
+    """memory/ 中记忆文件的小写影子文件（按 mtime 惰性重建）"""
+
+    def __init__(self, vault_path, layout):
+        """
+        Args:
+            vault_path: 笔记库路径
+            layout: MemoryLayout（影子文件按相对 memory/ 的路径存放）
+        """
+        self.folder = Path(vault_path) / CACHE_DIR_NAME / SHADOW_FOLDER
+        self.layout = layout
+
+    def path(self, md_file):
+        """
+        记忆文件对应的影子文件路径
+
+        Returns:
+            影子文件路径，不是 memory/ 中的文件（如归档日志）时返回 None
+        """
+        if not isinstance(md_file, Path) or not self.layout.is_memory_file(md_file):
+            return None
+        try:
+            return self.folder / self.layout.relative(md_file)
+        except ValueError:
+            return None
+
+    def ensure(self, md_file):
+        """
+        确保影子文件存在且与原文件一致，必要时重建
+
+        Returns:
+            影子文件路径，无法建立时返回 None
+        """
+        shadow = self.path(md_file)
+        if shadow is None:
+            return None
+        source = md_file.stat()
+        try:
+            if shadow.stat().st_mtime_ns == source.st_mtime_ns:
+                return shadow
+        except FileNotFoundError:
+            pass
+
+        data = md_file.read_bytes()
+        shadow.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，并发的查询不会读到写了一半的影子文件
+        tmp_file = shadow.with_name(f".{shadow.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(fold(data))
+        # 读取期间原文件被修改时，保留读取前的 mtime，下次访问会再次重建；
+        # 原文件刚被修改（同一 mtime 内可能还有写入）时不标记为最新
+        mtime_ns = source.st_mtime_ns
+        if time.time() - source.st_mtime < RACY_WINDOW:
+            mtime_ns -= 1
+        os.utime(tmp_file, ns=(source.st_atime_ns, mtime_ns))
+        os.replace(tmp_file, shadow)
+        return shadow
+
+    def may_contain(self, md_file, needle):
+        """
+        预筛：文件（小写后）是否可能包含查询
+
+        Args:
+            md_file: 记忆文件路径（或 ArchivedFile）
+            needle: 小写查询的 UTF-8 字节
+
+        Returns:
+            False 表示一定不包含；无影子文件可用时返回 True
+        """
+        try:
+            shadow = self.ensure(md_file)
+        except OSError:
+            return True
+        if shadow is None:
+            return True
+        try:
+            return mapped_find(shadow, needle)
+        except (OSError, ValueError):
+            return True
+
+    def update(self, path):
+        """
+        文件变更时更新影子文件（删除的文件移除其影子文件）
+
+        Args:
+            path: 变更的记忆文件路径
+        """
+        path = Path(path)
+        shadow = self.path(path)
+        if shadow is None:
+            return
+        if path.exists():
+            try:
+                self.ensure(path)
+            except OSError:
+                pass
+        else:
+            try:
+                shadow.unlink()
+            except FileNotFoundError:
+                pass
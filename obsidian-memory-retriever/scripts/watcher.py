@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+笔记库文件监视器
+
+监视 memory/ 下的记忆文件（平铺或 YYYY/MM/ 分片）和 MEMORY.md 的变化，合并短时间内的连续修改（防抖）后
+把变更的文件列表交给回调，由回调增量更新各类索引。文件持续变化时（如批量导入）
+防抖永远不会到期，因此一批变更最多等待 max_delay 秒、最多积累 MAX_BATCH_FILES
+个文件就回调一次。
+
+Linux 上使用 inotify（通过 ctypes，无额外依赖），其它平台或 inotify
+不可用时回退到定时轮询 mtime。inotify 不递归，分片目录逐个添加监视，
+启动后新建的 memory/ 和年/月目录在创建事件中补充监视；事件队列溢出
+（IN_Q_OVERFLOW）时重新扫描全部目录和文件。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 同级的记录技能，提供 memory/ 布局解析（平铺或按年月分片）
+RECORDER_SCRIPTS = Path(__file__).resolve().parent.parent.parent / "obsidian-memory-recorder" / "scripts"
+if str(RECORDER_SCRIPTS) not in sys.path:
+    sys.path.append(str(RECORDER_SCRIPTS))
+from memory_paths import MemoryLayout, YEAR_PATTERN, MONTH_PATTERN
+
+
+# inotify 事件掩码
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct("iIII")
+
+CORE_MEMORY_FILE = "MEMORY.md"
+
+# 一批变更最长等待的秒数（从这批的第一次变更算起）
+DEFAULT_MAX_DELAY = 2.0
+# 一批变更积累到该文件数时立即回调
+MAX_BATCH_FILES = 512
+
+
+def _load_inotify():
+    """加载 libc 的 inotify 接口，不可用时返回 None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class VaultWatcher:
+    """监视笔记库中的记忆文件并防抖回调"""
+
+    def __init__(self, vault_path, callback, debounce=0.2, poll_interval=0.5, use_inotify=True,
+                 layout=None, max_delay=DEFAULT_MAX_DELAY):
+        """
+        Args:
+            vault_path: 笔记库路径
+            callback: 回调函数 (set[Path]) -> None，参数为变更（含删除）的文件
+            debounce: 最后一次变更后等待多少秒再回调
+            poll_interval: 轮询模式下的扫描间隔（秒）
+            use_inotify: 是否优先使用 inotify
+            layout: 可选的 MemoryLayout（与引擎共享目录列表缓存）
+            max_delay: 持续变化时一批变更最多等待多少秒再回调
+        """
+        self.vault = Path(vault_path)
+        self.memory_folder = self.vault / "memory"
+        self.layout = layout or MemoryLayout(self.vault)
+        self.callback = callback
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self._libc = _load_inotify() if use_inotify else None
+        self._stop = threading.Event()
+        self._thread = None
+        self.backend = None
+
+    def is_tracked(self, path):
+        """判断路径是否是需要监视的记忆文件"""
+        path = Path(path)
+        if self.layout.is_memory_file(path):
+            return True
+        return path.parent == self.vault and path.name == CORE_MEMORY_FILE
+
+    def start(self):
+        """在后台线程中开始监视"""
+        fd = self._init_inotify() if self._libc else None
+        if fd is not None:
+            self.backend = "inotify"
+            target = lambda: self._run_inotify(fd)
+        else:
+            self.backend = "polling"
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, name="vault-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止监视并等待后台线程退出"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def _deadline(self, batch_start):
+        """下一次回调的时间：最后一次变更后 debounce 秒，但不晚于这批开始后 max_delay 秒"""
+        return min(time.time() + self.debounce, batch_start + self.max_delay)
+
+    def _due(self, deadline, pending):
+        """这批变更是否该回调了（防抖到期、等待太久或积累太多）"""
+        return deadline is not None and (time.time() >= deadline or len(pending) >= MAX_BATCH_FILES)
+
+    def _flush(self, pending):
+        """把累积的变更交给回调"""
+        if not pending:
+            return
+        changed = set(pending)
+        pending.clear()
+        try:
+            self.callback(changed)
+        except Exception as e:
+            print(f"⚠️  索引更新失败: {e}")
+
+    # ------------------------------------------------------------
+    # inotify
+    # ------------------------------------------------------------
+
+    def _init_inotify(self):
+        """创建 inotify 实例并添加监视，失败时返回 None"""
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        self._watch_dirs = {}
+        directories = [self.vault] + (self.layout.directories() if self.memory_folder.exists() else [])
+        for directory in directories:
+            if self._add_watch(fd, directory) is None:
+                os.close(fd)
+                return None
+        # 已知的记忆文件，溢出重扫时据此找出期间被删除的文件
+        self._known = self._tracked_files()
+        return fd
+
+    def _add_watch(self, fd, directory):
+        """为目录添加 inotify 监视，失败时返回 None"""
+        wd = self._libc.inotify_add_watch(fd, str(directory).encode("utf-8"), WATCH_MASK)
+        if wd < 0:
+            return None
+        self._watch_dirs[wd] = directory
+        return wd
+
+    def _tracked_files(self):
+        """当前存在的所有被监视文件"""
+        files = set(self.layout.files()) if self.memory_folder.exists() else set()
+        core_memory = self.vault / CORE_MEMORY_FILE
+        if core_memory.exists():
+            files.add(core_memory)
+        return files
+
+    def _is_watched_dir(self, path):
+        """判断路径是否是 memory/ 本身或其下的年/月分片目录"""
+        if path == self.memory_folder:
+            return True
+        if path.parent == self.memory_folder:
+            return YEAR_PATTERN.match(path.name) is not None
+        return (
+            path.parent.parent == self.memory_folder
+            and YEAR_PATTERN.match(path.parent.name) is not None
+            and MONTH_PATTERN.match(path.name) is not None
+        )
+
+    def _watch_new_dir(self, fd, directory):
+        """
+        监视新建的 memory/ 或分片目录，并返回监视生效前已在其中的文件
+
+        Returns:
+            目录中已有的记忆文件（含子目录中的）
+        """
+        if self._add_watch(fd, directory) is None:
+            return []
+        existing = []
+        for entry in sorted(directory.iterdir()):
+            if entry.is_dir():
+                if self._is_watched_dir(entry):
+                    existing.extend(self._watch_new_dir(fd, entry))
+            elif self.is_tracked(entry):
+                existing.append(entry)
+        return existing
+
+    def _run_inotify(self, fd):
+        pending = set()
+        deadline = None
+        batch_start = None
+        try:
+            while not self._stop.is_set():
+                timeout = max(0.0, deadline - time.time()) if deadline else 0.5
+                readable, _, _ = select.select([fd], [], [], timeout)
+                if readable:
+                    changed = False
+                    paths, overflowed = self._read_events(fd)
+                    if overflowed:
+                        pending.update(self._rescan(fd))
+                        changed = True
+                    for path in paths:
+                        if self._is_watched_dir(path) and path.is_dir():
+                            new_files = self._watch_new_dir(fd, path)
+                            pending.update(new_files)
+                            self._known.update(new_files)
+                            changed = changed or bool(new_files)
+                            continue
+                        if self.is_tracked(path):
+                            pending.add(path)
+                            changed = True
+                            if path.exists():
+                                self._known.add(path)
+                            else:
+                                self._known.discard(path)
+                    if changed:
+                        batch_start = batch_start or time.time()
+                        deadline = self._deadline(batch_start)
+                # 无关事件不断到达时 select 一直可读，每轮都检查是否到期
+                if self._due(deadline, pending):
+                    self._flush(pending)
+                    deadline = batch_start = None
+        finally:
+            os.close(fd)
+
+    def _rescan(self, fd):
+        """
+        事件队列溢出后重新同步：补充监视遗漏的目录，返回所有现有文件和期间消失的文件
+        """
+        if self.memory_folder.exists():
+            for directory in self.layout.directories():
+                self._add_watch(fd, directory)
+        current = self._tracked_files()
+        changed = current | self._known
+        self._known = current
+        return changed
+
+    def _read_events(self, fd):
+        """
+        读取并解析一批 inotify 事件
+
+        Returns:
+            (涉及的文件路径列表, 是否发生了队列溢出)
+        """
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return [], False
+        paths = []
+        overflowed = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+                continue
+            directory = self._watch_dirs.get(wd)
+            if directory is not None and name:
+                paths.append(directory / name)
+        return paths, overflowed
+
+    # ------------------------------------------------------------
+    # 轮询
+    # ------------------------------------------------------------
+
+    def _snapshot(self):
+        """记录所有被监视文件的 (mtime, size)"""
+        snapshot = {}
+        candidates = self.layout.files()
+        candidates.append(self.vault / CORE_MEMORY_FILE)
+        for path in candidates:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def _run_polling(self):
+        pending = set()
+        deadline = None
+        batch_start = None
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            changed = {p for p in current if previous.get(p) != current[p]}
+            changed |= set(previous) - set(current)
+            previous = current
+            if changed:
+                pending |= changed
+                batch_start = batch_start or time.time()
+                deadline = self._deadline(batch_start)
+            if self._due(deadline, pending):
+                self._flush(pending)
+                deadline = batch_start = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python watcher.py <笔记库路径> [--poll]")
+        print("\n监视记忆文件变化并打印变更列表（调试用）")
+        sys.exit(1)
+
+    def report(paths):
+        for path in sorted(paths):
+            state = "已修改" if path.exists() else "已删除"
+            print(f"📝 {state}: {path}")
+
+    watcher = VaultWatcher(sys.argv[1], report, use_inotify="--poll" not in sys.argv).start()
+    print(f"👀 正在监视 ({watcher.backend})，按 Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()